@@ -1,14 +1,20 @@
 import logging
+import operator
 import hexgrid
 from catan.pieces import PieceType
 import catan.board as catanboard
 from catan.trading import CatanTrade
 from catan import states
+from catan import topology
+from catan.hand import RESOURCES, resource_index
+import catan.actions
+import catan.trading
+import catan.game
+import catan.production
+import catan.simulation
+import catan.zobrist
 import time
-import random
 
-_node_directions = ['NW', 'N', 'NE', 'SE', 'S', 'SW']
-_edge_directions = ['NW', 'NE', 'E', 'SE', 'SW', 'W']
 
 road_needs = [catanboard.Terrain.brick, catanboard.Terrain.wood]
 sett_needs = [catanboard.Terrain.brick, catanboard.Terrain.wood,
@@ -18,415 +24,368 @@ devc_needs = [catanboard.Terrain.ore,
 city_needs = [catanboard.Terrain.ore,
               catanboard.Terrain.ore, catanboard.Terrain.ore,
               catanboard.Terrain.wheat, catanboard.Terrain.wheat]
+_build_needs = {'road': road_needs, 'sett': sett_needs, 'devc': devc_needs, 'city': city_needs}
 
+# Resource counts each build costs, in catan.hand.RESOURCES order
+_build_costs = {'road': catan.game.BUILD_COSTS['road'],
+                'sett': catan.game.BUILD_COSTS['settlement'],
+                'city': catan.game.BUILD_COSTS['city'],
+                'devc': catan.game.BUILD_COSTS['dev_card']}
 
-def droid_move(board_frame, board, game_toolbar_frame=None):
+# Starting factors for each build in best_win_condition, before the turn's adjustments, and
+# the weight of the forecast, see FORECAST_TURNS
+DEFAULT_FACTORS = {
+    "sett": 1,
+    "road": 1,
+    "city": 1,
+    "devc": 1,
+    "forecast": 0,
+}
 
-    player = board_frame.game.get_cur_player()
-    user_materials = board_frame.game.get_all_user_materials()
+# Turns ahead best_win_condition looks for the chance the player's buildings pay for each
+# build (see catan.production), which it adds, times the forecast factor, to the build's
+# share of the cards in hand. Off by default: in tournaments it hasn't won more games.
+FORECAST_TURNS = 1
 
-    if board_frame.game.state.is_in_pregame():
 
-        if board_frame.game.state.can_place_settlement():
-            bsc = best_settlement_coord_start(board)
+# Strategy droid_move plays with, e.g. a catan.mcts.MctsStrategy. None for the greedy droid.
+droid_strategy = None
+
+
+def droid_move(board_frame, board, game_toolbar_frame=None, strategy=None):
+    """
+    Make the current droid's move in the spectator: a pregame placement, or a whole turn.
+
+    :param strategy: catan.simulation.Strategy making the decisions, default droid_strategy,
+    or a greedy DroidStrategy if that isn't set
+    """
+    game = board_frame.game
+    player = game.get_cur_player()
+    strategy = strategy or droid_strategy or DroidStrategy(delay=board_frame.master.delay)
+
+    if game.state.is_in_pregame():
+
+        if game.state.can_place_settlement():
+            bsc = strategy.start_settlement(game)
             board_frame.droid_piece_click(
                 PieceType.settlement, bsc)
-            print("{} places a settlement at {}...".format(player.name, bsc))
-            board_frame.game.notify_observers()
-        elif board_frame.game.state.can_place_road():
-            brc = best_road_coord_start(board_frame, board)
+            logging.info("{} places a settlement at {}...".format(player.name, bsc))
+            game.notify_observers()
+        elif game.state.can_place_road():
+            brc = strategy.start_road(game)
             board_frame.droid_piece_click(
                 PieceType.road, brc)
-            print("{} places a road at {}...".format(player.name, brc))
-            board_frame.game.notify_observers()
-
-    elif board_frame.game.state.is_in_game():
-        if 'Knight' in board_frame.game.dev_hands[player]:
-            for cdir in ['NW', 'N', 'NE', 'SE', 'S', 'SW']:
-                coord = hexgrid.from_location(hexgrid.NODE, board_frame.game.robber_tile, direction=cdir)
-                if (hexgrid.NODE, coord) in board_frame.game.board.pieces:
-                    if (board_frame.game.board.pieces[(hexgrid.NODE, coord)].type == PieceType.settlement or \
-                        board_frame.game.board.pieces[(hexgrid.NODE, coord)].type == PieceType.city) and \
-                        board_frame.game.board.pieces[(hexgrid.NODE, coord)].owner == player:
-                        board_frame.game.play_knight()
-                        board_frame.droid_piece_click(
-                        PieceType.robber, best_robber_coord(board_frame, board))
-                        game_toolbar_frame.frame_robber.on_steal()
-                        break
-                    elif user_materials[player]["knights"] == 2:
-                        board_frame.game.play_knight()
-                        board_frame.droid_piece_click(
-                        PieceType.robber, best_robber_coord(board_frame, board))
-                        game_toolbar_frame.frame_robber.on_steal()
-                        break
-
-        print("\n\n\n{} rolling the dice...".format(player.name))
+            logging.info("{} places a road at {}...".format(player.name, brc))
+            game.notify_observers()
+
+    elif game.state.is_in_game():
+        strategy.before_roll(game)
+        if game.state.can_move_robber():
+            board_frame.droid_piece_click(
+                PieceType.robber, strategy.robber_tile(game))
+            game_toolbar_frame.frame_robber.on_steal()
+
+        logging.info("{} rolling the dice...".format(player.name))
         board_frame.master.delay()
 
         roll_val = game_toolbar_frame.frame_roll.on_dice_roll()
 
         if roll_val == 7:
 
-            print("{} considering where to put robber...".format(player.name))
+            logging.info("{} considering where to put robber...".format(player.name))
             board_frame.master.delay()
 
-            print("{} is the best robber coordinate.".format(best_robber_coord(board_frame, board)))
             board_frame.droid_piece_click(
-                PieceType.robber, best_robber_coord(board_frame, board))
+                PieceType.robber, strategy.robber_tile(game))
             game_toolbar_frame.frame_robber.on_steal()
 
-        move_ind = 0
-        player_hand = board_frame.game.hands[player]
-
-
-        while move_ind < 3:
-            next_moves = best_win_condition(board_frame,board)
-            print("Recommended moves, in order: {}".format(next_moves))
-            approach_type = next_moves[move_ind]
-            missing_resources, tradeable_resources = find_tradeable_resources(approach_type, player_hand)
-            if approach_type == "sett":
-                if not board_frame.game.state.can_buy_settlement():
-                    if len(missing_resources) == 2 and 'Year of Plenty' in board_frame.game.dev_hands[player] and board_frame.game.dev_card_state.can_play_dev_card():
-                        board_frame.game.play_year_of_plenty(missing_resources[0], missing_resources[1])
-                        missing_resources, tradeable_resources = find_tradeable_resources(approach_type, player_hand)
-                    elif len(missing_resources) == 1 and 'Monopoly' in board_frame.game.dev_hands[player] and board_frame.game.dev_card_state.can_play_dev_card():
-                        num_you_need = 0
-                        for p in board_frame.game.hands:
-                            if missing_resources[0] in board_frame.game.hands[p] and player != p:
-                                num_you_need = 1
-                        if num_you_need:
-                            board_frame.game.play_monopoly(missing_resources[0])
-                        missing_resources, tradeable_resources = find_tradeable_resources(approach_type, player_hand)
-                    for resource in missing_resources:
-                        result = make_trade(user_materials, resource, 1, player, board_frame, tradeable_resources)
-                        if not result:
-                            if board_frame.game.player_has_port_type(player, catanboard.PortType.wood) and \
-                                tradeable_resources.count(catanboard.Terrain.wood) >= 2:
-                                board_frame.game.hands[player].remove(catanboard.Terrain.wood)
-                                board_frame.game.hands[player].remove(catanboard.Terrain.wood)
-                                board_frame.game.hands[player].append(resource)
-                                print(player, 'used the wood port to obtain a', resource)
-                            elif board_frame.game.player_has_port_type(player, catanboard.PortType.sheep) and \
-                                tradeable_resources.count(catanboard.Terrain.sheep) >= 2:
-                                board_frame.game.hands[player].remove(catanboard.Terrain.sheep)
-                                board_frame.game.hands[player].remove(catanboard.Terrain.sheep)
-                                board_frame.game.hands[player].append(resource)
-                                print(player, 'used the sheep port to obtain a', resource)
-                            elif board_frame.game.player_has_port_type(player, catanboard.PortType.brick) and \
-                                tradeable_resources.count(catanboard.Terrain.brick) >= 2:
-                                board_frame.game.hands[player].remove(catanboard.Terrain.brick)
-                                board_frame.game.hands[player].remove(catanboard.Terrain.brick)
-                                board_frame.game.hands[player].append(resource)
-                                print(player, 'used the brick port to obtain a', resource)
-                            elif board_frame.game.player_has_port_type(player, catanboard.PortType.wheat) and \
-                                tradeable_resources.count(catanboard.Terrain.wheat) >= 2:
-                                board_frame.game.hands[player].remove(catanboard.Terrain.wheat)
-                                board_frame.game.hands[player].remove(catanboard.Terrain.wheat)
-                                board_frame.game.hands[player].append(resource)
-                                print(player, 'used the wheat port to obtain a', resource)
-                            elif board_frame.game.player_has_port_type(player, catanboard.PortType.ore) and \
-                                tradeable_resources.count(catanboard.Terrain.ore) >= 2:
-                                board_frame.game.hands[player].remove(catanboard.Terrain.ore)
-                                board_frame.game.hands[player].remove(catanboard.Terrain.ore)
-                                board_frame.game.hands[player].append(resource)
-                                print(player, 'used the ore port to obtain a', resource)
-                            elif board_frame.game.player_has_port_type(player, catanboard.PortType.any3):
-                                for r_type in [catanboard.Terrain.wood, catanboard.Terrain.sheep,
-                                    catanboard.Terrain.brick, catanboard.Terrain.wheat, catanboard.Terrain.ore]:
-                                    if tradeable_resources.count(r_type) >= 3:
-                                        board_frame.game.hands[player].remove(r_type)
-                                        board_frame.game.hands[player].remove(r_type)
-                                        board_frame.game.hands[player].remove(r_type)
-                                        board_frame.game.hands[player].append(resource)
-                                        print(player, 'used the 3:1 port to obtain a', resource, 'from 3', r_type)
-                                        break
-                            else:
-                                for r_type in [catanboard.Terrain.wood, catanboard.Terrain.sheep,
-                                    catanboard.Terrain.brick, catanboard.Terrain.wheat, catanboard.Terrain.ore]:
-                                    if tradeable_resources.count(r_type) >= 4:
-                                        board_frame.game.hands[player].remove(r_type)
-                                        board_frame.game.hands[player].remove(r_type)
-                                        board_frame.game.hands[player].remove(r_type)
-                                        board_frame.game.hands[player].remove(r_type)
-                                        board_frame.game.hands[player].append(resource)
-                                        print(player, 'used the 4:1 port to obtain a', resource, 'from 4', r_type)
-                                        break
-                        missing_resources, tradeable_resources = find_tradeable_resources(approach_type, board_frame.game.hands[player])
-
-                #print("{} looks to build a settlement...".format(player.name))
-                board_frame.master.delay()
-
-                if board_frame.game.state.can_buy_settlement():
-
-                    coord = best_settlement_coord(board_frame,board)
-                    #If no valid places to play a settlement
-                    if coord == -1:
-                        break
-
-                    board_frame.game.set_state(states.GameStatePlacingPiece(board_frame.game, PieceType.settlement))
-                    board_frame.droid_piece_click(PieceType.settlement, coord)
-                    user_materials[player]["have_built_sett"] = 1
-                    print("{} places a settlement at {}...".format(player.name, coord))
-                    board_frame.master.delay()
-                    board_frame.game.set_state(states.GameStateDuringTurnAfterRoll(board_frame.game))
-                    move_ind = 0
-                    continue
+        strategy.take_turn(game)
 
-            if approach_type == "road":
-                #print("{} looks to build a road...".format(player.name))
-                board_frame.master.delay()
-                if len(missing_resources) > 0 and 'Road Builder' in board_frame.game.dev_hands[player] and board_frame.game.dev_card_state.can_play_dev_card():
-                    board_frame.game.set_state(states.GameStatePlacingRoadBuilderPieces(board_frame.game))
-                    brc = best_road_coord(board_frame,board)
-                    board_frame.droid_piece_click(PieceType.road, brc + 10000)
-                    brc = best_road_coord(board_frame,board)
-                    board_frame.droid_piece_click(PieceType.road, brc + 10000)
-                    board_frame.game.set_state(states.GameStateDuringTurnAfterRoll(board_frame.game))
-
-                if not board_frame.game.state.can_buy_road():
-
-
-                    if len(missing_resources) == 2 and 'Year of Plenty' in board_frame.game.dev_hands[player] and board_frame.game.dev_card_state.can_play_dev_card():
-                        board_frame.game.play_year_of_plenty(missing_resources[0], missing_resources[1])
-                        missing_resources, tradeable_resources = find_tradeable_resources(approach_type, player_hand)
-                    elif len(missing_resources) == 1 and 'Monopoly' in board_frame.game.dev_hands[player] and board_frame.game.dev_card_state.can_play_dev_card():
-                        num_you_need = 0
-                        for p in board_frame.game.hands:
-                            if missing_resources[0] in board_frame.game.hands[p] and player != p:
-                                num_you_need = 1
-                        if num_you_need:
-                            board_frame.game.play_monopoly(missing_resources[0])
-                        missing_resources, tradeable_resources = find_tradeable_resources(approach_type, player_hand)
-                    for resource in missing_resources:
-                        result = make_trade(user_materials, resource, 1, player, board_frame, tradeable_resources)
-                        if not result:
-                            if board_frame.game.player_has_port_type(player, catanboard.PortType.wood) and \
-                                tradeable_resources.count(catanboard.Terrain.wood) >= 2:
-                                board_frame.game.hands[player].remove(catanboard.Terrain.wood)
-                                board_frame.game.hands[player].remove(catanboard.Terrain.wood)
-                                board_frame.game.hands[player].append(resource)
-                                print(player, 'used the wood port to obtain a', resource)
-                            elif board_frame.game.player_has_port_type(player, catanboard.PortType.sheep) and \
-                                tradeable_resources.count(catanboard.Terrain.sheep) >= 2:
-                                board_frame.game.hands[player].remove(catanboard.Terrain.sheep)
-                                board_frame.game.hands[player].remove(catanboard.Terrain.sheep)
-                                board_frame.game.hands[player].append(resource)
-                                print(player, 'used the sheep port to obtain a', resource)
-                            elif board_frame.game.player_has_port_type(player, catanboard.PortType.brick) and \
-                                tradeable_resources.count(catanboard.Terrain.brick) >= 2:
-                                board_frame.game.hands[player].remove(catanboard.Terrain.brick)
-                                board_frame.game.hands[player].remove(catanboard.Terrain.brick)
-                                board_frame.game.hands[player].append(resource)
-                                print(player, 'used the brick port to obtain a', resource)
-                            elif board_frame.game.player_has_port_type(player, catanboard.PortType.wheat) and \
-                                tradeable_resources.count(catanboard.Terrain.wheat) >= 2:
-                                board_frame.game.hands[player].remove(catanboard.Terrain.wheat)
-                                board_frame.game.hands[player].remove(catanboard.Terrain.wheat)
-                                board_frame.game.hands[player].append(resource)
-                                print(player, 'used the wheat port to obtain a', resource)
-                            elif board_frame.game.player_has_port_type(player, catanboard.PortType.ore) and \
-                                tradeable_resources.count(catanboard.Terrain.ore) >= 2:
-                                board_frame.game.hands[player].remove(catanboard.Terrain.ore)
-                                board_frame.game.hands[player].remove(catanboard.Terrain.ore)
-                                board_frame.game.hands[player].append(resource)
-                                print(player, 'used the ore port to obtain a', resource)
-                            elif board_frame.game.player_has_port_type(player, catanboard.PortType.any3):
-                                for r_type in [catanboard.Terrain.wood, catanboard.Terrain.sheep,
-                                    catanboard.Terrain.brick, catanboard.Terrain.wheat, catanboard.Terrain.ore]:
-                                    if tradeable_resources.count(r_type) >= 3:
-                                        board_frame.game.hands[player].remove(r_type)
-                                        board_frame.game.hands[player].remove(r_type)
-                                        board_frame.game.hands[player].remove(r_type)
-                                        board_frame.game.hands[player].append(resource)
-                                        print(player, 'used the 3:1 port to obtain a', resource, 'from 3', r_type)
-                                        break
-                            else:
-                                for r_type in [catanboard.Terrain.wood, catanboard.Terrain.sheep,
-                                    catanboard.Terrain.brick, catanboard.Terrain.wheat, catanboard.Terrain.ore]:
-                                    if tradeable_resources.count(r_type) >= 4:
-                                        board_frame.game.hands[player].remove(r_type)
-                                        board_frame.game.hands[player].remove(r_type)
-                                        board_frame.game.hands[player].remove(r_type)
-                                        board_frame.game.hands[player].remove(r_type)
-                                        board_frame.game.hands[player].append(resource)
-                                        print(player, 'used the 4:1 port to obtain a', resource, 'from 4', r_type)
-                                        break
-
-                        missing_resources, tradeable_resources = find_tradeable_resources(approach_type, board_frame.game.hands[player])
-                if board_frame.game.state.can_buy_road():
-                    board_frame.game.set_state(states.GameStatePlacingPiece(board_frame.game, PieceType.road))
-
-                    brc = best_road_coord(board_frame,board)
-                    if not brc:
-                        break
-                    board_frame.droid_piece_click(PieceType.road, brc)
-                    user_materials[player]["have_built_road"] = 1
-                    print("{} places a road at {}...".format(player.name, brc))
-                    board_frame.master.delay()
-                    board_frame.game.set_state(states.GameStateDuringTurnAfterRoll(board_frame.game))
-                    move_ind = 0
-                    continue
+    board_frame.redraw()
+    game.notify_observers()
 
-            if approach_type == "city":
-                if not board_frame.game.state.can_buy_city():
-                    if len(missing_resources) == 2 and 'Year of Plenty' in board_frame.game.dev_hands[player] and board_frame.game.dev_card_state.can_play_dev_card():
-                        board_frame.game.play_year_of_plenty(missing_resources[0], missing_resources[1])
-                        missing_resources, tradeable_resources = find_tradeable_resources(approach_type, player_hand)
-                    elif len(set(missing_resources)) == 1 and 'Monopoly' in board_frame.game.dev_hands[player] and board_frame.game.dev_card_state.can_play_dev_card():
-                        num_you_need = 0
-                        for p in board_frame.game.hands:
-                            if missing_resources[0] in board_frame.game.hands[p] and player != p:
-                                num_you_need += 1
-                        if num_you_need >= len(missing_resources):
-                            board_frame.game.play_monopoly(missing_resources[0])
-                        missing_resources, tradeable_resources = find_tradeable_resources(approach_type, player_hand)
-                    for resource in missing_resources:
-                        result = make_trade(user_materials, resource, 1, player, board_frame, tradeable_resources)
-                        if not result:
-                            if board_frame.game.player_has_port_type(player, catanboard.PortType.wood) and \
-                                tradeable_resources.count(catanboard.Terrain.wood) >= 2:
-                                board_frame.game.hands[player].remove(catanboard.Terrain.wood)
-                                board_frame.game.hands[player].remove(catanboard.Terrain.wood)
-                                board_frame.game.hands[player].append(resource)
-                                print(player, 'used the wood port to obtain a', resource)
-                            elif board_frame.game.player_has_port_type(player, catanboard.PortType.sheep) and \
-                                tradeable_resources.count(catanboard.Terrain.sheep) >= 2:
-                                board_frame.game.hands[player].remove(catanboard.Terrain.sheep)
-                                board_frame.game.hands[player].remove(catanboard.Terrain.sheep)
-                                board_frame.game.hands[player].append(resource)
-                                print(player, 'used the sheep port to obtain a', resource)
-                            elif board_frame.game.player_has_port_type(player, catanboard.PortType.brick) and \
-                                tradeable_resources.count(catanboard.Terrain.brick) >= 2:
-                                board_frame.game.hands[player].remove(catanboard.Terrain.brick)
-                                board_frame.game.hands[player].remove(catanboard.Terrain.brick)
-                                board_frame.game.hands[player].append(resource)
-                                print(player, 'used the brick port to obtain a', resource)
-                            elif board_frame.game.player_has_port_type(player, catanboard.PortType.wheat) and \
-                                tradeable_resources.count(catanboard.Terrain.wheat) >= 2:
-                                board_frame.game.hands[player].remove(catanboard.Terrain.wheat)
-                                board_frame.game.hands[player].remove(catanboard.Terrain.wheat)
-                                board_frame.game.hands[player].append(resource)
-                                print(player, 'used the wheat port to obtain a', resource)
-                            elif board_frame.game.player_has_port_type(player, catanboard.PortType.ore) and \
-                                tradeable_resources.count(catanboard.Terrain.ore) >= 2:
-                                board_frame.game.hands[player].remove(catanboard.Terrain.ore)
-                                board_frame.game.hands[player].remove(catanboard.Terrain.ore)
-                                board_frame.game.hands[player].append(resource)
-                                print(player, 'used the ore port to obtain a', resource)
-                            elif board_frame.game.player_has_port_type(player, catanboard.PortType.any3):
-                                for r_type in [catanboard.Terrain.wood, catanboard.Terrain.sheep,
-                                    catanboard.Terrain.brick, catanboard.Terrain.wheat, catanboard.Terrain.ore]:
-                                    if tradeable_resources.count(r_type) >= 3:
-                                        board_frame.game.hands[player].remove(r_type)
-                                        board_frame.game.hands[player].remove(r_type)
-                                        board_frame.game.hands[player].remove(r_type)
-                                        board_frame.game.hands[player].append(resource)
-                                        print(player, 'used the 3:1 port to obtain a', resource, 'from 3', r_type)
-                                        break
-                            else:
-                                for r_type in [catanboard.Terrain.wood, catanboard.Terrain.sheep,
-                                    catanboard.Terrain.brick, catanboard.Terrain.wheat, catanboard.Terrain.ore]:
-                                    if tradeable_resources.count(r_type) >= 4:
-                                        board_frame.game.hands[player].remove(r_type)
-                                        board_frame.game.hands[player].remove(r_type)
-                                        board_frame.game.hands[player].remove(r_type)
-                                        board_frame.game.hands[player].remove(r_type)
-                                        board_frame.game.hands[player].append(resource)
-                                        print(player, 'used the 4:1 port to obtain a', resource, 'from 4', r_type)
-                                        break
-
-                        missing_resources, tradeable_resources = find_tradeable_resources(approach_type, board_frame.game.hands[player])
-                if board_frame.game.state.can_buy_city():
-                    board_frame.game.set_state(states.GameStatePlacingPiece(board_frame.game, PieceType.city))
-                    board_frame.droid_piece_click(PieceType.city, best_city_coord(user_materials, player, board))
-                    board_frame.game.set_state(states.GameStateDuringTurnAfterRoll(board_frame.game))
-                    move_ind = 0
-                    continue
+    if game_toolbar_frame is not None:
+        game_toolbar_frame.frame_end_turn.on_end_turn()
 
-            if approach_type == "devc":
-                if not board_frame.game.state.can_buy_dev_card():
-                    if len(missing_resources) == 2 and 'Year of Plenty' in board_frame.game.dev_hands[player] and board_frame.game.dev_card_state.can_play_dev_card():
-                        board_frame.game.play_year_of_plenty(missing_resources[0], missing_resources[1])
-                        missing_resources, tradeable_resources = find_tradeable_resources(approach_type, player_hand)
-                    elif len(missing_resources) == 1 and 'Monopoly' in board_frame.game.dev_hands[player] and board_frame.game.dev_card_state.can_play_dev_card():
-                        num_you_need = 0
-                        for p in board_frame.game.hands:
-                            if missing_resources[0] in board_frame.game.hands[p] and player != p:
-                                num_you_need = 1
-                        if num_you_need:
-                            board_frame.game.play_monopoly(missing_resources[0])
-                        missing_resources, tradeable_resources = find_tradeable_resources(approach_type, player_hand)
-                    for resource in missing_resources:
-                        result = make_trade(user_materials, resource, 1, player, board_frame, tradeable_resources)
-                        if not result:
-                            if board_frame.game.player_has_port_type(player, catanboard.PortType.wood) and \
-                                tradeable_resources.count(catanboard.Terrain.wood) >= 2:
-                                board_frame.game.hands[player].remove(catanboard.Terrain.wood)
-                                board_frame.game.hands[player].remove(catanboard.Terrain.wood)
-                                board_frame.game.hands[player].append(resource)
-                                print(player, 'used the wood port to obtain a', resource)
-                            elif board_frame.game.player_has_port_type(player, catanboard.PortType.sheep) and \
-                                tradeable_resources.count(catanboard.Terrain.sheep) >= 2:
-                                board_frame.game.hands[player].remove(catanboard.Terrain.sheep)
-                                board_frame.game.hands[player].remove(catanboard.Terrain.sheep)
-                                board_frame.game.hands[player].append(resource)
-                                print(player, 'used the sheep port to obtain a', resource)
-                            elif board_frame.game.player_has_port_type(player, catanboard.PortType.brick) and \
-                                tradeable_resources.count(catanboard.Terrain.brick) >= 2:
-                                board_frame.game.hands[player].remove(catanboard.Terrain.brick)
-                                board_frame.game.hands[player].remove(catanboard.Terrain.brick)
-                                board_frame.game.hands[player].append(resource)
-                                print(player, 'used the brick port to obtain a', resource)
-                            elif board_frame.game.player_has_port_type(player, catanboard.PortType.wheat) and \
-                                tradeable_resources.count(catanboard.Terrain.wheat) >= 2:
-                                board_frame.game.hands[player].remove(catanboard.Terrain.wheat)
-                                board_frame.game.hands[player].remove(catanboard.Terrain.wheat)
-                                board_frame.game.hands[player].append(resource)
-                                print(player, 'used the wheat port to obtain a', resource)
-                            elif board_frame.game.player_has_port_type(player, catanboard.PortType.ore) and \
-                                tradeable_resources.count(catanboard.Terrain.ore) >= 2:
-                                board_frame.game.hands[player].remove(catanboard.Terrain.ore)
-                                board_frame.game.hands[player].remove(catanboard.Terrain.ore)
-                                board_frame.game.hands[player].append(resource)
-                                print(player, 'used the ore port to obtain a', resource)
-                            elif board_frame.game.player_has_port_type(player, catanboard.PortType.any3):
-                                for r_type in [catanboard.Terrain.wood, catanboard.Terrain.sheep,
-                                    catanboard.Terrain.brick, catanboard.Terrain.wheat, catanboard.Terrain.ore]:
-                                    if tradeable_resources.count(r_type) >= 3:
-                                        board_frame.game.hands[player].remove(r_type)
-                                        board_frame.game.hands[player].remove(r_type)
-                                        board_frame.game.hands[player].remove(r_type)
-                                        board_frame.game.hands[player].append(resource)
-                                        print(player, 'used the 3:1 port to obtain a', resource, 'from 3', r_type)
-                                        break
-                            else:
-                                for r_type in [catanboard.Terrain.wood, catanboard.Terrain.sheep,
-                                    catanboard.Terrain.brick, catanboard.Terrain.wheat, catanboard.Terrain.ore]:
-                                    if tradeable_resources.count(r_type) >= 4:
-                                        board_frame.game.hands[player].remove(r_type)
-                                        board_frame.game.hands[player].remove(r_type)
-                                        board_frame.game.hands[player].remove(r_type)
-                                        board_frame.game.hands[player].remove(r_type)
-                                        board_frame.game.hands[player].append(resource)
-                                        print(player, 'used the 4:1 port to obtain a', resource, 'from 4', r_type)
-                                        break
-
-                        missing_resources, tradeable_resources = find_tradeable_resources(approach_type, board_frame.game.hands[player])
-                if board_frame.game.state.can_buy_dev_card():
-                    board_frame.game.buy_dev_card()
-                    move_ind = 0
-                    continue
 
-            move_ind += 1
+class DroidStrategy(catan.simulation.Strategy):
+    """
+    class DroidStrategy plays a seat of a headless game (see module catan.simulation)
+    using the greedy decisions of best_win_condition and friends. droid_move plays the
+    spectator's droids with it too.
+
+    :param factors: starting factors for best_win_condition, dict, default DEFAULT_FACTORS
+    :param delay: see droid_build
+    :param lookahead: see droid_build
+    """
+    def __init__(self, factors=None, delay=None, lookahead=0):
+        self.factors = factors
+        self.delay = delay
+        self.lookahead = lookahead
+
+    def start_settlement(self, game):
+        return best_settlement_coord_start(game.board)
+
+    def start_road(self, game):
+        return best_road_coord_start(game, game.board) or any_road_coord_start(game)
+
+    def before_roll(self, game):
+        if should_play_knight(game):
+            game.play_knight()
+
+    def robber_tile(self, game):
+        return best_robber_coord(game, game.board)
+
+    def take_turn(self, game):
+        droid_build(game, game.board, delay=self.delay, factors=self.factors, lookahead=self.lookahead)
+
+
+def should_play_knight(game):
+    """
+    Whether the current player should play a knight before rolling: either the robber is
+    on one of their tiles, or a third knight is worth playing for largest army.
+    """
+    player = game.get_cur_player()
+    if not game.state.can_play_knight():
+        return False
+    # scored like rank_robber_tiles, where the player's own buildings make a tile negative
+    score = building_scores(game, game.board, None)[game.robber_tile]
+    return score < 0 or (score != 0 and game.knights_played[player] == 2)
+
+
+def droid_build(game, board, delay=None, factors=None, lookahead=0):
+    """
+    Spend the current player's hand on the best pieces it can build, trading and playing
+    development cards along the way. See best_win_condition for how builds are ranked.
+
+    :param game: the game, in a state after the current player has rolled
+    :param board: the game's board
+    :param delay: called between actions, used by the spectator to pace droid turns
+    :param factors: starting factors for best_win_condition, dict, default DEFAULT_FACTORS
+    :param lookahead: turns expectimax looks ahead to rank the builds the player can afford,
+    see expectimax_win_condition. Default 0, rank by best_win_condition alone.
+    """
+    delay = delay or (lambda: None)
+    player = game.get_cur_player()
+    user_materials = game.get_all_user_materials()
+
+    move_ind = 0
+    player_hand = game.hands[player]
+    memo = dict()
+    evaluations = dict()
+
+    while move_ind < 3:
+        if lookahead:
+            next_moves = expectimax_win_condition(game, board, turns=lookahead, factors=factors, memo=memo,
+                                                  evaluations=evaluations)
+        else:
+            next_moves = best_win_condition(game, board, factors=factors, evaluations=evaluations)
+        logging.info("Recommended moves, in order: {}".format(next_moves))
+        approach_type = next_moves[move_ind]
+        missing_resources, tradeable_resources = find_tradeable_resources(approach_type, player_hand)
+        if approach_type == "sett":
+            if not game.state.can_buy_settlement():
+                if len(missing_resources) == 2 and 'Year of Plenty' in game.dev_hands[player] and game.dev_card_state.can_play_dev_card():
+                    game.play_year_of_plenty(missing_resources[0], missing_resources[1])
+                    missing_resources, tradeable_resources = find_tradeable_resources(approach_type, player_hand)
+                elif len(missing_resources) == 1 and 'Monopoly' in game.dev_hands[player] and game.dev_card_state.can_play_dev_card():
+                    num_you_need = 0
+                    for p in game.hands:
+                        if player != p and probably_holds(game, p, missing_resources[0]):
+                            num_you_need = 1
+                    if num_you_need:
+                        game.play_monopoly(missing_resources[0])
+                    missing_resources, tradeable_resources = find_tradeable_resources(approach_type, player_hand)
+                trade_for(game, player, approach_type, evaluations)
+
+            #logging.info("{} looks to build a settlement...".format(player.name))
+            delay()
+
+            if game.state.can_buy_settlement():
+
+                coord = best_settlement_coord(game, board)
+                #If no valid places to play a settlement
+                if coord == -1:
+                    break
+
+                game.set_state(states.GameStatePlacingPiece(game, PieceType.settlement))
+                game.place_settlement(coord)
+                user_materials[player]["have_built_sett"] = 1
+                logging.info("{} places a settlement at {}...".format(player.name, coord))
+                delay()
+                game.set_state(states.GameStateDuringTurnAfterRoll(game))
+                move_ind = 0
+                continue
+
+        if approach_type == "road":
+            #logging.info("{} looks to build a road...".format(player.name))
+            delay()
+            if len(missing_resources) > 0 and 'Road Builder' in game.dev_hands[player] and game.dev_card_state.can_play_dev_card():
+                game.set_state(states.GameStatePlacingRoadBuilderPieces(game))
+                for _ in range(2):
+                    brc = best_road_coord(game, board)
+                    if brc:
+                        game.place_road(brc)
+                game.set_state(states.GameStateDuringTurnAfterRoll(game))
+
+            if not game.state.can_buy_road():
+
+
+                if len(missing_resources) == 2 and 'Year of Plenty' in game.dev_hands[player] and game.dev_card_state.can_play_dev_card():
+                    game.play_year_of_plenty(missing_resources[0], missing_resources[1])
+                    missing_resources, tradeable_resources = find_tradeable_resources(approach_type, player_hand)
+                elif len(missing_resources) == 1 and 'Monopoly' in game.dev_hands[player] and game.dev_card_state.can_play_dev_card():
+                    num_you_need = 0
+                    for p in game.hands:
+                        if player != p and probably_holds(game, p, missing_resources[0]):
+                            num_you_need = 1
+                    if num_you_need:
+                        game.play_monopoly(missing_resources[0])
+                    missing_resources, tradeable_resources = find_tradeable_resources(approach_type, player_hand)
+                trade_for(game, player, approach_type, evaluations)
+            if game.state.can_buy_road():
+                brc = best_road_coord(game, board)
+                if not brc:
+                    break
+                game.set_state(states.GameStatePlacingPiece(game, PieceType.road))
+                game.place_road(brc)
+                user_materials[player]["have_built_road"] = 1
+                logging.info("{} places a road at {}...".format(player.name, brc))
+                delay()
+                game.set_state(states.GameStateDuringTurnAfterRoll(game))
+                move_ind = 0
+                continue
 
+        if approach_type == "city":
+            if not game.state.can_buy_city():
+                if len(missing_resources) == 2 and 'Year of Plenty' in game.dev_hands[player] and game.dev_card_state.can_play_dev_card():
+                    game.play_year_of_plenty(missing_resources[0], missing_resources[1])
+                    missing_resources, tradeable_resources = find_tradeable_resources(approach_type, player_hand)
+                elif len(set(missing_resources)) == 1 and 'Monopoly' in game.dev_hands[player] and game.dev_card_state.can_play_dev_card():
+                    num_you_need = 0
+                    for p in game.hands:
+                        if player != p and probably_holds(game, p, missing_resources[0]):
+                            num_you_need += 1
+                    if num_you_need >= len(missing_resources):
+                        game.play_monopoly(missing_resources[0])
+                    missing_resources, tradeable_resources = find_tradeable_resources(approach_type, player_hand)
+                trade_for(game, player, approach_type, evaluations)
+            if game.state.can_buy_city():
+                coord = best_city_coord(user_materials, player, board)
+                if coord is None:
+                    break
+                game.set_state(states.GameStatePlacingPiece(game, PieceType.city))
+                game.place_city(coord)
+                user_materials[player]["settlement"].remove(coord)
+                user_materials[player]["city"].append(coord)
+                game.set_state(states.GameStateDuringTurnAfterRoll(game))
+                move_ind = 0
+                continue
 
-        user_materials[player]["turns_taken"] += 1
+        if approach_type == "devc":
+            if not game.state.can_buy_dev_card():
+                if len(missing_resources) == 2 and 'Year of Plenty' in game.dev_hands[player] and game.dev_card_state.can_play_dev_card():
+                    game.play_year_of_plenty(missing_resources[0], missing_resources[1])
+                    missing_resources, tradeable_resources = find_tradeable_resources(approach_type, player_hand)
+                elif len(missing_resources) == 1 and 'Monopoly' in game.dev_hands[player] and game.dev_card_state.can_play_dev_card():
+                    num_you_need = 0
+                    for p in game.hands:
+                        if player != p and probably_holds(game, p, missing_resources[0]):
+                            num_you_need = 1
+                    if num_you_need:
+                        game.play_monopoly(missing_resources[0])
+                    missing_resources, tradeable_resources = find_tradeable_resources(approach_type, player_hand)
+                trade_for(game, player, approach_type, evaluations)
+            if game.state.can_buy_dev_card():
+                game.buy_dev_card()
+                move_ind = 0
+                continue
 
-    board_frame.redraw()
-    board_frame.game.notify_observers()
+        move_ind += 1
+
+
+def trade_for(game, player, approach_type, evaluations=None):
+    """
+    Make the trades which cover what a build is missing for the fewest cards, with droid
+    partners (see partner_offers), ports and the bank, all through Game#trade. Trades
+    nothing if the build can't be covered. See catan.trading.cheapest_trades.
+
+    :param approach_type: "sett", "road", "city" or "devc"
+    :param evaluations: see best_win_condition
+    :return: True if the hand now covers the build
+    """
+    counts = game.hands[player].counts
+    cost = _build_costs[approach_type]
+    if all(map(operator.ge, counts, cost)):
+        return True
+    offers = partner_offers(game, player, cost, evaluations)
+    trades = catan.trading.cheapest_trades(counts, cost, game.trade_rates(player), offers)
+    if trades is None:
+        logging.info("{} can't trade for a {}".format(player.name, approach_type))
+        return False
+    for partner, give, num, get in trades:
+        give, get = RESOURCES[give], RESOURCES[get]
+        if partner is None:
+            game.trade(game.trade_action(player, give, get).args[0])
+            logging.info('{} used a {}:1 port to obtain a {} from {} {}'.format(player, num, get, num, give))
+        else:
+            trade = CatanTrade(giver=player, getter=partner)
+            trade.give(give)
+            trade.get(get)
+            game.trade(trade)
+            logging.info("{} traded {} for {} with {}".format(player.name, give.name, get.name, partner.name))
+    return True
+
+
+def partner_offers(game, player, cost, evaluations=None):
+    """
+    The one-for-one trades droid partners will make toward a cost. A partner with 7
+    victory points or fewer gives a card the player is missing for a spare card of the
+    player's that the partner's own best build needs and they don't have, unless their
+    build needs the card too, in which case they must have two and not be saving for a
+    city. Nobody trades with a player on more than 7 victory points.
+
+    :param cost: tuple of int, in catan.hand.RESOURCES order
+    :return: tuple of (partner, give, get), see catan.trading.cheapest_trades
+    """
+    ledger = game.ledger()
+    if ledger[player].victory_points > 7:
+        return ()
+    counts = game.hands[player].counts
+    offers = list()
+    for trade_partner in game.players:
+        if player == trade_partner or 'droid' not in trade_partner.name:
+            continue
+        if ledger[trade_partner].victory_points > 7:
+            continue
+        partner_hand = game.hands[trade_partner]
+        partner_next_move = best_win_condition(game, game.board, player=trade_partner, evaluations=evaluations)[0]
+        partner_needs = _build_needs[partner_next_move]
+        for get, resource in enumerate(RESOURCES):
+            if counts[get] >= cost[get] or resource not in partner_hand:
+                continue
+            if resource in partner_needs and (partner_next_move == 'city' or partner_hand.count(resource) < 2):
+                continue
+            for need in partner_needs:
+                give = resource_index(need)
+                if need not in partner_hand and counts[give] > cost[give]:
+                    offers.append((trade_partner, give, get))
+                    break
+    return tuple(offers)
+
+
+def probably_holds(game, player, resource):
+    """
+    Whether a player more likely than not holds a resource, going by the game's
+    catan.beliefs rather than their hand. Games without beliefs, like the spectator's,
+    go by the hand.
+
+    :param resource: Terrain
+    """
+    if game.beliefs is None:
+        return resource in game.hands[player]
+    return game.beliefs.chance_of(player, resource) >= 0.5
 
-    if game_toolbar_frame is not None:
-        game_toolbar_frame.frame_end_turn.on_end_turn()
 
 def find_tradeable_resources(approach_type, hand):
     tradeable_resources = []
@@ -448,151 +407,102 @@ def find_tradeable_resources(approach_type, hand):
     return missing_resources, tradeable_resources
 
 
-def make_trade(user_materials, resource, num, player, board_frame, tradeable_resources):
-    game = board_frame.game
-    traded_resource = None
-    print("{} wants {}!".format(player.name, resource.name))
-
-    for trade_partner in game.hands:
-        if player == trade_partner:
-            continue
-        if 'droid' not in trade_partner.name:
+def best_robber_coord(game, board):
+    """
+    The best tile to move the robber to, see rank_robber_tiles.
+    """
+    return rank_robber_tiles(game, board)[0][0]
+
+
+def robber_target(game):
+    """
+    The player the current player wants to rob: the leader in victory points with cards
+    to steal, or the leader if nobody has any. Never the current player.
+    """
+    player = game.get_cur_player()
+    ledger = game.ledger()
+    ranked_players = [other for other in sorted(ledger, key=lambda p: ledger[p].victory_points, reverse=True)
+                      if other != player]
+    for other in ranked_players:
+        if len(game.hands[other]) > 0:
+            return other
+    # nobody has cards to steal, block the leader instead
+    return ranked_players[0]
+
+
+def rank_robber_tiles(game, board, target=None):
+    """
+    Every tile but the one the robber is on, best to move it to first. A tile scores 1 for
+    each opposing settlement on it and 2 for each city, plus 2 for each of target's
+    buildings, times the ways out of 36 to roll its number. A tile touching the current
+    player's buildings, or with no number, scores at least 100 less.
+
+    Only the buildings on the board are visited, rather than every node of every tile.
+
+    :param target: Player to rob, default robber_target(game)
+    :return: list of (tile_id, score), best first, ties in tile order
+    """
+    player = game.get_cur_player()
+    target = target or robber_target(game)
+    logging.info("{} wants to steal from {}".format(player.name, target.name))
+
+    steal_scores = building_scores(game, board, target)
+    ranked = list()
+    for tile_id in topology.TILE_IDS:
+        if tile_id == game.robber_tile:
             continue
-        if user_materials[trade_partner]['victory_points'] > 7:
-            continue
-        if game.hands[trade_partner].count(resource) >= num:
-            partner_next_moves = best_win_condition(board_frame, game.board, player=trade_partner)
-            if partner_next_moves[0] == 'road':
-                partner_needs = road_needs
-            elif partner_next_moves[0] == 'sett':
-                partner_needs = sett_needs
-            elif partner_next_moves[0] == 'devc':
-                partner_needs = devc_needs
-            elif partner_next_moves[0] == 'city':
-                partner_needs = city_needs
-            for need in partner_needs:
-                if user_materials[player]['victory_points'] > 7:
-                    break
-                if need not in game.hands[trade_partner] and \
-                    need in tradeable_resources and \
-                    (resource not in partner_needs or \
-                    (partner_next_moves[0] != 'city' and
-                    game.hands[trade_partner].count(resource) >= 2)):
-                        traded_resource = need
-                        break
-            if traded_resource:
-                break
+        number = board.tiles[tile_id - 1].number.value
+        if number in catan.actions.ROLL_WAYS and number != 7:
+            score = steal_scores[tile_id] * catan.actions.ROLL_WAYS[number]
+        else:
+            score = steal_scores[tile_id] - 100
+        ranked.append((tile_id, score))
+    ranked.sort(key=operator.itemgetter(1), reverse=True)
+    return ranked
+
+
+def building_scores(game, board, target):
+    """
+    The buildings around each tile, weighted as rank_robber_tiles weights them before the
+    dice: 1 for each opposing settlement and 2 for each city, plus 2 for each of target's
+    buildings, and -100 for each of the current player's. A tile's score is negative
+    exactly when it touches one of the current player's buildings, since the distance
+    rule leaves room for at most three buildings around a tile.
+
+    :param target: Player to rob, or None
+    :return: list of int, indexed by tile id
+    """
+    player = game.get_cur_player()
+    scores = [0] * (len(topology.TILE_IDS) + 1)
+    for owner in game.players:
+        for (_, node), piece in board.owned_pieces(owner).items():
+            if piece.type == PieceType.road:
+                continue
+            if owner == player:
+                weight = -100
             else:
-                print("{} declined the trade for {}".format(trade_partner.name, resource.name))
-
-    if traded_resource:
-        trade = CatanTrade(giver=player, getter=trade_partner)
-        trade.give(traded_resource)
-        trade.get(resource)
-        game.trade(trade)
-        print("{} traded {} for {} with {}".format(player.name, traded_resource.name, resource.name, trade_partner.name))
-        return True
-    return False
-
-
-def best_robber_coord(board_frame, board):
-
-    user_materials = board_frame.game.get_all_user_materials()
-    players_and_scores = []
-
-    for player in user_materials:
-
-        players_and_scores.append((player, user_materials[player]["victory_points"]))
-
-    ranked_players = sorted(players_and_scores, key = lambda x: x[1], reverse=True)
-
-    player_to_steal_from = ranked_players[0][0]
-    i = 1
-    if player_to_steal_from == board_frame.game.get_cur_player():
-        player_to_steal_from = ranked_players[1][0]
-        i = 2
-    try:
-        while len(board_frame.game.hands[player_to_steal_from]) < 1:
-            player_to_steal_from = ranked_players[i][0]
-            i = i + 1
-            # If it's yourself, steal from the next best person
-            if player_to_steal_from == board_frame.game.get_cur_player():
-                player_to_steal_from = ranked_players[i][0]
-                i = i + 1
-    except KeyError:
-        player_to_steal_from = ranked_players[0][0]
-        if player_to_steal_from == board_frame.game.get_cur_player():
-            player_to_steal_from = ranked_players[1][0]
-
-    dots = {2: 1, 3: 2, 4: 3, 5: 4, 6: 5, 8: 5, 9: 4, 10: 3, 11: 2, 12: 1}
-    # Find a dwelling owned by that person, and place the robber on its tile
-
-    steal_scores = dict()
-    print("{} wants to steal from {}".format(board_frame.game.get_cur_player().name, player_to_steal_from.name))
-    for tile_id in range(1, 20):
-        steal_scores[tile_id] = 0
-        for ndir in ['N', 'NE', 'NW', 'SE', 'SW', 'S']:
-            n_coord = hexgrid.from_location(hexgrid.NODE, tile_id, direction=ndir)
-            if (hexgrid.NODE, n_coord) in board_frame.game.board.pieces:
-                if board_frame.game.board.pieces[(hexgrid.NODE, n_coord)].owner == board_frame.game.get_cur_player():
-                    steal_scores[tile_id] -= 100
-                else:
-                    piece_type = board_frame.game.board.pieces[(hexgrid.NODE, n_coord)].type
-                    if piece_type == PieceType.settlement:
-                        steal_scores[tile_id] += 1
-                    elif piece_type == PieceType.city:
-                        steal_scores[tile_id] += 2
-                    if board_frame.game.board.pieces[(hexgrid.NODE, n_coord)].owner == player_to_steal_from:
-                        steal_scores[tile_id] += 2
-        
+                weight = 2 if piece.type == PieceType.city else 1
+                if owner == target:
+                    weight += 2
+            for tile_id in topology.NODE_TILES[node]:
+                scores[tile_id] += weight
+    return scores
 
-        try:
-            steal_scores[tile_id] *= dots[board_frame.game.board.tiles[tile_id - 1].number.value]
-        except KeyError:    #robber tile
-            steal_scores[tile_id] -= 100
-
-    sorted_steal_scores = sorted(steal_scores, key=lambda x: steal_scores[
-                                x], reverse=True)
-    if (2, hexgrid.tile_id_to_coord(sorted_steal_scores[0])) in board.pieces:
-            # This means the robber is already on this tile
-        return sorted_steal_scores[1]
-    else:
-        return sorted_steal_scores[0]
 
 def score_nodes(board):
+    """
+    The ways out of 36 to roll a resource for a settlement on each node, see
+    Board#node_scores. The board works them out once, when it locks.
 
-    scores = {}
-    # loop through tiles to get a "score" for each node based on adjacent tiles
-    for tile_id in range(1, 20):  # tiles go from 1-19
-
-        for cdir in _node_directions:  # check all six nodes next to the tile, add the tile's value to each node's score
-            coord = hexgrid.from_location(
-                hexgrid.NODE, tile_id, direction=cdir)
-            if coord not in scores:
-                scores[coord] = {'score': 0, 'tiles_touching': {tile_id: cdir}}
-
-            if board.tiles[tile_id - 1].number.value is None:
-                # This is the robber tile
-                scores[coord]['tiles_touching'][tile_id] = cdir
-                continue
-
-            if board.tiles[tile_id - 1].number.value > 7:
-                scores[coord]['score'] += 13 - \
-                    board.tiles[tile_id - 1].number.value
-            if board.tiles[tile_id - 1].number.value < 7:
-                scores[coord][
-                    'score'] += board.tiles[tile_id - 1].number.value - 1
-            scores[coord]['tiles_touching'][tile_id] = cdir
-
-    board.scores = scores
-    return scores
+    :return: dict mapping node coord -> int, don't modify it
+    """
+    return board.node_scores()
 
 
 def best_settlement_coord_start(board):
 
     node_scores = score_nodes(board)
-    sorted_node_scores = sorted(node_scores, key=lambda x: node_scores[
-                                x]['score'], reverse=True)
+    sorted_node_scores = board.nodes_by_score()
 
     for coord in sorted_node_scores:
 
@@ -601,102 +511,59 @@ def best_settlement_coord_start(board):
 
         return coord
 
-def best_settlement_coord(board_frame, board):
+def best_settlement_coord(game, board):
 
-    player = board_frame.game.get_cur_player()
-    user_materials = board_frame.game.get_all_user_materials()
-
-    road_coords = user_materials[player]["road"]
-
-    node_scores = score_nodes(board)
-    sorted_node_scores = sorted(node_scores, key=lambda x: node_scores[
-                                x]['score'], reverse=True)
-
-    for coord in sorted_node_scores:
-
-        if is_settlement_taken(board, coord, node_scores):
-            continue
-
-        for rcoord in road_coords:
-            nodes = hexgrid.nodes_touching_edge(rcoord)
-            if coord in nodes:
-                return coord
+    coord = board.best_settlement_node(game.get_cur_player())
 
     #-1 if the player has no valid places to play a settlement
-    return -1
-
-
-def best_road_coord_start(board_frame, board):
-    player = board_frame.game.get_cur_player()
-    user_materials = board_frame.game.get_all_user_materials()
-
-    
-    sett_coords = user_materials[player]["settlement"]
-
-    if len(sett_coords) == 1:
-        road_coords = [sett_coords[0], sett_coords[0] - 16, sett_coords[0] - 17, sett_coords[0] - 1]
-    else:
-        roads_placed = user_materials[player]["road"]
-        if roads_placed[0] in sett_coords or roads_placed[0] + 16 in sett_coords or \
-            roads_placed[0] + 17 in sett_coords or roads_placed[0] + 1 in sett_coords:
-            road_coords = [sett_coords[1], sett_coords[1] - 16, sett_coords[1] - 17, sett_coords[1] - 1]
-        else:
-            road_coords = [sett_coords[0], sett_coords[0] - 16, sett_coords[0] - 17, sett_coords[0] - 1]
-            
-    for item in road_coords:
-        if item not in hexgrid.legal_edge_coords():
-            road_coords.remove(item)
-            break
-
-    random.shuffle(road_coords)
-
+    if coord is None:
+        return -1
+    return coord
+
+
+def best_road_coord_start(game, board):
+    """
+    The road to place in the pregame: an edge off the player's settlement without a road
+    yet, leading to a node where a settlement can still go if there is one, else any edge
+    off it. Ties are broken at random with game.rng.
+
+    :return: edge coord, or 0 if there is no edge to place it on
+    """
+    player = game.get_cur_player()
+    ledger = game.ledger()[player]
+    roads = set(ledger.roads)
+    legal = set(board.legal_road_edges(player))
+    road_coords = [coord for sett_coord in ledger.settlements
+                   if not roads.intersection(topology.NODE_EDGES[sett_coord])
+                   for coord in topology.NODE_EDGES[sett_coord] if coord in legal]
     if not road_coords:
         return 0
-    try:
-        node_scores = board.scores
-    except AttributeError:
-        node_scores = score_nodes(board)
+    game.rng.shuffle(road_coords)
+    node_scores = score_nodes(board)
 
     #if can build settlement 1 road away
     for coord in road_coords:
-        if is_road_taken(board, coord):
-            continue
-
-        for node in hexgrid.nodes_touching_edge(coord):
-            if is_settlement_taken(board, node, node_scores):
-                continue
-
-            if coord // 16 and coord % 2: #sanity checking coordinates
-                continue
-
-                #if new_coord % 16 >= 11 or new_coord // 16 >= 11 or new_coord % 16 <= 1 or new_coord == 96 or new_coord == 130 or new_coord == 164 or new_coord == 6 or new_coord == 40 or new_coord == 74: #sanity checking coordinates
-            if coord // 16 <= 1 or coord // 16 >= 13 or coord % 16 <= 1 or coord % 16 >= 13 or coord in [40,74,108,130,164,198]:
-
-                continue
-
-            else:
-
+        for node in topology.EDGE_NODES[coord]:
+            if not is_settlement_taken(board, node, node_scores):
                 return coord
 
-
     #otherwise build any road you can
-    for coord in road_coords:
-
-        if is_road_taken(board, coord):
-            continue
-
-        if coord // 16 and coord % 2: #sanity checking coordinates
-            continue
-
-            #if new_coord % 16 >= 13 or new_coord // 16 >= 11 or new_coord % 16 <= 1 or new_coord == 98 or new_coord == 132 or new_coord == 166: #sanity checking coordinates
-            #if new_coord % 16 >= 11 or new_coord // 16 >= 11 or new_coord % 16 <= 1 or new_coord == 96 or new_coord == 130 or new_coord == 164 or new_coord == 6 or new_coord == 40 or new_coord == 74: #sanity checking coordinates
-        if coord // 16 <= 1 or coord // 16 >= 13 or coord % 16 <= 1 or coord % 16 >= 13 or coord in [40,74,108,130,164,198]:
-            continue
-
-        else:
-
+    return road_coords[0]
+
+
+def any_road_coord_start(game):
+    """
+    Fallback for best_road_coord_start: the first free edge touching the current player's
+    newest settlement.
+    """
+    player = game.get_cur_player()
+    sett_coord = game.get_all_user_materials()[player]["settlement"][-1]
+    legal = set(game.board.legal_road_edges(player))
+    for coord in topology.NODE_EDGES[sett_coord]:
+        if coord in legal:
             return coord
 
+
 def is_road_taken(board, coord):
 
     if (hexgrid.EDGE, coord) in board.pieces:
@@ -704,183 +571,41 @@ def is_road_taken(board, coord):
     return False
 
 
-
-    '''for (typ, coord), piece in reversed(list(board.pieces.items())):
-
-        if typ != hexgrid.NODE:
-            continue
-
-        if piece.owner is None:
-            continue
-
-        if "droid" not in piece.owner.name:
-            continue
-
-        return coord  # basic road placement'''
-
 def best_city_coord(user_materials, player, board):
-    node_scores = score_nodes(board)
-    sorted_node_scores = sorted(node_scores, key=lambda x: node_scores[
-                                x]['score'], reverse=True)
-    for node_coord in sorted_node_scores:
+    for node_coord in board.nodes_by_score():
         if node_coord in user_materials[player]['settlement']:
             return node_coord
 
     return None
 
 
-def best_road_coord(board_frame, board):
-
-    legal_roads = [34, 35, 36, 37, 38, 39, 50, 52, 54, 56, 66, 67, 68, 69, 70, 71, 
-            72, 73, 82, 84, 86, 88, 90, 98, 99, 100, 101, 102, 103, 104, 105,
-            106, 107, 114, 116, 118, 120, 122, 124, 131, 132, 133, 134, 135,
-            136, 137, 138, 139, 140, 148, 150, 152, 154, 156, 165, 166, 167,
-            168, 169, 170, 171, 172, 182, 184, 186, 188, 199, 200, 201, 202,
-            203, 204]
-    player = board_frame.game.get_cur_player()
-    user_materials = board_frame.game.get_all_user_materials()
-
-    road_coords = user_materials[player]["road"]
-    if not road_coords:
-        return 0
-
-    _offsets = [
-        -16,
-        -17,
-        -1,
-        +16,
-        +17,
-        +1,
-    ]
-
-    node_scores = score_nodes(board)
-
-    #if can build settlement 1 road away
-    for coord in road_coords:
-        for offset in _offsets:
-
-            new_coord = coord + offset
-            if new_coord not in legal_roads:
-                continue
-
-            if is_road_taken(board, new_coord):
-                continue
-
-            for node in hexgrid.nodes_touching_edge(new_coord):
-
-                if is_settlement_taken(board, node, node_scores):
-                    continue
-
-                
-
-                else:
+def best_road_coord(game, board):
+    """
+    The next road toward the best settlement spot the player's roads could reach, see
+    Board#road_targets, or else any road they can build.
 
-                    return new_coord
+    :return: edge coord, or 0 if the player can't build a road
+    """
+    player = game.get_cur_player()
+    for node, path in board.road_targets(player):
+        if path:
+            return path[0]
 
     #otherwise build any road you can
-    for coord in road_coords:
-
-        for offset in _offsets:
-
-            new_coord = offset + coord
-
-            if new_coord not in legal_roads:
-                continue
-
-            if is_road_taken(board, coord+offset):
-
-                continue
-
-            else:
-
-                return coord+offset
-
-def is_road_taken(board, coord):
-
-    if (hexgrid.EDGE, coord) in board.pieces:
-        return True
-    return False
+    edges = board.legal_road_edges(player)
+    if not edges:
+        return 0
+    return edges[0]
 
 
 def is_settlement_taken(board, node_coord, sorted_node_scores):
-    if (hexgrid.NODE, node_coord) in board.pieces:
-        return True
+    """
+    Whether a settlement can't go on the node: it's off the scored nodes, or it or a
+    neighbouring node (the distance rule) already has a settlement or city.
+    """
     if node_coord not in sorted_node_scores:
         return True
-    # need to look for surrounding settlements
-    if len(sorted_node_scores[node_coord]['tiles_touching']) == 3:
-        for tile_id in sorted_node_scores[node_coord]['tiles_touching']:
-            cdir = sorted_node_scores[node_coord]['tiles_touching'][tile_id]
-            if cdir == 'SE':
-                ndir = 'NE'
-            elif cdir == 'N':
-                ndir = 'NW'
-            elif cdir == 'SW':
-                ndir = 'S'
-            elif cdir == 'S':
-                ndir = 'SW'
-            elif cdir == 'NE':
-                ndir = 'SE'
-            elif cdir == 'NW':
-                ndir = 'N'
-            coord = hexgrid.from_location(hexgrid.NODE, tile_id, direction=ndir)
-            if (hexgrid.NODE, coord) in board.pieces:
-                return True
-    elif len(sorted_node_scores[node_coord]['tiles_touching']) == 2:
-        tile_ids = []
-        dirs = []
-        for tile_id in sorted_node_scores[node_coord]['tiles_touching']:
-            dirs.append(sorted_node_scores[node_coord]['tiles_touching'][tile_id])
-            tile_ids.append(tile_id)
-        if 'SW' in dirs and 'N' in dirs:
-            to_check = {tile_ids[dirs.index('SW')]: ['NW', 'S'],
-                        tile_ids[dirs.index('N')]: ['NW']}
-        elif 'S' in dirs and 'NW' in dirs:
-            to_check = {tile_ids[dirs.index('S')]: ['SW', 'SE'],
-                        tile_ids[dirs.index('NW')]: ['SW']}
-        elif 'SE' in dirs and 'SW' in dirs:
-            to_check = {tile_ids[dirs.index('SE')]: ['S', 'NE'],
-                        tile_ids[dirs.index('SW')]: ['S']}
-        elif 'NE' in dirs and 'S' in dirs:
-            to_check = {tile_ids[dirs.index('NE')]: ['N', 'SE'],
-                        tile_ids[dirs.index('S')]: ['SE']}
-        elif 'N' in dirs and 'SE' in dirs:
-            to_check = {tile_ids[dirs.index('N')]: ['NE', 'NW'],
-                        tile_ids[dirs.index('SE')]: ['NE']}
-        elif 'NW' in dirs and 'NE' in dirs:
-            to_check = {tile_ids[dirs.index('NW')]: ['N', 'SW'],
-                        tile_ids[dirs.index('NE')]: ['N']}
-
-        for tile_id in to_check:
-            for ndir in to_check[tile_id]:
-                coord = hexgrid.from_location(hexgrid.NODE, tile_id, direction=ndir)
-                if (hexgrid.NODE, coord) in board.pieces:
-                    return True
-    else:
-        for tile_id in sorted_node_scores[node_coord]['tiles_touching']:
-            t = tile_id
-            d = sorted_node_scores[node_coord]['tiles_touching'][tile_id]
-        if d == 'N':
-            to_check = {t: ['NW', 'NE']}
-        elif d == 'NE':
-            to_check = {t: ['N', 'SE']}
-        elif d == 'SE':
-            to_check = {t: ['NE', 'S']}
-        elif d == 'S':
-            to_check = {t: ['SE', 'SW']}
-        elif d == 'SW':
-            to_check = {t: ['S', 'NW']}
-        elif d == 'NW':
-            to_check = {t: ['SW', 'N']}
-        for ndir in to_check[t]:
-            coord = hexgrid.from_location(hexgrid.NODE, t, direction=ndir)
-            if (hexgrid.NODE, coord) in board.pieces:
-                return True
-
-
-
-
-    return False
+    return not board.settlement_allowed(node_coord)
 
 
 def get_user_pieces(board):
@@ -902,14 +627,37 @@ def get_user_pieces(board):
     return user_pieces
 
 
-def best_win_condition(board_frame,board,player=None):
+def best_win_condition(game, board, player=None, factors=None, evaluations=None):
+    """
+    Rank the builds for a player, best first.
 
-    # BASIC HIGH LEVEL STRATEGY
+    Pass the same evaluations dict to every call in a turn, and a player is only evaluated
+    again once their hand or a piece on the board has changed, since the result depends on
+    nothing else. Don't share it between calls with different factors for the same player.
 
-    user_materials = board_frame.game.get_all_user_materials()  # Will be modified!
+    :param player: Player, default the current player
+    :param factors: starting factors, dict, default DEFAULT_FACTORS
+    :param evaluations: dict to memoize results in, keyed by (player, hand counts, board
+    hash), default None, don't memoize
+    :return: list of "sett", "road", "city" and "devc", best first
+    """
     if not player:
-        player = board_frame.game.get_cur_player()
-    tile_ids = [tile_id for tile_id in range(1, 20)]
+        player = game.get_cur_player()
+    if evaluations is None:
+        return _best_win_condition(game, board, player, factors)
+    key = (player, game.hands[player].counts, board.zobrist_hash())
+    next_moves = evaluations.get(key)
+    if next_moves is None:
+        next_moves = evaluations[key] = _best_win_condition(game, board, player, factors)
+    return list(next_moves)
+
+
+def _best_win_condition(game, board, player, factors):
+
+    # BASIC HIGH LEVEL STRATEGY
+    factors = factors or DEFAULT_FACTORS
+
+    user_materials = game.get_all_user_materials()  # Will be modified!
 
     # TODO(anyone): Implement ports
 
@@ -918,9 +666,9 @@ def best_win_condition(board_frame,board,player=None):
     #     tile_id = hexgrid.nearest_tile_to_node_using_tiles(
     #         tile_ids, settlement_coord)
 
-    #     tile_number = board_frame._board.tiles[
+    #     tile_number = board.tiles[
     #         tile_id - 1].number.value
-    #     tile_terrain = board_frame._board.tiles[
+    #     tile_terrain = board.tiles[
     #         tile_id - 1].terrain.value
 
     #     if tile_number is None:
@@ -939,9 +687,9 @@ def best_win_condition(board_frame,board,player=None):
     #     tile_id = hexgrid.nearest_tile_to_node_using_tiles(
     #         tile_ids, city_coord)
 
-    #     tile_number = board_frame._board.tiles[
+    #     tile_number = board.tiles[
     #         tile_id - 1].number.value
-    #     tile_terrain = board_frame._board.tiles[
+    #     tile_terrain = board.tiles[
     #         tile_id - 1].terrain.value
 
     #     if tile_number is None:
@@ -967,6 +715,14 @@ def best_win_condition(board_frame,board,player=None):
     devc = (user_materials[player]["resources"].count(catanboard.Terrain.ore) + user_materials[player]
             ["resources"].count(catanboard.Terrain.wheat) + user_materials[player]["resources"].count(catanboard.Terrain.sheep)) / 3
 
+    # Look past the hand: the chance the player's buildings pay for each build in time
+    forecast_weight = factors.get("forecast", 0)
+    if forecast_weight:
+        forecast = catan.production.build_probabilities(game, player, turns=FORECAST_TURNS)
+        sett += forecast_weight * forecast['settlement'][-1]
+        road += forecast_weight * forecast['road'][-1]
+        city += forecast_weight * forecast['city'][-1]
+        devc += forecast_weight * forecast['dev_card'][-1]
 
     # TODO(bouch): Update the player's factors here (they start at 1)
     # You might have to scan the hexgrid to see what exactly you want to prioritize.
@@ -979,12 +735,11 @@ def best_win_condition(board_frame,board,player=None):
     for settlement_coord in user_materials[player]["settlement"]:
 
         curr_settlement_score = 0
-        tile_id = hexgrid.nearest_tile_to_node_using_tiles(
-            tile_ids, settlement_coord)
+        tile_id = topology.NODE_TILES[settlement_coord][0]
 
-        tile_number = board_frame._board.tiles[
+        tile_number = board.tiles[
             tile_id - 1].number.value
-        tile_terrain = board_frame._board.tiles[
+        tile_terrain = board.tiles[
             tile_id - 1].terrain.value
 
         if tile_number is None:
@@ -1000,17 +755,13 @@ def best_win_condition(board_frame,board,player=None):
             best_settlement_score = curr_settlement_score
 
     if "factors" not in user_materials[player]:
-        user_materials[player]["factors"] = {}
-        user_materials[player]["factors"]["sett"] = 1
-        user_materials[player]["factors"]["road"] = 1
-        user_materials[player]["factors"]["city"] = 1
-        user_materials[player]["factors"]["devc"] = 1
+        user_materials[player]["factors"] = dict(factors)
 
     user_materials[player]["factors"]["city"] += 0.2 * (best_settlement_score) - 1.6 # neutral factor if you have a sett with 8 dots
 
     #ROAD FACTORS
     longest_road = 4
-    for p in board_frame.game.players:
+    for p in game.players:
         road_length = user_materials[p]["longest_road"]
         if road_length > longest_road:
             longest_road = road_length
@@ -1032,7 +783,10 @@ def best_win_condition(board_frame,board,player=None):
 
     #SETTLEMENT FACTORS
     # Settlement factor based on best available settlement score
-    user_materials[player]["factors"]["sett"] += 0.2 * (board.scores[best_settlement_coord_start(board)]['score']) - 1.6
+    # No free node anywhere scores 0
+    best_start = best_settlement_coord_start(board)
+    best_start_score = score_nodes(board)[best_start] if best_start is not None else 0
+    user_materials[player]["factors"]["sett"] += 0.2 * best_start_score - 1.6
     #QUASI BUILD ORDER
     if len(user_materials[player]["road"]) > 2 and len(user_materials[player]["settlement"]) < 3:
         user_materials[player]["factors"]["sett"] += 10
@@ -1049,10 +803,7 @@ def best_win_condition(board_frame,board,player=None):
     factored_devc = devc * user_materials[player]["factors"]["devc"]
 
     #RESET FACTORS AFTER EVERY TURN
-    user_materials[player]["factors"]["sett"] = 1
-    user_materials[player]["factors"]["road"] = 1
-    user_materials[player]["factors"]["city"] = 1
-    user_materials[player]["factors"]["devc"] = 1
+    user_materials[player]["factors"] = dict(factors)
 
 
     # TODO(everybody): Should we pass instead of make a move here?
@@ -1072,3 +823,329 @@ def best_win_condition(board_frame,board,player=None):
     ordered_next_moves = [k for k, v in sorted(next_moves.items(), key=lambda item: item[1])]
     ordered_next_moves.reverse()
     return ordered_next_moves
+
+
+# Victory points each resource card left in hand is worth at the end of an expectimax lookahead
+EXPECTIMAX_CARD_VALUE = 0.1
+# Victory points each development card held is worth to expectimax, whatever it turns out to be
+EXPECTIMAX_DEV_CARD_VALUE = 0.4
+
+# Builds expectimax tries, by the names best_win_condition gives them, in the order it makes
+# them within a turn. Roads come first, since they open up nodes for settlements.
+_expectimax_builds = {
+    'buy_road': (0, 'road'),
+    'buy_settlement': (1, 'sett'),
+    'buy_city': (2, 'city'),
+    'buy_dev_card': (3, 'devc'),
+}
+# Cards of each resource a cap grows by at least, when expectimax has to plan again for a
+# bigger hand than it planned for, so that it doesn't have to again and again
+_EXPECTIMAX_CAP_SLACK = 2
+
+
+def expectimax_builds(game, turns=1, memo=None):
+    """
+    Compare the builds the current player can afford by expectimax over the dice, looking
+    ahead the given number of the player's turns.
+
+    Between two of the player's turns every player rolls once. The hands those rolls can
+    leave the player with are weighted by the exact odds of each 2d6 total (see
+    catan.actions.ROLL_WAYS), and paid out the way Game#roll pays (see Game#roll_payouts).
+    On a 7, a hand of more than 7 cards loses half of them, the most plentiful first, and
+    the robber stays put. On each turn ahead the player makes whichever builds do best, and
+    after the last the position is worth its victory points, plus EXPECTIMAX_CARD_VALUE per
+    resource card and EXPECTIMAX_DEV_CARD_VALUE per dev card held. Trades and dev cards
+    aren't played.
+
+    Each kind of build is tried once per turn, at the best node by score_nodes, or for a
+    road, next to the best free node. Chance nodes are memoized by a Zobrist hash of what
+    they depend on: the pieces, the robber and the player's cards. Victory points, and the
+    builds to try for each set of builds the player can afford, are cached by the board's
+    hash, since most of the hands the dice can deal leave the pieces as they are, and the
+    last turn ahead is solved once per position rather than once per hand.
+
+    :param game: Game, after the current player's roll
+    :param turns: turns to look ahead. 1 takes tens of milliseconds, 2 most of a second,
+    sometimes several seconds.
+    :param memo: dict to memoize chance nodes in, which can be shared between calls on the
+    same game, default a new one
+    :return: dict mapping build ("sett", "road", "city", "devc", or None for building
+    nothing) -> expected value, in victory points, for each build the player can afford
+    """
+    search = _Expectimax(game, memo)
+    with game.detached():
+        values = {None: search.stop(turns)}
+        for _, build, action in search.builds():
+            token = game.apply(action)
+            try:
+                values[build] = search.value(turns)
+            finally:
+                game.unapply(token)
+    return values
+
+
+def expectimax_win_condition(game, board, turns=1, factors=None, memo=None, evaluations=None):
+    """
+    best_win_condition, except that builds the player can afford now come first when
+    expectimax_builds expects them to do better than building nothing, best first.
+
+    :return: list of "sett", "road", "city" and "devc", best first
+    """
+    next_moves = best_win_condition(game, board, factors=factors, evaluations=evaluations)
+    values = expectimax_builds(game, turns=turns, memo=memo)
+    worth_it = sorted((build for build in values if build is not None and values[build] > values[None]),
+                      key=lambda build: values[build], reverse=True)
+    return worth_it + [build for build in next_moves if build not in worth_it]
+
+
+class _Expectimax(object):
+    """
+    class _Expectimax holds what one expectimax_builds search shares: the game, whose turn
+    it is, the node scores, the memo, and caches by board hash.
+    """
+    def __init__(self, game, memo=None):
+        self.game = game
+        self.player = game.get_cur_player()
+        self.hand = game.hands[self.player]
+        self.scores = score_nodes(game.board)
+        self.memo = memo if memo is not None else dict()
+        self._victory_points = dict()
+        self._builds = dict()
+        self._plans = dict()
+        self._best_plans = dict()
+
+    def value(self, turns, first=0):
+        """
+        Max node: the best of building nothing more this turn, and each build the player
+        can afford. Builds are made in the order of _expectimax_builds, so that the same
+        builds in another order aren't searched again. Memoized like chance nodes, since
+        different rolls often deal the same hand.
+
+        :param first: order of the first kind of build still to try this turn
+        """
+        if not turns:
+            counts = self.hand.counts
+            self.plans(counts)
+            return self.best_plan(counts)
+        key = (self.key(), turns, first)
+        best = self.memo.get(key)
+        if best is None:
+            game = self.game
+            best = self.stop(turns)
+            for order, _, action in self.builds():
+                if order < first:
+                    continue
+                token = game.apply(action)
+                try:
+                    best = max(best, self.value(turns, order))
+                finally:
+                    game.unapply(token)
+            self.memo[key] = best
+        return best
+
+    def stop(self, turns):
+        """
+        The value of ending the turn here: the chance node of the rolls until the player's
+        next turn, or the position itself if there are no more turns to look ahead.
+        """
+        if not turns:
+            return self.leaf()
+        key = (self.key(), turns)
+        value = self.memo.get(key)
+        if value is None:
+            counts = self.hand.counts
+            hands = self.rolls(counts)
+            if turns == 1:
+                self.plans(tuple(map(max, *hands)) if len(hands) > 1 else counts)
+                value = sum(chance * self.best_plan(after) for after, chance in hands.items())
+            else:
+                value = 0.0
+                try:
+                    for after, chance in hands.items():
+                        self.hand.set_counts(after)
+                        value += chance * self.value(turns - 1)
+                finally:
+                    self.hand.set_counts(counts)
+            self.memo[key] = value
+        return value
+
+    def leaf(self):
+        return (self.victory_points()
+                + EXPECTIMAX_CARD_VALUE * len(self.hand)
+                + EXPECTIMAX_DEV_CARD_VALUE * len(self.game.dev_hands[self.player]))
+
+    def victory_points(self):
+        board_hash = self.game.board.zobrist_hash()
+        points = self._victory_points.get(board_hash)
+        if points is None:
+            points = self._victory_points[board_hash] = self.game.ledger()[self.player].victory_points
+        return points
+
+    def best_plan(self, counts):
+        """
+        Max node of the last turn ahead, where only what the builds are worth right away
+        counts, so the best of the plans the hand can pay for is the best the player can do.
+        Cached by position and hand, since the same hands come up again and again.
+
+        :param counts: the player's resource counts, which #plans has been called with a cap
+        of at least
+        """
+        key = (self.plans_key(), counts)
+        value = self._best_plans.get(key)
+        if value is None:
+            for cost, value in self._plans[key[0]][1]:
+                if all(map(operator.le, cost, counts)):
+                    break
+            self._best_plans[key] = value
+        return (value
+                + EXPECTIMAX_CARD_VALUE * sum(counts)
+                + EXPECTIMAX_DEV_CARD_VALUE * len(self.game.dev_hands[self.player]))
+
+    def plans(self, cap):
+        """
+        Every sequence of builds from this position which cap pays for, so that the last
+        turn ahead is solved once per position rather than once per hand the dice deal.
+        Cached by the board's hash and the size of the dev card deck, and found again with a
+        bigger cap when a hand holds more than the cached cap.
+
+        :param cap: resource counts to spend at most
+        :return: list of (cost, value): the resource counts a plan spends, and the value of
+        the position it reaches less the cards spent, best first. Plans which cost at least
+        as much as a better one are left out. Building nothing costs nothing, so every hand
+        can pay for some plan.
+        """
+        key = self.plans_key()
+        cached = self._plans.get(key)
+        if cached is not None:
+            if all(map(operator.le, cap, cached[0])):
+                return cached[1]
+            cap = tuple(max(want, had + _EXPECTIMAX_CAP_SLACK) for want, had in zip(cap, cached[0]))
+        counts = self.hand.counts
+        self.hand.set_counts(cap)
+        plans = dict()
+        try:
+            self._plan(cap, plans)
+        finally:
+            self.hand.set_counts(counts)
+        frontier = list()
+        for cost, value in sorted(plans.values(), key=lambda plan: plan[1], reverse=True):
+            if not any(all(map(operator.le, better, cost)) for better, _ in frontier):
+                frontier.append((cost, value))
+        self._plans[key] = (cap, frontier)
+        return frontier
+
+    def plans_key(self):
+        return self.game.board.zobrist_hash(), len(self.game.dev_deck)
+
+    def _plan(self, cap, plans, first=0):
+        """
+        Add the plans from here to plans. Dev cards don't change the board, so rather than
+        being bought one by one, each plan is followed by as many as the rest of cap pays for.
+        """
+        game = self.game
+        spent = tuple(map(operator.sub, cap, self.hand.counts))
+        board_hash = game.board.zobrist_hash()
+        points = self.victory_points()
+        for bought in range(len(game.dev_deck) + 1):
+            if bought:
+                spent = tuple(map(operator.add, spent, _build_costs['devc']))
+                if not all(map(operator.le, spent, cap)):
+                    break
+            plans[(spent, board_hash)] = (spent, points + EXPECTIMAX_DEV_CARD_VALUE * bought
+                                          - EXPECTIMAX_CARD_VALUE * sum(spent))
+        for order, build, action in self.builds():
+            if order < first or build == 'devc':
+                continue
+            token = game.apply(action)
+            try:
+                self._plan(cap, plans, order)
+            finally:
+                game.unapply(token)
+
+    def key(self):
+        """
+        :return: Zobrist hash of the pieces, the robber and the player's cards
+        """
+        game = self.game
+        player = self.player
+        return (game.board.zobrist_hash()
+                ^ self.hand.zobrist_hash()
+                ^ catan.zobrist.dev_cards_key(player.seat, tuple(sorted(game.dev_hands[player])),
+                                              game.knights_played[player])
+                ^ catan.zobrist.robber_key(game.robber_tile))
+
+    def builds(self):
+        """
+        :return: list of (order, build, Action), one per kind of build the player can
+        afford now, in the order of _expectimax_builds
+        """
+        game = self.game
+        board = game.board
+        counts = self.hand.counts
+        key = (board.zobrist_hash(), bool(game.dev_deck),
+               tuple(all(map(operator.le, cost, counts)) for cost in _build_costs.values()))
+        builds = self._builds.get(key)
+        if builds is not None:
+            return builds
+        best = dict()
+        for action in game.legal_actions():
+            if action.name not in _expectimax_builds:
+                continue
+            order, build = _expectimax_builds[action.name]
+            score = 0
+            if build in ('sett', 'city'):
+                score = self.scores[action.args[0]]
+            elif build == 'road':
+                score = max([self.scores[node] for node in topology.EDGE_NODES[action.args[0]]
+                             if board.settlement_allowed(node)] or [0])
+            if build not in best or score > best[build][1]:
+                best[build] = (order, score, action)
+        builds = self._builds[key] = sorted((order, build, action) for build, (order, _, action) in best.items())
+        return builds
+
+    def rolls(self, counts):
+        """
+        The hands the player can hold by their next turn, one roll per player from now.
+        Totals which pay the player the same cards, most often none, are taken together.
+
+        :param counts: the player's resource counts now, in catan.hand.RESOURCES order
+        :return: dict mapping resource counts -> probability
+        """
+        outcomes = dict()
+        for roll, ways in catan.actions.ROLL_WAYS.items():
+            gain = None
+            if roll != 7:
+                gain = [0] * len(RESOURCES)
+                for owner, terrain, count in self.game.roll_payouts(roll):
+                    if owner == self.player:
+                        gain[resource_index(terrain)] += count
+                gain = tuple(gain)
+            outcomes[gain] = outcomes.get(gain, 0) + ways / 36
+
+        hands = {tuple(counts): 1.0}
+        for _ in self.game.players:
+            after_roll = dict()
+            for hand, chance in hands.items():
+                for gain, odds in outcomes.items():
+                    if gain is None:
+                        after = _discard_half(hand)
+                    else:
+                        after = tuple(map(operator.add, hand, gain))
+                    after_roll[after] = after_roll.get(after, 0.0) + chance * odds
+            hands = after_roll
+        return hands
+
+
+def _discard_half(counts):
+    """
+    :param counts: resource counts
+    :return: the counts after a 7, the most plentiful resources discarded first
+    """
+    size = sum(counts)
+    if size <= 7:
+        return counts
+    counts = list(counts)
+    for _ in range(size // 2):
+        most = counts.index(max(counts))
+        counts[most] -= 1
+    return tuple(counts)
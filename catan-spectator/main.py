@@ -5,8 +5,10 @@ import argparse
 import sys
 sys.path.insert(1, 'catan')
 import catan.board
+import catan.mcts
 from catan.game import Game
 import time
+import droid_behavior
 import views
 
 
@@ -77,6 +79,11 @@ def main():
     parser.add_argument('--players', help='random|preset|empty|debug, default preset')
     parser.add_argument('--pregame', help='on|off, default on')
     parser.add_argument('--use_stdout', help='write to stdout', action='store_true')
+    parser.add_argument('--droid', help='greedy|mcts, how droids decide, default greedy')
+    parser.add_argument('--droid_budget', type=float, default=catan.mcts.BUDGET,
+                        help='seconds an mcts droid thinks per decision, default {}'.format(catan.mcts.BUDGET))
+    parser.add_argument('--droid_workers', type=int, default=1,
+                        help='processes an mcts droid thinks with, default 1')
 
     args = parser.parse_args()
     options = {
@@ -90,6 +97,9 @@ def main():
         'use_stdout': args.use_stdout
     }
     #logging.info('args=\n{}'.format(pprint.pformat(options)))
+    if args.droid == 'mcts':
+        droid_behavior.droid_strategy = catan.mcts.MctsStrategy(budget=args.droid_budget,
+                                                                  workers=args.droid_workers)
     app = CatanSpectator(options=options)
     app.mainloop()
 
@@ -21,6 +21,9 @@ setup(name="catan-spectator",
       entry_points={
           'gui_scripts': [
               'catan-spectator = main:main'
+          ],
+          'console_scripts': [
+              'catan-tournament = tournament:main'
           ]
       },
       py_modules=[
@@ -28,6 +31,8 @@ setup(name="catan-spectator",
           'views',
           'views_trading',
           'tkinterutils',
+          'droid_behavior',
+          'tournament',
       ],
       install_requires=[
           'catan ~= 0.4',
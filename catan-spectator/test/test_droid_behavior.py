@@ -0,0 +1,173 @@
+import itertools
+import random
+
+import hexgrid
+import catan.actions
+import catan.boardbuilder
+import droid_behavior
+from catan.game import BUILD_COSTS, Game, Player
+from catan import topology
+from catan.hand import resource_index
+
+
+def _new_game(seed):
+    board = catan.boardbuilder.build(rng=random.Random(seed))
+    game = Game(board=board, logging='off', undo='off', seed=seed)
+    game.start([Player(1, 'yurick', 'green'),
+                Player(2, 'josh', 'blue'),
+                Player(3, 'zach', 'orange'),
+                Player(4, 'ross', 'red')])
+    return game
+
+
+def _midgame(seed, steps=300):
+    """
+    A position after the current player's roll, reached by random legal actions.
+    """
+    game = _new_game(seed)
+    rng = random.Random(seed)
+    for _ in range(steps):
+        game.apply(rng.choice(game.legal_actions()))
+    while game.state.can_roll() or not game.state.can_end_turn():
+        game.apply(rng.choice([action for action in game.legal_actions() if action.name != 'end_turn']))
+    return game
+
+
+def _builds(game):
+    # a new search each time, so that none of its caches are used
+    return droid_behavior._Expectimax(game).builds()
+
+
+def _discard(hand):
+    size = sum(hand)
+    if size <= 7:
+        return hand
+    for _ in range(size // 2):
+        hand[hand.index(max(hand))] -= 1
+    return hand
+
+
+def _roll_hands(game, player, counts):
+    """
+    Every sequence of one roll per player, rolled out one by one.
+    """
+    gains = dict()
+    for roll in catan.actions.ROLL_WAYS:
+        if roll != 7:
+            gains[roll] = [(resource_index(terrain), count)
+                           for owner, terrain, count in game.roll_payouts(roll) if owner == player]
+    hands = dict()
+    for rolls in itertools.product(catan.actions.ROLL_WAYS, repeat=len(game.players)):
+        chance = 1.0
+        hand = list(counts)
+        for roll in rolls:
+            chance *= catan.actions.ROLL_WAYS[roll] / 36
+            if roll == 7:
+                hand = _discard(hand)
+            else:
+                for resource, count in gains[roll]:
+                    hand[resource] += count
+        hands[tuple(hand)] = hands.get(tuple(hand), 0.0) + chance
+    return hands
+
+
+class _BruteForce(object):
+    """
+    expectimax_builds(turns=1) with no memo and no caches: every set of builds on this turn
+    and the next, made in the order of _expectimax_builds, with every roll of every player
+    in between.
+    Dev cards on the last turn are worth EXPECTIMAX_DEV_CARD_VALUE rather than drawn.
+    """
+    def __init__(self, game):
+        self.game = game
+        self.player = game.get_cur_player()
+        self.hand = game.hands[self.player]
+
+    def values(self):
+        game = self.game
+        values = {None: self.chance()}
+        for _, build, action in _builds(game):
+            token = game.apply(action)
+            # any kind of build can follow the first, as in expectimax_builds
+            values[build] = self.first_turn(0)
+            game.unapply(token)
+        return values
+
+    def first_turn(self, first):
+        game = self.game
+        best = self.chance()
+        for order, _, action in _builds(game):
+            if order >= first:
+                token = game.apply(action)
+                best = max(best, self.first_turn(order))
+                game.unapply(token)
+        return best
+
+    def chance(self):
+        counts = self.hand.counts
+        value = 0.0
+        for after, chance in _roll_hands(self.game, self.player, counts).items():
+            self.hand.set_counts(after)
+            value += chance * self.last_turn(0, 0)
+        self.hand.set_counts(counts)
+        return value
+
+    def last_turn(self, first, dev_cards):
+        game = self.game
+        best = (game.ledger()[self.player].victory_points
+                + droid_behavior.EXPECTIMAX_CARD_VALUE * len(self.hand)
+                + droid_behavior.EXPECTIMAX_DEV_CARD_VALUE * (len(game.dev_hands[self.player]) + dev_cards))
+        for order, build, action in _builds(game):
+            if order < first:
+                continue
+            if build == 'devc':
+                if dev_cards < len(game.dev_deck):
+                    counts = self.hand.counts
+                    self.hand.set_counts(tuple(have - need for have, need in zip(counts, BUILD_COSTS['dev_card'])))
+                    best = max(best, self.last_turn(order, dev_cards + 1))
+                    self.hand.set_counts(counts)
+                continue
+            token = game.apply(action)
+            best = max(best, self.last_turn(order, dev_cards))
+            game.unapply(token)
+        return best
+
+
+def test_expectimax_builds_matches_brute_force():
+    for seed, counts in ((0, (2, 2, 1, 2, 3)), (1, (3, 3, 2, 2, 0)), (2, (1, 1, 3, 1, 4))):
+        game = _midgame(seed)
+        player = game.get_cur_player()
+        game.hands[player].set_counts(counts)
+        # knights only, so that the cards the first turn buys don't change the victory points
+        game.dev_deck = ['Knight'] * 2
+        expected = _BruteForce(game).values()
+        assert len(expected) > 2
+        values = droid_behavior.expectimax_builds(game, turns=1)
+        assert set(values) == set(expected)
+        for build, value in expected.items():
+            assert abs(values[build] - value) < 1e-9, (seed, build, values, expected)
+        assert game.hands[player].counts == counts
+
+
+def test_discard_half():
+    assert droid_behavior._discard_half((1, 2, 3, 1, 0)) == (1, 2, 3, 1, 0)
+    assert droid_behavior._discard_half((4, 0, 4, 0, 0)) == (2, 0, 2, 0, 0)
+    assert droid_behavior._discard_half((1, 5, 2, 1, 0)) == (1, 1, 2, 1, 0)
+    assert droid_behavior._discard_half((3, 3, 3, 0, 0)) == (1, 2, 2, 0, 0)
+
+
+def test_should_play_knight():
+    for seed in range(3):
+        game = _new_game(seed)
+        rng = random.Random(seed)
+        for _ in range(300):
+            game.apply(rng.choice(game.legal_actions()))
+            if not game.state.can_play_knight():
+                continue
+            player = game.get_cur_player()
+            owners = [game.board.pieces[(hexgrid.NODE, node)].owner
+                      for node in topology.TILE_NODES[game.robber_tile]
+                      if (hexgrid.NODE, node) in game.board.pieces]
+            # the robber is on one of the player's tiles, or a third knight is worth playing
+            expected = player in owners or (bool(owners) and game.knights_played[player] == 2)
+            assert droid_behavior.should_play_knight(game) == expected
@@ -0,0 +1,306 @@
+"""
+module tournament plays many headless droid games in parallel and reports win rates.
+
+Each bot configuration is a set of starting factors for droid_behavior.best_win_condition,
+or, given a budget, a Monte Carlo tree search bot (see module catan.mcts). Games are
+sharded across a process pool; every worker builds its own board and game, so nothing is
+shared between processes. Seats rotate from game to game so that no configuration always
+moves first.
+
+    catan-tournament --games 1000 --config baseline --config roads:road=2,sett=0.5
+    catan-tournament --games 100 --config baseline --config mcts:budget=0.2
+
+Results stream back as games finish. Search bots also report their playouts and nodes per
+second, to weigh strength against time per move.
+"""
+import argparse
+import concurrent.futures
+import logging
+import random
+import sys
+import time
+sys.path.insert(1, 'catan')
+import catan.boardbuilder
+import catan.mcts
+import catan.simulation
+from catan.game import Game, Player
+import droid_behavior
+
+_colors = ['green', 'blue', 'orange', 'red']
+NUM_SEATS = len(_colors)
+
+# Options of a search bot, and how to parse them
+MCTS_OPTIONS = {
+    'budget': float,
+    'iterations': int,
+    'playout_turns': int,
+    'workers': int,
+}
+
+
+class BotConfig(object):
+    """
+    class BotConfig names a set of best_win_condition factors, or the options of a search bot.
+
+    :param name: str, must be unique within a tournament
+    :param factors: dict mapping build ("sett", "road", "city", "devc") -> starting factor
+    :param mcts: dict of catan.mcts.MctsStrategy options (see MCTS_OPTIONS), default None for
+    a greedy droid
+    :param lookahead: turns a greedy droid looks ahead by expectimax, see droid_behavior.droid_build
+    """
+    def __init__(self, name, factors=None, mcts=None, lookahead=0):
+        self.name = name
+        self.factors = dict(droid_behavior.DEFAULT_FACTORS)
+        self.factors.update(factors or dict())
+        self.mcts = mcts
+        self.lookahead = lookahead
+
+    def strategy(self, seed=None):
+        """
+        :param seed: seed for a search bot's playouts
+        :return: catan.simulation.Strategy playing this configuration
+        """
+        if self.mcts is not None:
+            return catan.mcts.MctsStrategy(seed=seed, **self.mcts)
+        return droid_behavior.DroidStrategy(factors=self.factors, lookahead=self.lookahead)
+
+    @classmethod
+    def from_string(cls, config_str):
+        """
+        Parse a configuration from the command line, e.g. 'roads:road=2,sett=0.5'.
+        Factors not given keep their default value. A configuration with any of
+        MCTS_OPTIONS, e.g. 'mcts:budget=0.2', is a search bot. A greedy droid can also be
+        given a lookahead, e.g. 'ahead:lookahead=1'.
+        """
+        name, _, factors_str = config_str.partition(':')
+        factors = dict()
+        mcts = None
+        lookahead = 0
+        for item in filter(None, factors_str.split(',')):
+            key, _, val = item.partition('=')
+            if key in MCTS_OPTIONS:
+                mcts = mcts or dict()
+                mcts[key] = MCTS_OPTIONS[key](val)
+            elif key in droid_behavior.DEFAULT_FACTORS:
+                factors[key] = float(val)
+            elif key == 'lookahead':
+                lookahead = int(val)
+            else:
+                raise ValueError('Unknown factor={} in config={}'.format(key, config_str))
+        if mcts is not None and (factors or lookahead):
+            raise ValueError('Search options and factors can\'t be mixed in config={}'.format(config_str))
+        return cls(name, factors, mcts=mcts, lookahead=lookahead)
+
+    def __repr__(self):
+        if self.mcts is not None:
+            return '<BotConfig {} mcts {}>'.format(self.name, self.mcts)
+        if self.lookahead:
+            return '<BotConfig {} {} lookahead={}>'.format(self.name, self.factors, self.lookahead)
+        return '<BotConfig {} {}>'.format(self.name, self.factors)
+
+
+class GameRecord(object):
+    """
+    class GameRecord is the outcome of one tournament game, keyed by configuration name so
+    that it pickles cheaply across processes.
+
+    :param index: game number within the tournament
+    :param seed: seed the game was played with
+    :param seating: list(str), configuration names in turn order
+    :param winner: configuration name, or None if the game hit its turn limit
+    :param turns: number of turns played
+    :param victory_points: dict mapping configuration name -> victory points
+    :param elapsed: wall-clock seconds spent playing the game
+    :param search_stats: dict mapping configuration name -> catan.mcts.SearchStats, for the
+    search bots in the game
+    """
+    def __init__(self, index, seed, seating, winner, turns, victory_points, elapsed, search_stats=None):
+        self.index = index
+        self.seed = seed
+        self.seating = seating
+        self.winner = winner
+        self.turns = turns
+        self.victory_points = victory_points
+        self.elapsed = elapsed
+        self.search_stats = search_stats or dict()
+
+    def __repr__(self):
+        return '<GameRecord #{} seed={} winner={} turns={} victory_points={}>'.format(
+            self.index, self.seed, self.winner, self.turns, self.victory_points)
+
+
+def seating(configs, index):
+    """
+    Rotate the configurations around the table, one seat per game.
+
+    With fewer configurations than seats, configurations are repeated to fill the table.
+
+    :return: list(BotConfig), in turn order
+    """
+    table = [configs[seat % len(configs)] for seat in range(NUM_SEATS)]
+    shift = index % NUM_SEATS
+    return table[shift:] + table[:shift]
+
+
+def play_one(index, seed, configs, board_opts=None, max_turns=catan.simulation.MAX_TURNS):
+    """
+    Play a single tournament game. Runs in a worker process.
+
+    :param index: game number, decides the seating
+    :param seed: seed for the board and the dice
+    :param configs: list(BotConfig)
+    :param board_opts: options for catan.boardbuilder.build
+    :param max_turns: see catan.simulation.play_game
+    :return: GameRecord
+    """
+    table = seating(configs, index)
+    players = [Player(seat, 'droid{}'.format(seat), _colors[seat - 1])
+               for seat in range(1, NUM_SEATS + 1)]
+    strategies = [config.strategy(seed=seed * NUM_SEATS + seat) for seat, config in enumerate(table)]
+
+    board = catan.boardbuilder.build(board_opts, rng=random.Random(seed))
+    game = Game(board=board, logging='off', undo='off', seed=seed)
+    try:
+        result = catan.simulation.play_game(game, players, strategies, max_turns=max_turns)
+    finally:
+        for strategy in strategies:
+            strategy.close()
+
+    names = {player: config.name for player, config in zip(players, table)}
+    victory_points = dict()
+    for player, points in result.victory_points.items():
+        victory_points[names[player]] = victory_points.get(names[player], 0) + points
+    search_stats = dict()
+    for config, strategy in zip(table, strategies):
+        if isinstance(strategy, catan.mcts.MctsStrategy):
+            search_stats.setdefault(config.name, catan.mcts.SearchStats()).add(strategy.stats)
+    return GameRecord(index=index,
+                      seed=seed,
+                      seating=[config.name for config in table],
+                      winner=names.get(result.winner),
+                      turns=result.turns,
+                      victory_points=victory_points,
+                      elapsed=result.elapsed,
+                      search_stats=search_stats)
+
+
+def run(configs, num_games, seed=0, workers=None, board_opts=None, max_turns=catan.simulation.MAX_TURNS):
+    """
+    Play num_games across a process pool, yielding each GameRecord as its game finishes.
+
+    Game i is played with seed + i, so any single game can be replayed with #play_one.
+
+    :param configs: list(BotConfig), names must be unique
+    :param num_games: number of games to play
+    :param seed: seed of the first game
+    :param workers: number of worker processes, default os.cpu_count()
+    :param board_opts: options for catan.boardbuilder.build
+    :param max_turns: see catan.simulation.play_game
+    """
+    if len(set(config.name for config in configs)) != len(configs):
+        raise ValueError('Config names must be unique, got {}'.format(configs))
+    with concurrent.futures.ProcessPoolExecutor(max_workers=workers) as pool:
+        futures = [pool.submit(play_one, index, seed + index, configs, board_opts, max_turns)
+                   for index in range(num_games)]
+        for future in concurrent.futures.as_completed(futures):
+            yield future.result()
+
+
+class Standings(object):
+    """
+    class Standings accumulates GameRecords into per-configuration totals.
+    """
+    def __init__(self, configs):
+        self.names = [config.name for config in configs]
+        self.games = 0
+        self.unfinished = 0
+        self.turns = 0
+        self.elapsed = 0.0
+        self.wins = {name: 0 for name in self.names}
+        self.seats = {name: 0 for name in self.names}
+        self.victory_points = {name: 0 for name in self.names}
+        self.search_stats = dict()
+
+    def add(self, record):
+        self.games += 1
+        self.turns += record.turns
+        self.elapsed += record.elapsed
+        if record.winner is None:
+            self.unfinished += 1
+        else:
+            self.wins[record.winner] += 1
+        for name in record.seating:
+            self.seats[name] += 1
+        for name, points in record.victory_points.items():
+            self.victory_points[name] += points
+        for name, stats in record.search_stats.items():
+            self.search_stats.setdefault(name, catan.mcts.SearchStats()).add(stats)
+
+    def win_rate(self, name):
+        """
+        :return: share of the seats played by this configuration that won, float on [0,1]
+        """
+        if not self.seats[name]:
+            return 0.0
+        return self.wins[name] / self.seats[name]
+
+    def summary(self):
+        lines = ['{} games, {} without a winner, {:.1f} turns/game'.format(
+            self.games, self.unfinished, self.turns / max(self.games, 1))]
+        for name in sorted(self.names, key=self.win_rate, reverse=True):
+            lines.append('  {:<16} wins={:<6} win_rate={:.3f} vp/seat={:.2f}'.format(
+                name, self.wins[name], self.win_rate(name),
+                self.victory_points[name] / max(self.seats[name], 1)))
+        for name in self.names:
+            stats = self.search_stats.get(name)
+            if stats is not None:
+                lines.append('  {:<16} searches={:<6} playouts/s={:.0f} nodes/s={:.0f} s/search={:.3f}'.format(
+                    name, stats.searches, stats.playouts_per_second(), stats.nodes_per_second(),
+                    stats.elapsed / max(stats.searches, 1)))
+        return '\n'.join(lines)
+
+
+def main():
+    logging.basicConfig(format='%(asctime)s %(levelname)s:%(module)s:%(funcName)s:%(message)s',
+                        datefmt='%H:%M:%S',
+                        level=logging.ERROR)
+
+    parser = argparse.ArgumentParser(description='play droids against each other')
+    parser.add_argument('--games', type=int, default=100, help='number of games, default 100')
+    parser.add_argument('--workers', type=int, help='number of processes, default one per cpu')
+    parser.add_argument('--seed', type=int, default=0, help='seed of the first game, default 0')
+    parser.add_argument('--max_turns', type=int, default=catan.simulation.MAX_TURNS,
+                        help='turns before a game is abandoned, default {}'.format(catan.simulation.MAX_TURNS))
+    parser.add_argument('--config', action='append',
+                        help="""name[:factor=value,...][,lookahead=turns], e.g. 'roads:road=2,sett=0.5', or
+                                name:budget=seconds[,iterations=n,playout_turns=n,workers=n] for a search bot,
+                                e.g. 'mcts:budget=0.2'. Repeat for each configuration, default one
+                                'baseline' configuration""")
+    parser.add_argument('--terrain', help='random|preset|empty|debug, default random')
+    parser.add_argument('--numbers', help='random|preset|empty|debug, default preset')
+    parser.add_argument('--ports', help='random|preset|empty|debug, default preset')
+    parser.add_argument('--verbose', help='print every game as it finishes', action='store_true')
+
+    args = parser.parse_args()
+    configs = [BotConfig.from_string(config_str) for config_str in args.config or ['baseline']]
+    board_opts = {
+        'terrain': args.terrain,
+        'numbers': args.numbers,
+        'ports': args.ports,
+    }
+    board_opts = {key: val for key, val in board_opts.items() if val is not None}
+
+    standings = Standings(configs)
+    start = time.perf_counter()
+    for record in run(configs, args.games, seed=args.seed, workers=args.workers,
+                      board_opts=board_opts, max_turns=args.max_turns):
+        standings.add(record)
+        if args.verbose:
+            print(record)
+    wall = time.perf_counter() - start
+    print(standings.summary())
+    print('{:.1f} games/s over {:.1f}s'.format(standings.games / wall, wall))
+
+
+if __name__ == "__main__":
+    main()
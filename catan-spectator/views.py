@@ -3,7 +3,6 @@ import tkinter
 from tkinter import messagebox
 import math
 import collections
-import random
 import functools
 import catanlog
 import hexgrid
@@ -88,42 +87,13 @@ class BoardFrame(tkinter.Frame):
         self.redraw()
 
     def droid_piece_click(self, piece_type, coordinate):
-        droid_name = self.game.get_cur_player()
+        # resources are paid for by the game, see Game.buy_road, Game.buy_settlement, Game.buy_city
         if piece_type == PieceType.road:
-            if coordinate > 10000:
-                coordinate -= 10000     #checking if roads are from road builder
-            elif not self.game.state.is_in_pregame():
-                self.game.hands[self.game.get_cur_player()].remove(
-                        Terrain.brick)
-                self.game.hands[self.game.get_cur_player()].remove(
-                    Terrain.wood)
             self.game.place_road(coordinate)
-            # print(droid_name, 'placed road at coordinate', coordinate)
         elif piece_type == PieceType.settlement:
             self.game.place_settlement(coordinate)
-            if not self.game.state.is_in_pregame():
-                self.game.hands[self.game.get_cur_player()].remove(
-                    Terrain.brick)
-                self.game.hands[self.game.get_cur_player()].remove(
-                    Terrain.wood)
-                self.game.hands[self.game.get_cur_player()].remove(
-                    Terrain.wheat)
-                self.game.hands[self.game.get_cur_player()].remove(
-                    Terrain.sheep)
-            if self.game._cur_turn > 3 and self.game.state.is_in_pregame():
-                for tile_num in self.game.board.scores[coordinate]['tiles_touching']:
-                    if self.game.board.tiles[tile_num-1].terrain != Terrain.desert:
-                        self.game.hands[self.game._cur_player].append(
-                            self.game.board.tiles[tile_num-1].terrain)
-            # print(droid_name, 'placed settlement at coordinate', coordinate)
         elif piece_type == PieceType.city:
             self.game.place_city(coordinate)
-            self.game.hands[self.game.get_cur_player()].remove(Terrain.wheat)
-            self.game.hands[self.game.get_cur_player()].remove(Terrain.wheat)
-            self.game.hands[self.game.get_cur_player()].remove(Terrain.ore)
-            self.game.hands[self.game.get_cur_player()].remove(Terrain.ore)
-            self.game.hands[self.game.get_cur_player()].remove(Terrain.ore)
-            # print(droid_name, 'placed city at coordinate', coordinate)
         elif piece_type == PieceType.robber:
             self.game.move_robber(coordinate)  # In this case, it is actually a tile ID, not a coord
 
@@ -150,39 +120,14 @@ class BoardFrame(tkinter.Frame):
                 break
 
         #logging.debug('Piece clicked with tag={}'.format(tag))
+        # resources are paid for by the game, see Game.buy_road, Game.buy_settlement, Game.buy_city
         if piece_type == PieceType.road:
             self.game.place_road(self._coord_from_road_tag(tag))
-            if self.game._cur_turn > 7 and self.game.state.can_end_turn():
-                self.game.hands[self.game.get_cur_player()].remove(
-                    Terrain.brick)
-                self.game.hands[self.game.get_cur_player()].remove(
-                    Terrain.wood)
         elif piece_type == PieceType.settlement:
-            coord = self._coord_from_settlement_tag(tag)
-            self.game.place_settlement(coord)
-            if not self.game.state.is_in_pregame():
-                self.game.hands[self.game.get_cur_player()].remove(
-                    Terrain.brick)
-                self.game.hands[self.game.get_cur_player()].remove(
-                    Terrain.wood)
-                self.game.hands[self.game.get_cur_player()].remove(
-                    Terrain.wheat)
-                self.game.hands[self.game.get_cur_player()].remove(
-                    Terrain.sheep)
-            if self.game._cur_turn > 3 and self.game.state.is_in_pregame():
-                for tile_num in self.game.board.scores[coord]['tiles_touching']:
-                    if self.game.board.tiles[tile_num-1].terrain != Terrain.desert:
-                        self.game.hands[self.game._cur_player].append(
-                            self.game.board.tiles[tile_num-1].terrain)
-
+            self.game.place_settlement(self._coord_from_settlement_tag(tag))
             #print("Clicked to place a settlement with tag {}".format(tag))
         elif piece_type == PieceType.city:
             self.game.place_city(self._coord_from_city_tag(tag))
-            self.game.hands[self.game.get_cur_player()].remove(Terrain.wheat)
-            self.game.hands[self.game.get_cur_player()].remove(Terrain.wheat)
-            self.game.hands[self.game.get_cur_player()].remove(Terrain.ore)
-            self.game.hands[self.game.get_cur_player()].remove(Terrain.ore)
-            self.game.hands[self.game.get_cur_player()].remove(Terrain.ore)
             #print("Clicked to place a city")
         elif piece_type == PieceType.robber:
             self.game.move_robber(hexgrid.tile_id_from_coord(
@@ -372,21 +317,12 @@ class BoardFrame(tkinter.Frame):
         #logging.debug('Drawing piece shadows of type={}'.format(piece_type.value))
         piece = Piece(piece_type, self.game.get_cur_player())
         if piece_type == PieceType.road:
-            edges = hexgrid.legal_edge_coords()
-            count = 0
-            for edge in edges:
-                if (hexgrid.EDGE, edge) in board.pieces:
-                    #logging.debug('Not drawing shadow road at coord={}'.format(edge))
-                    continue
-                count += 1
+            for edge in board.legal_road_edges(piece.owner):
                 self._draw_piece(edge, piece, terrain_centers, ghost=True)
-            #logging.debug('Road shadows drawn: {}'.format(count))
         elif piece_type == PieceType.settlement:
-            nodes = hexgrid.legal_node_coords()
-            for node in nodes:
-                if (hexgrid.NODE, node) in board.pieces:
-                    continue
-                self._draw_piece(node, piece, terrain_centers, ghost=True)
+            for node in board.legal_settlement_nodes():
+                if board.can_place_piece(piece, node):
+                    self._draw_piece(node, piece, terrain_centers, ghost=True)
         elif piece_type == PieceType.city:
             for (_, node), p in board.pieces.items():
                 if p.type == PieceType.settlement and p.owner.color == piece.owner.color:
@@ -706,7 +642,7 @@ class SetupGameToolbarFrame(tkinter.Frame):
         btn_start_game.pack(side=tkinter.TOP, fill=tkinter.X)
 
     def on_reset_board(self):
-        self.game.board.reset()
+        self.game.board.reset(rng=self.game.rng)
         self.game.notify_observers()
 
     def on_reset_pieces(self):
@@ -845,23 +781,6 @@ class HandsFrame(tkinter.Frame):
         self.game = game
         self.game.observers.add(self)
 
-        if self.game._cur_turn == 0:
-            self.game.hands = {self.game.players[0]: [], self.game.players[1]: [
-            ], self.game.players[2]: [], self.game.players[3]: []}
-            self.game.dev_hands = {self.game.players[0]: [], self.game.players[1]: [
-            ], self.game.players[2]: [], self.game.players[3]: []}
-            self.game.dev_deck = ['Knight', 'Knight', 'Knight', 'Knight', 'Knight',
-                                  'Knight', 'Knight', 'Knight', 'Knight', 'Knight',
-                                  'Knight', 'Knight', 'Knight', 'Knight',
-                                  'Road Builder', 'Road Builder',
-                                  'Monopoly', 'Monopoly',
-                                  'Year of Plenty', 'Year of Plenty',
-                                  'Victory Point', 'Victory Point', 'Victory Point',
-                                  'Victory Point', 'Victory Point'
-                                  ]
-            self.game.knights_played = {self.game.players[0]: 0, self.game.players[1]: 0,
-                                        self.game.players[2]: 0, self.game.players[3]: 0}
-
         self.player_resources = [tkinter.StringVar() for i in range(4)]
         self.player_victory_points = [tkinter.StringVar() for i in range(4)]
         self.player_knights = [tkinter.StringVar() for i in range(4)]
@@ -903,7 +822,10 @@ class HandsFrame(tkinter.Frame):
 
         i = 0
         for player, player_materials in player_info.items():
-            if player_materials["victory_points"] >= 10:
+            if player_materials["victory_points"] >= 10 and self.game.state.is_in_game():
+                print(player.name, 'wins!!')
+                print(player.name, 'is Lord of Catan!')
+                input()
                 self.game.end(player=player)
 
         for player, player_materials in player_info.items():
@@ -989,7 +911,7 @@ class RollFrame(tkinter.Frame):
                 11, 11,
                 12
                 ]
-        roll_val = random.choice(nums)
+        roll_val = self.game.rng.choice(nums)
         self.game.roll(roll_val)
         self.last_roll_text.set("Last Roll: {}".format(roll_val))
         self.set_states()
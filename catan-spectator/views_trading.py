@@ -85,7 +85,7 @@ class TradeFrame(tk.Frame):
         self.set_frame(WithWhoFrame(self))
 
     def try_trade(self):
-        partner_next_moves = droid_behavior.best_win_condition(self.master.board_frame, self.master.game.board, player=self.trade.getter())
+        partner_next_moves = droid_behavior.best_win_condition(self.master.game, self.master.game.board, player=self.trade.getter())
         if partner_next_moves[0] == 'road':
             partner_needs = droid_behavior.road_needs
         elif partner_next_moves[0] == 'sett':
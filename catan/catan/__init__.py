@@ -5,9 +5,17 @@ The main class is Game, which contains Players, a Board, and a CatanLog.
 
 See module boardbuilder for the mechanics of creating and modifying Board objects.
 
+See module topology for which tiles, nodes and edges touch which.
+
+See module simulation for playing games without a user interface, and module mcts for a
+bot which searches ahead.
+
+See module position for sending a game's position to another process.
+
 All classes in this module:
 - Game
 - Player
+- Hand
 - Board
 - Tile
 - Terrain
@@ -0,0 +1,90 @@
+"""
+module actions describes the moves a player can make, as values a bot can store, compare
+and play.
+
+An Action names a Game method and the arguments to call it with:
+
+    Action('roll', 8)
+    Action('buy_road', 0x67)
+    Action('move_robber', 12)
+    Action('steal', victim)
+    Action('trade', catan_trade)
+
+Play an action in place with Game#apply, and take it back with Game#unapply, or play it for
+real with Game#play. Game#legal_actions lists every action the current player can make.
+"""
+
+# Game methods which can be played as actions
+ACTIONS = (
+    'roll',
+    'move_robber',
+    'steal',
+    'buy_road',
+    'buy_settlement',
+    'buy_city',
+    'buy_dev_card',
+    'place_road',
+    'place_settlement',
+    'place_city',
+    'trade',
+    'play_knight',
+    'play_monopoly',
+    'play_year_of_plenty',
+    'play_road_builder',
+    'play_victory_point',
+    'end_turn',
+)
+
+# Dice totals. Each is a separate roll action, since the roll decides what happens next.
+ROLLS = tuple(range(2, 13))
+# Ways to roll each total with two six-sided dice, out of 36
+ROLL_WAYS = {roll: 6 - abs(7 - roll) for roll in ROLLS}
+
+_shared = dict()
+
+
+def shared(name, *args):
+    """
+    The same Action every time for the same name and arguments, so that move lists built
+    over and over don't build new actions each time. The arguments must be hashable.
+
+    :param name: one of ACTIONS
+    :param args: arguments for the Game method
+    :return: Action
+    """
+    key = (name, args)
+    action = _shared.get(key)
+    if action is None:
+        action = _shared[key] = Action(name, *args)
+    return action
+
+
+class Action(object):
+    """
+    class Action is a single move: the name of a Game method and its arguments.
+
+    buy_* actions place and pay for a piece directly. place_* actions go through the game
+    state, the way the spectator places pieces, and are what the pregame expects.
+
+    play_road_builder takes both edges and places both roads, unlike the Game method of
+    the same name which only records that the roads were placed.
+
+    :param name: one of ACTIONS
+    :param args: arguments for the Game method
+    """
+    def __init__(self, name, *args):
+        if name not in ACTIONS:
+            raise ValueError('Unknown action={}, expected one of {}'.format(name, ACTIONS))
+        self.name = name
+        self.args = args
+
+    def __eq__(self, other):
+        if other.__class__ != Action:
+            return False
+        return self.name == other.name and self.args == other.args
+
+    def __hash__(self):
+        return hash((self.name, self.args))
+
+    def __repr__(self):
+        return '<Action {}{}>'.format(self.name, self.args)
@@ -0,0 +1,279 @@
+"""
+module beliefs keeps track of what each player probably holds, from the same events the
+catanlog is told about, rather than by looking at game.hands.
+
+Every card a player gets from the dice, the pregame, a trade or a year of plenty is
+public, and so is every card they spend, so most of a hand is known exactly. What isn't
+comes from steals and discards, where nobody but the players involved sees the cards.
+Those are kept as a marginal: for each player, a count of each resource they certainly
+hold, plus the expected count of each resource among the cards that aren't certain.
+
+    beliefs = catan.beliefs.track(game)  # before game.start
+    ...
+    beliefs.expected(player)  # -> (1.0, 0.5, 2.0, 0.0, 1.5), in catan.hand.RESOURCES order
+    beliefs.chance_of(player, Terrain.ore)  # -> 0.75
+
+A steal moves the victim's expected share of each resource over to the thief, a discard
+scales the discarder's down, and paying for something takes the certain cards first. Each
+event costs O(resources), so #track is cheap enough for every headless game, see
+catan.simulation#play_game.
+
+The one thing read off game.hands is how many cards a monopoly takes, which the log leaves
+out but everyone at the table sees. Lookahead with Game#detached isn't seen at all, and
+neither are undo and redo.
+"""
+import hexgrid
+from catan.board import Terrain
+from catan.game import BUILD_COSTS
+from catan.hand import NUM_RESOURCES, resource_index
+from catan.pieces import PieceType
+from catan.topology import NODE_TILES
+
+
+def track(game):
+    """
+    Start keeping HandBeliefs for a game, fed by its catanlog calls. Call it before
+    Game#start so the pregame is seen too.
+
+    :param game: Game
+    :return: HandBeliefs, also set as game.beliefs
+    """
+    beliefs = HandBeliefs(game)
+    game.catanlog = TrackingLog(game.catanlog, beliefs)
+    game.beliefs = beliefs
+    return beliefs
+
+
+class HandBeliefs(object):
+    """
+    class HandBeliefs is what can be told about each player's hand from the public events
+    of a game. Its log_* methods take the same arguments as the catanlog's, see TrackingLog.
+
+    :param game: Game, for the board, the robber and the current player, which are public
+    """
+    def __init__(self, game):
+        self.game = game
+        self._known = dict()
+        self._pool = dict()
+        self._first_settlement = dict()
+        self._reset(game.players)
+
+    def _reset(self, players):
+        self._known = {player: [0] * NUM_RESOURCES for player in players}
+        self._pool = {player: [0.0] * NUM_RESOURCES for player in players}
+        self._first_settlement = dict()
+
+    def known(self, player):
+        """
+        :return: tuple of int, the cards of each resource the player certainly holds, in
+        catan.hand.RESOURCES order
+        """
+        return tuple(self._known[player])
+
+    def expected(self, player):
+        """
+        :return: tuple of float, the expected count of each resource in the player's hand,
+        in catan.hand.RESOURCES order
+        """
+        return tuple(k + p for k, p in zip(self._known[player], self._pool[player]))
+
+    def size(self, player):
+        """
+        :return: float, the number of cards in the player's hand, up to rounding
+        """
+        return sum(self._known[player]) + sum(self._pool[player])
+
+    def chance_of(self, player, resource):
+        """
+        The chance the player holds at least one of a resource, taking the cards that
+        aren't certain to be drawn independently from their expected mix.
+
+        :param resource: Terrain
+        :return: float on [0,1]
+        """
+        i = resource_index(resource)
+        if self._known[player][i] > 0:
+            return 1.0
+        pool = self._pool[player]
+        # hand sizes are exact, so this is a whole number of cards up to rounding
+        unknown = round(sum(pool))
+        if pool[i] <= 0 or unknown <= 0:
+            return 0.0
+        return 1.0 - (1.0 - min(1.0, pool[i] / unknown)) ** unknown
+
+    def _gain(self, player, counts):
+        known = self._known[player]
+        for i, num in enumerate(counts):
+            known[i] += num
+
+    def _pay(self, player, counts):
+        """
+        Take cards from the certain ones first, then from the uncertain ones. Paying for
+        more than the expected count of a resource means the other resources were
+        overestimated, so the shortfall comes off them in proportion.
+        """
+        known, pool = self._known[player], self._pool[player]
+        short = 0.0
+        for i, num in enumerate(counts):
+            if not num:
+                continue
+            paid = min(known[i], num)
+            known[i] -= paid
+            if num > paid:
+                pool[i] -= num - paid
+                if pool[i] < 0:
+                    short -= pool[i]
+                    pool[i] = 0.0
+        if short:
+            rest = sum(pool)
+            scale = max(0.0, rest - short) / rest if rest > 0 else 0.0
+            for i in range(NUM_RESOURCES):
+                pool[i] *= scale
+
+    def _steal(self, thief, victim):
+        if victim not in self._known or thief not in self._known:
+            return
+        known, pool = self._known[victim], self._pool[victim]
+        size = sum(known) + sum(pool)
+        if size < 0.5:
+            return
+        thief_pool = self._pool[thief]
+        for i in range(NUM_RESOURCES):
+            share = (known[i] + pool[i]) / size
+            if known[i]:
+                known[i] -= 1
+                pool[i] += 1 - share
+            else:
+                pool[i] -= share
+            thief_pool[i] += share
+
+    def _discard(self, player):
+        known, pool = self._known[player], self._pool[player]
+        size = int(round(sum(known) + sum(pool)))
+        if size <= 7:
+            return
+        lost = size // 2
+        keep = (size - lost) / size
+        for i in range(NUM_RESOURCES):
+            expected = (known[i] + pool[i]) * keep
+            known[i] = max(0, known[i] - lost)
+            pool[i] = expected - known[i]
+
+    def log_game_start(self, players, terrain, numbers, ports):
+        self._reset(players)
+
+    def log_roll(self, player, roll):
+        if int(roll) == 7:
+            for other in self._known:
+                self._discard(other)
+            return
+        for owner, terrain, count in self.game.roll_payouts(roll):
+            self._known[owner][resource_index(terrain)] += count
+
+    def log_robber(self, player, location, victim):
+        self._steal(player, victim)
+
+    def log_plays_knight(self, player, location, victim):
+        self._steal(player, victim)
+
+    def log_buys_road(self, player, location):
+        if not self.game.state.is_in_pregame():
+            self._pay(player, BUILD_COSTS['road'])
+
+    def log_buys_settlement(self, player, location):
+        if not self.game.state.is_in_pregame():
+            self._pay(player, BUILD_COSTS['settlement'])
+            return
+        nodes = set(node for (hex_type, node), piece in self.game.board.owned_pieces(player).items()
+                    if hex_type == hexgrid.NODE and piece.type == PieceType.settlement)
+        if player not in self._first_settlement:
+            self._first_settlement[player] = nodes
+            return
+        # the second settlement of the pregame collects a card from each tile it touches
+        for node in nodes - self._first_settlement[player]:
+            for tile_id in NODE_TILES[node]:
+                terrain = self.game.board.tiles[tile_id - 1].terrain
+                if terrain != Terrain.desert:
+                    self._known[player][resource_index(terrain)] += 1
+
+    def log_buys_city(self, player, location):
+        self._pay(player, BUILD_COSTS['city'])
+
+    def log_buys_dev_card(self, player):
+        self._pay(player, BUILD_COSTS['dev_card'])
+
+    def log_trades_with_port(self, player, to_port, port, to_player):
+        self._pay(player, _trade_counts(to_port))
+        self._gain(player, _trade_counts(to_player))
+
+    def log_trades_with_player(self, player, to_other, other, to_player):
+        giving, getting = _trade_counts(to_other), _trade_counts(to_player)
+        self._pay(player, giving)
+        self._pay(other, getting)
+        self._gain(player, getting)
+        self._gain(other, giving)
+
+    def log_plays_monopoly(self, player, resource):
+        i = resource_index(resource)
+        for other in self._known:
+            if other == player:
+                continue
+            # the log leaves out how many cards each player hands over, which the whole
+            # table sees, so it's counted here, before the game moves them
+            taken = self.game.hands[other].count(resource)
+            known, pool = self._known[other], self._pool[other]
+            left = sum(known) + sum(pool) - taken
+            known[i], pool[i] = 0, 0.0
+            unknown = sum(pool)
+            scale = max(0.0, left - sum(known)) / unknown if unknown > 0 else 0.0
+            for j in range(NUM_RESOURCES):
+                pool[j] *= scale
+            self._known[player][i] += taken
+
+    def log_plays_year_of_plenty(self, player, resource1, resource2):
+        self._known[player][resource_index(resource1)] += 1
+        self._known[player][resource_index(resource2)] += 1
+
+
+def _trade_counts(cards):
+    """
+    :param cards: list of (num, Terrain), as CatanTrade#giving and #getting
+    :return: list of int, in catan.hand.RESOURCES order
+    """
+    counts = [0] * NUM_RESOURCES
+    for num, terrain in cards:
+        counts[resource_index(terrain)] += num
+    return counts
+
+
+class TrackingLog(object):
+    """
+    class TrackingLog passes every catanlog call on to the game's log, and the calls
+    about cards on to HandBeliefs as well.
+
+    :param log: the catanlog, e.g. catanlog.NoopCatanLog
+    :param beliefs: HandBeliefs
+    """
+    def __init__(self, log, beliefs):
+        self.log = log
+        self.beliefs = beliefs
+
+    def __getattr__(self, name):
+        if name == 'log' or name.startswith('__'):
+            raise AttributeError(name)
+        return getattr(self.log, name)
+
+
+def _tracked(name):
+    def method(self, *args):
+        getattr(self.beliefs, name)(*args)
+        return getattr(self.log, name)(*args)
+    method.__name__ = name
+    return method
+
+
+for _name in ('log_game_start', 'log_roll', 'log_robber', 'log_plays_knight',
+              'log_buys_road', 'log_buys_settlement', 'log_buys_city', 'log_buys_dev_card',
+              'log_trades_with_port', 'log_trades_with_player',
+              'log_plays_monopoly', 'log_plays_year_of_plenty'):
+    setattr(TrackingLog, _name, _tracked(_name))
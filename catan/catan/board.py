@@ -1,11 +1,20 @@
 import copy
 from enum import Enum
 import logging
+import random
+import types
 import hexgrid
+import catan.actions
 import catan.boardbuilder
+import catan.roads
 import catan.states
+import catan.topology
+import catan.zobrist
 from catan.pieces import PieceType, Piece
 
+# Owned pieces of a player who has none, see Board#owned_pieces
+_no_pieces = dict()
+
 
 class Board(object):
     """
@@ -14,8 +23,18 @@ class Board(object):
     A Board has pieces, which is a dictionary mapping (hexgrid.TYPE, coord) -> Piece.
 
     Use #place_piece, #move_piece, and #remove_piece to manage pieces on the board.
+    Don't assign into the pieces dictionary directly; assigning a whole new dictionary is ok.
 
     Use #get_pieces to get all the pieces at a particular coordinate of the allowed types.
+
+    Use #owned_pieces to get the pieces a player owns without scanning the whole board.
+
+    Occupancy is also kept as bit masks over catan.topology's NODE_BIT and EDGE_BIT, from
+    which #can_place_piece, #legal_settlement_nodes and #legal_road_edges answer without
+    looking at neighbouring coordinates one by one. Use #settlement_allowed for the
+    distance rule alone.
+
+    #zobrist_hash is a hash of the pieces, kept up to date as they're placed and removed.
     """
     def __init__(self, board=None, terrain=None, numbers=None, ports=None, pieces=None, players=None):
         """
@@ -30,7 +49,12 @@ class Board(object):
         self.tiles = list()
         self.ports = list()
         self.state = catan.states.BoardState(self)
+        self._version = 0 # incremented whenever an owner's pieces change
+        self._buildings_version = 0 # set whenever a settlement or city changes
         self.pieces = dict()
+        self.payouts = None # set in #lock
+        self.port_nodes = None # set in #lock
+        self.production = None # set in #lock
 
         self.opts = dict()
         if board is not None:
@@ -72,26 +96,410 @@ class Board(object):
         self.state.board = self
 
         self.pieces = board.pieces
+        self.payouts = board.payouts
+        self.port_nodes = board.port_nodes
+        self.production = board.production
         self.opts = board.opts
         self.observers = board.observers
 
         self.notify_observers()
 
+    @property
+    def pieces(self):
+        return self._pieces
+
+    @pieces.setter
+    def pieces(self, pieces):
+        """
+        Replace all the pieces on the board and re-index them by owner.
+        """
+        self._pieces = pieces
+        self._owned = dict()
+        self._owner_versions = dict()
+        self._node_mask = 0 # nodes with a settlement or city
+        self._edge_mask = 0 # edges with a road
+        self._owner_node_masks = dict()
+        self._owner_edge_masks = dict()
+        self._owner_road_node_masks = dict() # nodes at the end of each owner's roads
+        self._road_targets = dict() # owner -> (masks they were planned from, targets), see #road_targets
+        self._free_node_mask = catan.topology.ALL_NODES_MASK # nodes the distance rule allows
+        self._zobrist = 0
+        for key, piece in pieces.items():
+            self._zobrist ^= catan.zobrist.piece_key(key, piece)
+            if piece.owner is not None:
+                self._owned.setdefault(piece.owner, dict())[key] = piece
+        for owner, owned in self._owned.items():
+            nodes, edges, road_nodes = 0, 0, 0
+            for hex_type, coord in owned:
+                if hex_type == hexgrid.NODE:
+                    nodes |= catan.topology.NODE_BIT[coord]
+                    self._free_node_mask &= ~catan.topology.DISTANCE_MASK[coord]
+                elif hex_type == hexgrid.EDGE:
+                    edges |= catan.topology.EDGE_BIT[coord]
+                    road_nodes |= catan.topology.EDGE_NODE_MASK[coord]
+            self._owner_node_masks[owner] = nodes
+            self._owner_edge_masks[owner] = edges
+            self._owner_road_node_masks[owner] = road_nodes
+            self._node_mask |= nodes
+            self._edge_mask |= edges
+            self._touch(owner)
+        self._version += 1
+        self._buildings_version = self._version
+
+    def owned_pieces(self, owner):
+        """
+        The pieces owned by a player, in the order they appear in pieces.
+
+        :param owner: Player
+        :return: read-only dict mapping (hexgrid.TYPE, coord) -> Piece
+        """
+        return types.MappingProxyType(self._owned.get(owner, _no_pieces))
+
+    def owner_version(self, owner):
+        """
+        A number which changes whenever the owner's pieces change, for caching things
+        computed from #owned_pieces. Versions are never reused.
+
+        :param owner: Player
+        :return: int
+        """
+        return self._owner_versions.get(owner, 0)
+
+    def buildings_version(self):
+        """
+        A number which changes whenever any settlement or city is placed, upgraded or
+        removed. Versions are never reused.
+
+        :return: int
+        """
+        return self._buildings_version
+
+    def zobrist_hash(self):
+        """
+        A 64-bit hash of the pieces on the board: which piece, of which seat, is on which
+        coordinate. Tiles and ports aren't included, since they don't change during a game.
+
+        Updated with each piece placed, moved or removed, so it costs nothing to ask for.
+        See module catan.zobrist.
+
+        :return: int
+        """
+        return self._zobrist
+
+    def _touch(self, owner, key=None):
+        self._version += 1
+        self._owner_versions[owner] = self._version
+        if key is not None and key[0] == hexgrid.NODE:
+            self._buildings_version = self._version
+
+    def restore_piece(self, key, piece):
+        """
+        Put back what was at a position: a piece, or nothing.
+
+        :param key: (hexgrid.TYPE, coord)
+        :param piece: Piece, or None to leave the position empty
+        """
+        old = self._pieces.pop(key, None) if piece is None else self._pieces.get(key)
+        if old is not None:
+            self._zobrist ^= catan.zobrist.piece_key(key, old)
+        if old is not None and old.owner is not None and old.owner != getattr(piece, 'owner', None):
+            self._owned[old.owner].pop(key, None)
+            self._unmark(key, old.owner)
+            self._touch(old.owner, key)
+        if piece is not None:
+            self._pieces[key] = piece
+            self._zobrist ^= catan.zobrist.piece_key(key, piece)
+            if piece.owner is not None:
+                self._owned.setdefault(piece.owner, dict())[key] = piece
+                self._mark(key, piece.owner)
+                self._touch(piece.owner, key)
+
+    def _mark(self, key, owner):
+        hex_type, coord = key
+        if hex_type == hexgrid.NODE:
+            bit = catan.topology.NODE_BIT[coord]
+            self._node_mask |= bit
+            self._owner_node_masks[owner] = self._owner_node_masks.get(owner, 0) | bit
+            self._free_node_mask &= ~catan.topology.DISTANCE_MASK[coord]
+        elif hex_type == hexgrid.EDGE:
+            bit = catan.topology.EDGE_BIT[coord]
+            self._edge_mask |= bit
+            self._owner_edge_masks[owner] = self._owner_edge_masks.get(owner, 0) | bit
+            self._owner_road_node_masks[owner] = (self._owner_road_node_masks.get(owner, 0) |
+                                                  catan.topology.EDGE_NODE_MASK[coord])
+
+    def _unmark(self, key, owner):
+        hex_type, coord = key
+        if hex_type == hexgrid.NODE:
+            bit = catan.topology.NODE_BIT[coord]
+            self._node_mask &= ~bit
+            self._owner_node_masks[owner] &= ~bit
+            # the node and its neighbours may be free again, unless another building is near
+            for node in (coord, ) + catan.topology.NODE_NODES[coord]:
+                if not catan.topology.DISTANCE_MASK[node] & self._node_mask:
+                    self._free_node_mask |= catan.topology.NODE_BIT[node]
+        elif hex_type == hexgrid.EDGE:
+            bit = catan.topology.EDGE_BIT[coord]
+            self._edge_mask &= ~bit
+            self._owner_edge_masks[owner] &= ~bit
+            # an end of the road stays on the network if another of owner's roads meets there
+            for node in catan.topology.EDGE_NODES[coord]:
+                if not self._owner_edge_masks[owner] & catan.topology.NODE_EDGE_MASK[node]:
+                    self._owner_road_node_masks[owner] &= ~catan.topology.NODE_BIT[node]
+
+    def settlement_allowed(self, node):
+        """
+        Whether the distance rule allows a settlement on the node: it and every node next
+        to it are empty. Doesn't consider roads; see #can_place_piece.
+
+        :param node: node coordinate, int
+        :return: bool
+        """
+        return bool(self._free_node_mask & catan.topology.NODE_BIT[node])
+
+    def legal_settlement_nodes(self, owner=None):
+        """
+        The nodes where a settlement can go under the distance rule: the node and every
+        node next to it are empty. Kept up to date as pieces are placed and removed, as are
+        the nodes on each owner's roads, so the frontier of an owner's road network costs
+        a mask intersection.
+
+        :param owner: Player, if given also require the node to be on one of their roads
+        :return: list of node coordinates, ascending
+        """
+        free = self._free_node_mask
+        if owner is not None:
+            free &= self._road_node_mask(owner)
+        return catan.topology.nodes_in(free)
+
+    def best_settlement_node(self, owner):
+        """
+        The best node on the frontier of owner's road network, the nodes of
+        #legal_settlement_nodes(owner), by #node_scores.
+
+        :param owner: Player
+        :return: node coordinate, or None if there's nowhere to build
+        """
+        frontier = self._free_node_mask & self._road_node_mask(owner)
+        if frontier:
+            for node in self.nodes_by_score():
+                if frontier & catan.topology.NODE_BIT[node]:
+                    return node
+        return None
+
+    def road_targets(self, owner):
+        """
+        Where owner's roads could head next: each node the distance rule allows a
+        settlement on, and the cheapest roads to build to get there, from
+        catan.roads.road_paths. Best first, by #node_scores per road to build, counting
+        roads into a node at the end of an opponent's road as more expensive, see
+        catan.roads.CONTENTION_COST.
+
+        Planned once, and reused until a road, settlement or city is placed or removed.
+        Don't modify the result.
+
+        :param owner: Player
+        :return: tuple of (node coord, tuple of edge coords to build in order), empty for
+        the nodes already on owner's roads or buildings
+        """
+        own_nodes = self._owner_node_masks.get(owner, 0)
+        own_edges = self._owner_edge_masks.get(owner, 0)
+        key = (self._node_mask, self._edge_mask, own_nodes, own_edges)
+        cached = self._road_targets.get(owner)
+        if cached is not None and cached[0] == key:
+            return cached[1]
+
+        contested = 0
+        for other, edges in self._owner_road_node_masks.items():
+            if other != owner:
+                contested |= edges
+        paths = catan.roads.road_paths(self._reach_node_mask(owner), self._edge_mask,
+                                       blocked=self._node_mask & ~own_nodes,
+                                       contested=contested & ~own_nodes)
+        scores = self.node_scores()
+        targets = [(node, paths[node]) for node in self.nodes_by_score()
+                   if node in paths and self._free_node_mask & catan.topology.NODE_BIT[node]]
+        targets.sort(key=lambda target: scores[target[0]] / (1 + target[1][0]), reverse=True)
+        targets = tuple((node, path) for node, (_, path) in targets)
+        self._road_targets[owner] = (key, targets)
+        return targets
+
+    def legal_road_edges(self, owner):
+        """
+        The empty edges where owner can build a road: each touches one of their buildings,
+        or one of their roads at a node without another player's building.
+
+        :param owner: Player
+        :return: list of edge coordinates, ascending
+        """
+        edges = 0
+        for node in catan.topology.nodes_in(self._reach_node_mask(owner)):
+            edges |= catan.topology.NODE_EDGE_MASK[node]
+        return catan.topology.edges_in(edges & ~self._edge_mask)
+
+    def _road_node_mask(self, owner):
+        """
+        :return: mask of the nodes at the end of one of owner's roads
+        """
+        return self._owner_road_node_masks.get(owner, 0)
+
+    def _reach_node_mask(self, owner):
+        """
+        :return: mask of the nodes a new road of owner's can start from
+        """
+        own_nodes = self._owner_node_masks.get(owner, 0)
+        others = self._node_mask & ~own_nodes
+        return own_nodes | (self._road_node_mask(owner) & ~others)
+
+    def snapshot(self):
+        """
+        Capture the parts of the board which change during a game: the pieces and the state.
+
+        Tiles and ports are shared, not copied, since they don't change once the board is
+        locked. Pieces themselves are never modified, so only the mapping is copied.
+
+        :return: opaque snapshot for #restore_snapshot
+        """
+        return dict(self.pieces), catan.states.copy_state(self.state)
+
+    def restore_snapshot(self, snapshot):
+        """
+        Put the board back the way it was when #snapshot was taken. A snapshot can be
+        restored any number of times. Observers are not notified.
+
+        :param snapshot: return value of #snapshot
+        """
+        pieces, state = snapshot
+        self.pieces = dict(pieces)
+        self.state = catan.states.copy_state(state)
+        self.state.board = self
+
     def notify_observers(self):
         for obs in self.observers:
             obs.notify(self)
 
     def lock(self):
         self.state = catan.states.BoardStateLocked(self)
+        if self.payouts is None:
+            self.payouts = self._build_payouts()
         for port in self.ports.copy():
             if port.type == PortType.none:
                 self.ports.remove(port)
+        if self.port_nodes is None:
+            self.port_nodes = self._build_port_nodes()
+        if self.production is None:
+            self.production = self._build_production()
         self.notify_observers()
 
     def unlock(self):
         self.state = catan.states.BoardStateModifiable(self)
+        self.payouts = None
+        self.port_nodes = None
+        self.production = None
+
+    def payouts_for(self, roll):
+        """
+        The tiles which produce on a roll, for paying out resources.
+
+        Built when the board locks, since tiles can't change after that. The robber and the
+        buildings are not part of the index; look them up when paying out.
+
+        :param roll: int or str, the dice total
+        :return: tuple of (tile_id, Terrain, tuple of node coords touching the tile)
+        """
+        if self.payouts is None:
+            self.payouts = self._build_payouts()
+        return self.payouts.get(int(roll), ())
+
+    def port_types_by_node(self):
+        """
+        The port a settlement or city on each port node can trade through.
+
+        Built when the board locks, like #payouts_for. Don't modify the result.
+
+        :return: dict mapping node coord -> PortType, for the nodes on a port
+        """
+        if self.port_nodes is None:
+            self.port_nodes = self._build_port_nodes()
+        return self.port_nodes
 
-    def reset(self, board=None, terrain=None, numbers=None, ports=None, pieces=None, players=None):
+    def node_production(self):
+        """
+        What a settlement on each node would produce: for each resource, the ways out of 36
+        to roll a number on a touching tile of that terrain. The robber isn't counted.
+
+        Built when the board locks, like #payouts_for. Don't modify the result.
+
+        :return: dict mapping node coord -> tuple of int, in catan.hand.RESOURCES order
+        """
+        if self.production is None:
+            self.production = self._build_production()
+        return self.production[0]
+
+    def node_scores(self):
+        """
+        The ways out of 36 a settlement on each node produces anything, the sum of
+        #node_production. Don't modify the result.
+
+        :return: dict mapping node coord -> int
+        """
+        if self.production is None:
+            self.production = self._build_production()
+        return self.production[1]
+
+    def nodes_by_score(self):
+        """
+        All the nodes, highest #node_scores first. Ties keep the order of
+        catan.topology.TILE_NODES, tile by tile.
+
+        :return: tuple of node coords
+        """
+        if self.production is None:
+            self.production = self._build_production()
+        return self.production[2]
+
+    def _build_production(self):
+        from .hand import NUM_RESOURCES, resource_index
+        production = dict()
+        for tile_id in catan.topology.TILE_IDS:
+            tile = self.tiles[tile_id - 1]
+            for node in catan.topology.TILE_NODES[tile_id]:
+                counts = production.setdefault(node, [0] * NUM_RESOURCES)
+                if tile.number.value is None or tile.terrain == Terrain.desert:
+                    continue
+                counts[resource_index(tile.terrain)] += catan.actions.ROLL_WAYS[tile.number.value]
+        production = {node: tuple(counts) for node, counts in production.items()}
+        scores = {node: sum(counts) for node, counts in production.items()}
+        order = tuple(sorted(scores, key=lambda node: scores[node], reverse=True))
+        return production, scores, order
+
+    def _tiles_changed(self):
+        self.payouts = None
+        self.production = None
+        self._road_targets = dict()
+
+    def _ports_changed(self):
+        self.port_nodes = None
+
+    def _build_port_nodes(self):
+        port_nodes = dict()
+        for port in self.ports:
+            if port.type == PortType.none:
+                continue
+            for node in catan.topology.port_nodes(port):
+                port_nodes[node] = port.type
+        return port_nodes
+
+    def _build_payouts(self):
+        payouts = dict()
+        for tile in self.tiles:
+            if tile.number == HexNumber.none or tile.terrain == Terrain.desert:
+                continue
+            nodes = catan.topology.TILE_NODES[tile.tile_id]
+            payouts.setdefault(tile.number.value, list()).append((tile.tile_id, tile.terrain, nodes))
+        return {number: tuple(tiles) for number, tiles in payouts.items()}
+
+    def reset(self, board=None, terrain=None, numbers=None, ports=None, pieces=None, players=None, rng=random):
         opts = self.opts.copy()
         if board is not None:
             opts['board'] = board
@@ -105,37 +513,63 @@ class Board(object):
             opts['pieces'] = pieces
         if players is not None:
             opts['players'] = players
-        catan.boardbuilder.reset(self, opts=opts)
+        catan.boardbuilder.reset(self, opts=opts, rng=rng)
+        self._tiles_changed()
+        self._ports_changed()
 
     def can_place_piece(self, piece, coord):
+        """
+        Whether the rules allow the piece on the coordinate, given the pieces on the board.
+
+        A road must be on an empty edge and connect to its owner's building, or to their
+        road at a node without another player's building. A settlement must satisfy the
+        distance rule, and once its owner has their two starting buildings it must also be
+        on one of their roads. A city must replace its owner's settlement. The robber can
+        go on any tile it isn't already on.
+
+        Costs and turn order are up to the game, not the board.
+        """
         if piece.type == PieceType.road:
-            logging.warning('"Can place road" not yet implemented')
-            return True
+            if not catan.topology.EDGE_BIT[coord] & ~self._edge_mask:
+                return False
+            own_nodes = self._owner_node_masks.get(piece.owner, 0)
+            own_edges = self._owner_edge_masks.get(piece.owner, 0)
+            for node in catan.topology.EDGE_NODES[coord]:
+                bit = catan.topology.NODE_BIT[node]
+                if own_nodes & bit:
+                    return True
+                if not self._node_mask & bit and own_edges & catan.topology.NODE_EDGE_MASK[node]:
+                    return True
+            return False
         elif piece.type == PieceType.settlement:
-            logging.warning('"Can place settlement" not yet implemented')
+            if not self.settlement_allowed(coord):
+                return False
+            own_nodes = self._owner_node_masks.get(piece.owner, 0)
+            if own_nodes & (own_nodes - 1): # two or more buildings, past the starting ones
+                return bool(self._owner_edge_masks.get(piece.owner, 0) & catan.topology.NODE_EDGE_MASK[coord])
             return True
         elif piece.type == PieceType.city:
-            logging.warning('"Can place city" not yet implemented')
-            return True
+            settlement = self._pieces.get((hexgrid.NODE, coord))
+            return (settlement is not None and settlement.type == PieceType.settlement
+                    and settlement.owner == piece.owner)
         elif piece.type == PieceType.robber:
-            logging.warning('"Can place robber" not yet implemented')
-            return True
+            return catan.topology.TILE_ID[coord] is not None and (hexgrid.TILE, coord) not in self._pieces
         else:
             logging.debug('Can\'t place piece={} on coord={}'.format(
-                piece.value, hex(coord)
+                piece, hex(coord)
             ))
             return self.pieces.get(coord) is None
 
     def place_piece(self, piece, coord):
         if not self.can_place_piece(piece, coord):
             logging.critical('ILLEGAL: Attempted to place piece={} on coord={}'.format(
-                piece.value, hex(coord)
+                piece, hex(coord)
             ))
         logging.debug('Placed piece={} on coord={}'.format(
             piece, hex(coord)
         ))
         hex_type = self._piece_type_to_hex_type(piece.type)
-        self.pieces[(hex_type, coord)] = piece
+        self.restore_piece((hex_type, coord), piece)
 
     def move_piece(self, piece, from_coord, to_coord):
         from_index = (self._piece_type_to_hex_type(piece.type), from_coord)
@@ -147,11 +581,11 @@ class Board(object):
 
     def remove_piece(self, piece, coord):
         index = (self._piece_type_to_hex_type(piece.type), coord)
-        try:
-            self.pieces.pop(index)
-            logging.debug('Removed piece={}'.format(index))
-        except ValueError:
+        if index not in self.pieces:
             logging.critical('Attempted to remove piece={} which was NOT on the board'.format(index))
+            return
+        self.restore_piece(index, None)
+        logging.debug('Removed piece={}'.format(index))
 
     def get_pieces(self, types=tuple(), coord=None):
         if coord is None:
@@ -202,6 +636,7 @@ class Board(object):
             next_idx = (list(Terrain).index(tile.terrain) + 1) % len(Terrain)
             next_terrain = list(Terrain)[next_idx]
             tile.terrain = next_terrain
+            self._tiles_changed()
         else:
             logging.debug('Attempted to cycle terrain on tile={} on a locked board'.format(tile_id))
         self.notify_observers()
@@ -212,6 +647,7 @@ class Board(object):
             next_idx = (list(HexNumber).index(tile.number) + 1) % len(HexNumber)
             next_hex_number = list(HexNumber)[next_idx]
             tile.number = next_hex_number
+            self._tiles_changed()
         else:
             logging.debug('Attempted to cycle number on tile={} on a locked board'.format(tile_id))
         self.notify_observers()
@@ -220,6 +656,7 @@ class Board(object):
         if self.state.modifiable():
             port = self.get_port_at(tile_id, direction)
             port.type = PortType.next_ui(port.type)
+            self._ports_changed()
         else:
             logging.debug('Attempted to cycle port on coord=({},{}) on a locked board'.format(tile_id, direction))
         self.notify_observers()
@@ -230,18 +667,22 @@ class Board(object):
         at a "rotated" angle from "true north".
         """
         for port in self.ports:
-            port.tile_id = ((port.tile_id + 1) % len(hexgrid.coastal_tile_ids())) + 1
+            port.tile_id = ((port.tile_id + 1) % len(catan.topology.COASTAL_TILE_IDS)) + 1
             port.direction = hexgrid.rotate_direction(hexgrid.EDGE, port.direction, ccw=True)
+        self._ports_changed()
         self.notify_observers()
 
     def set_terrain(self, terrain):
         self.tiles = [Tile(tile.tile_id, t, tile.number) for t, tile in zip(terrain, self.tiles)]
+        self._tiles_changed()
 
     def set_numbers(self, numbers):
         self.tiles = [Tile(tile.tile_id, tile.terrain, n) for n, tile in zip(numbers, self.tiles)]
+        self._tiles_changed()
 
     def set_ports(self, ports):
         self.ports = ports
+        self._ports_changed()
 
 
 class Tile(object):
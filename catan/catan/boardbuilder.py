@@ -15,13 +15,15 @@ Use #build to build a new board with the passed options.
 
 Use #modify to modify an existing board instead of building a new one.
 This will reset the board. #reset is an alias.
+
+Randomized options draw from the rng passed to #build or #modify, which defaults to
+the global random module. Pass a seeded random.Random to build the same board again.
 """
 from enum import Enum
 import logging
 import pprint
 import random
 import hexgrid
-import catan.game
 import catan.states
 import catan.board
 import catan.pieces
@@ -72,37 +74,39 @@ def get_opts(opts):
     return _opts
 
 
-def build(opts=None):
+def build(opts=None, rng=random):
     """
     Build a new board using the given options.
     :param opts: dictionary mapping str->Opt
+    :param rng: source of randomness, random.Random or the random module
     :return: the new board, Board
     """
     board = catan.board.Board()
-    modify(board, opts)
+    modify(board, opts, rng=rng)
     return board
 
 
-def reset(board, opts=None):
+def reset(board, opts=None, rng=random):
     """
     Alias for #modify. Resets an existing board.
     """
-    modify(board, opts)
+    modify(board, opts, rng=rng)
     return None
 
 
-def modify(board, opts=None):
+def modify(board, opts=None, rng=random):
     """
     Reset an existing board using the given options.
     :param board: the board to reset
     :param opts: dictionary mapping str->Opt
+    :param rng: source of randomness, random.Random or the random module
     :return: None
     """
     opts = get_opts(opts)
     if opts['board'] is not None:
         board.tiles = _read_tiles_from_string(opts['board'])
     else:
-        board.tiles = _generate_tiles(opts['terrain'], opts['numbers'])
+        board.tiles = _generate_tiles(opts['terrain'], opts['numbers'], rng)
     board.ports = _get_ports(opts['ports'])
     board.state = catan.states.BoardStateModifiable(board)
     board.pieces = _get_pieces(board.tiles, board.ports, opts['players'], opts['pieces'])
@@ -152,7 +156,7 @@ def _read_tiles_from_string(board_str):
     return tiles
 
 
-def _generate_tiles(terrain_opts, numbers_opts):
+def _generate_tiles(terrain_opts, numbers_opts, rng=random):
     terrain = None
     numbers = None
 
@@ -165,7 +169,7 @@ def _generate_tiles(terrain_opts, numbers_opts):
                    [catan.board.Terrain.wood] * 4 +
                    [catan.board.Terrain.sheep] * 4 +
                    [catan.board.Terrain.wheat] * 4)
-        random.shuffle(terrain)
+        rng.shuffle(terrain)
     elif terrain_opts == Opt.preset:
         terrain = ([catan.board.Terrain.wood,
                     catan.board.Terrain.wheat,
@@ -196,7 +200,7 @@ def _generate_tiles(terrain_opts, numbers_opts):
                    [catan.board.HexNumber.eight]*2 + [catan.board.HexNumber.nine]*2 +
                    [catan.board.HexNumber.ten]*2 + [catan.board.HexNumber.eleven]*2 +
                    [catan.board.HexNumber.twelve])
-        random.shuffle(numbers)
+        rng.shuffle(numbers)
         numbers.insert(terrain.index(catan.board.Terrain.desert), catan.board.HexNumber.none)
     elif numbers_opts == Opt.preset:
         numbers = ([catan.board.HexNumber.five,
@@ -277,7 +281,8 @@ def _get_pieces(tiles, ports, players_opts, pieces_opts):
     if pieces_opts == Opt.empty:
         return dict()
     elif pieces_opts == Opt.debug:
-        players = catan.game.Game.get_debug_players()
+        from .game import Game
+        players = Game.get_debug_players()
         return {
             (hexgrid.NODE, 0x23): catan.pieces.Piece(catan.pieces.PieceType.settlement, players[0]),
             (hexgrid.EDGE, 0x22): catan.pieces.Piece(catan.pieces.PieceType.road, players[0]),
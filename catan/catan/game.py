@@ -1,3 +1,4 @@
+import contextlib
 import copy
 import logging
 import random
@@ -7,9 +8,39 @@ import hexgrid
 import catanlog
 import undoredo
 
+import catan.actions
 import catan.states
 import catan.board
 import catan.pieces
+import catan.roads
+import catan.topology
+import catan.trading
+import catan.zobrist
+from catan.hand import Hand, RESOURCES, resource_index
+
+
+# Resources paid for each purchase once the pregame is over
+ROAD_COST = [catan.board.Terrain.brick, catan.board.Terrain.wood]
+SETTLEMENT_COST = [catan.board.Terrain.brick, catan.board.Terrain.wood,
+                   catan.board.Terrain.wheat, catan.board.Terrain.sheep]
+CITY_COST = [catan.board.Terrain.wheat, catan.board.Terrain.wheat,
+             catan.board.Terrain.ore, catan.board.Terrain.ore, catan.board.Terrain.ore]
+DEV_CARD_COST = [catan.board.Terrain.wheat, catan.board.Terrain.sheep, catan.board.Terrain.ore]
+
+# The same costs as the count of each resource, in catan.hand.RESOURCES order
+BUILD_COSTS = {build: tuple(cost.count(terrain) for terrain in RESOURCES)
+               for build, cost in (('road', ROAD_COST),
+                                   ('settlement', SETTLEMENT_COST),
+                                   ('city', CITY_COST),
+                                   ('dev_card', DEV_CARD_COST))}
+
+# The development card deck at the start of a game
+DEV_DECK = (['Knight'] * 14 +
+            ['Road Builder'] * 2 +
+            ['Monopoly'] * 2 +
+            ['Year of Plenty'] * 2 +
+            ['Victory Point'] * 5)
+
 
 class Game(object):
     """
@@ -27,7 +58,8 @@ class Game(object):
 
     e.g. self.set_state(states.GameStateNotInGame(self))
     """
-    def __init__(self, players=None, board=None, logging='on', pregame='on', use_stdout=False):
+    def __init__(self, players=None, board=None, logging='on', pregame='on', use_stdout=False, undo='on',
+                 seed=None):
         """
         Create a Game with the given options.
 
@@ -36,15 +68,21 @@ class Game(object):
         :param logging: (on|off)
         :param pregame: (on|off)
         :param use_stdout: bool (log to stdout?)
+        :param undo: (on|off) keep restore points for undo and redo. Headless games turn this off.
+        :param seed: seed for the game's dice, discards, steals and dev cards. The same seed,
+        board and moves replay the same game. Default None, seeded from the system.
         """
         self.observers = set()
         self.undo_manager = undoredo.UndoManager()
         self.options = {
             'pregame': pregame,
+            'undo': undo,
         }
         self.players = players or list()
         self.board = board or catan.board.Board()
         self.robber = catan.pieces.Piece(catan.pieces.PieceType.robber, None)
+        self.seed = seed
+        self.rng = random.Random(seed)
 
         # catanlog: writing, reading
         if logging == 'on':
@@ -52,6 +90,7 @@ class Game(object):
         else:
             self.catanlog = catanlog.NoopCatanLog()
         # self.catanlog_reader = catanlog.Reader()
+        self.beliefs = None # set by catan.beliefs.track
 
         self.state = None # set in #set_state
         self.dev_card_state = None # set in #set_dev_card_state
@@ -61,6 +100,16 @@ class Game(object):
         self._cur_turn = 0 # incremented in #end_turn
         self.robber_tile = None # set in #move_robber
 
+        self.hands = dict() # set in #set_players
+        self.dev_hands = dict() # set in #set_players
+        self.dev_deck = list() # set in #set_players
+        self.knights_played = dict() # set in #set_players
+        self._applying = False # set in #apply
+        self._owned_cache = dict() # filled in #_owned_pieces
+        self._road_cache = dict() # filled in #longest_road
+        self._port_cache = dict() # filled in #_ports
+        self._trade_actions = dict() # filled in #_trade_action
+
         self.board.observers.add(self)
 
         self.set_state(catan.states.GameStateNotInGame(self))
@@ -83,10 +132,16 @@ class Game(object):
 
     def do(self, command: undoredo.Command):
         """
-        Does the command using the undo_manager's stack
+        Does the command using the undo_manager's stack.
+
+        With option undo=off, or while an action is applied, the command is run directly
+        and no restore point is made.
         :param command: Command
         """
-        self.undo_manager.do(command)
+        if self.options.get('undo') == 'off' or self._applying:
+            command.do_method(command.obj, *command.args)
+        else:
+            self.undo_manager.do(command)
         self.notify_observers()
 
     def undo(self):
@@ -124,6 +179,9 @@ class Game(object):
         self.board.restore(game.board)
         self.robber = game.robber
         self.catanlog = game.catanlog
+        self.beliefs = game.beliefs
+        self.seed = game.seed
+        self.rng = game.rng
 
         self.state = game.state
         self.state.game = self
@@ -136,11 +194,280 @@ class Game(object):
         self._cur_turn = game._cur_turn
         self.robber_tile = game.robber_tile
 
+        self.hands = game.hands
+        self.dev_hands = game.dev_hands
+        self.dev_deck = game.dev_deck
+        self.knights_played = game.knights_played
+
         self.notify_observers()
 
+    def snapshot(self):
+        """
+        Capture everything that changes during play, for lookahead without #copy.
+
+        The board's tiles and ports, the players and the catanlog are shared with the game
+        rather than copied. Hands, dev cards, pieces, the robber, turn counters, the game
+        state and the rng state are copied.
+
+        e.g.
+            snapshot = game.snapshot()
+            game.roll(8)
+            game.restore_snapshot(snapshot)
+
+        :return: GameSnapshot
+        """
+        return GameSnapshot(self)
+
+    def restore_snapshot(self, snapshot):
+        """
+        Put this game back the way it was when the snapshot was taken. A snapshot can be
+        restored any number of times. Unlike #restore, observers are not notified.
+
+        Anything written to the catanlog since the snapshot stays written, so play
+        lookahead games with logging off.
+
+        :param snapshot: GameSnapshot, from #snapshot on this game
+        """
+        snapshot.restore(self)
+
+    def apply(self, action):
+        """
+        Play an action in place, and return a token which #unapply uses to take it back.
+
+        Only what the action can change is recorded: the hands, the current player's dev
+        cards and knights, the pieces on the coordinates it touches, the robber, the turn
+        counters, the states, and the rng state if the action draws from it. Nothing is
+        pushed onto the undo stack.
+
+        Tokens must be unapplied in the reverse order they were applied, like a stack.
+
+        e.g.
+            token = game.apply(Action('buy_road', edge))
+            score = evaluate(game)
+            game.unapply(token)
+
+        :param action: catan.actions.Action
+        :return: UndoToken
+        """
+        token = UndoToken(self, action)
+        self._applying = True
+        try:
+            self.play(action)
+        finally:
+            self._applying = False
+        return token
+
+    def play(self, action):
+        """
+        Play an action for real, the way a player making the move would. Unlike #apply, the
+        move goes on the undo stack (with option undo=on) and can't be unapplied.
+
+        :param action: catan.actions.Action
+        """
+        if action.name == 'play_road_builder':
+            self.set_state(catan.states.GameStatePlacingRoadBuilderPieces(self))
+            for edge in action.args:
+                self.place_road(edge)
+        else:
+            getattr(self, action.name)(*action.args)
+
+    def unapply(self, token):
+        """
+        Take back the action which returned the token from #apply, restoring the game
+        exactly as it was before. Observers are not notified.
+
+        :param token: UndoToken
+        """
+        token.restore(self)
+
+    @contextlib.contextmanager
+    def detached(self):
+        """
+        Keep the game from notifying observers or writing to the catanlog, for lookahead
+        which plays moves with #apply on a game that has a user interface or a log.
+
+        e.g.
+            with game.detached():
+                token = game.apply(action)
+                score = evaluate(game)
+                game.unapply(token)
+        """
+        observers, board_observers, log = self.observers, self.board.observers, self.catanlog
+        self.observers, self.board.observers, self.catanlog = set(), set(), catanlog.NoopCatanLog()
+        try:
+            yield
+        finally:
+            self.observers, self.board.observers, self.catanlog = observers, board_observers, log
+
+    def zobrist_hash(self):
+        """
+        A 64-bit hash of the position, for the transposition tables and evaluation caches
+        of search bots: the pieces on the board, the robber, each seat's resource counts,
+        dev cards and knights played, whose turn it is, and the game and dev card states.
+
+        The board and the hands keep their hashes up to date as they change (see
+        Board#zobrist_hash), and the rest is a few lookups per player, so this is cheap to
+        call after every #apply. The dev card deck, the dice and the turn number aren't
+        included, so the same position reached by different moves hashes the same.
+
+        :return: int
+        """
+        zobrist = catan.zobrist
+        value = self.board.zobrist_hash()
+        for player in self.players:
+            seat = player.seat
+            value ^= zobrist.rotate(self.hands[player].zobrist_hash(), seat)
+            value ^= zobrist.dev_cards_key(seat, tuple(sorted(self.dev_hands[player])), self.knights_played[player])
+        if self._cur_player is not None:
+            value ^= zobrist.cur_player_key(self._cur_player.seat)
+        if self.robber_tile is not None:
+            value ^= zobrist.robber_key(self.robber_tile)
+        value ^= zobrist.state_key(self.state) ^ zobrist.state_key(self.dev_card_state)
+        return value
+
     # def read_from_file(self, file):
     #     self.catanlog_reader.use_file(file)
 
+
+    def legal_actions(self):
+        """
+        Every action the current player can make in the current state, in a fixed order.
+        Each can be passed to #apply, or called as a Game method.
+
+        Rolls are listed once per dice total in catan.actions.ROLLS; which one happens is
+        up to the dice. Trades are 1 card for the best bank or port rate the player has.
+
+        Actions are shared between calls (see catan.actions.shared), so building the list
+        is cheap; don't modify them.
+
+        :return: list(catan.actions.Action)
+        """
+        state = self.state
+        if not state.is_in_game():
+            return list()
+        shared = catan.actions.shared
+        player = self.get_cur_player()
+        actions = list()
+
+        if state.can_roll():
+            actions.extend(shared('roll', roll) for roll in catan.actions.ROLLS)
+        if state.can_move_robber():
+            actions.extend(shared('move_robber', tile_id)
+                           for tile_id in catan.topology.TILE_IDS if tile_id != self.robber_tile)
+        if state.can_steal():
+            stealable = self.stealable_players()
+            victims = [victim for victim in self.players if victim in stealable] or [None]
+            actions.extend(shared('steal', victim) for victim in victims)
+
+        if state.can_place_road() or state.can_buy_road():
+            name = 'place_road' if state.can_place_road() else 'buy_road'
+            actions.extend(shared(name, edge) for edge in self._legal_road_edges(player))
+        if state.can_place_settlement() or state.can_buy_settlement():
+            name = 'place_settlement' if state.can_place_settlement() else 'buy_settlement'
+            owner = None if state.is_in_pregame() else player
+            actions.extend(shared(name, node) for node in self.board.legal_settlement_nodes(owner))
+        if state.can_place_city() or state.can_buy_city():
+            name = 'place_city' if state.can_place_city() else 'buy_city'
+            settlements, _, _ = self._owned_pieces(player)
+            actions.extend(shared(name, node) for node in settlements)
+        if state.can_buy_dev_card():
+            actions.append(shared('buy_dev_card'))
+
+        if state.can_trade():
+            hand = self.hands[player]
+            for give, rate in zip(RESOURCES, self.trade_rates(player)):
+                if hand.count(give) >= rate:
+                    actions.extend(self._trade_action(player, give, rate, get)
+                                   for get in RESOURCES if get != give)
+
+        if state.can_play_knight():
+            actions.append(shared('play_knight'))
+        if state.can_play_monopoly():
+            actions.extend(shared('play_monopoly', terrain) for terrain in RESOURCES)
+        if state.can_play_year_of_plenty():
+            actions.extend(shared('play_year_of_plenty', first, second)
+                           for i, first in enumerate(RESOURCES) for second in RESOURCES[i:])
+        if state.can_play_road_builder():
+            actions.extend(shared('play_road_builder', first, second)
+                           for first, second in self._road_builder_pairs(player))
+        if state.can_play_victory_point():
+            actions.append(shared('play_victory_point'))
+        if state.can_end_turn():
+            actions.append(shared('end_turn'))
+        return actions
+
+    def _legal_road_edges(self, player):
+        """
+        The edges the player can build a road on. In the pregame, the road must go next to
+        the settlement just placed, which is the player's settlement with no road yet.
+        """
+        edges = self.board.legal_road_edges(player)
+        if not self.state.is_in_pregame():
+            return edges
+        settlements, roads, _ = self._owned_pieces(player)
+        roads = set(roads)
+        newest = [node for node in settlements
+                  if not roads.intersection(catan.topology.NODE_EDGES[node])]
+        return [edge for edge in edges
+                if any(node in newest for node in catan.topology.EDGE_NODES[edge])]
+
+    def _road_builder_pairs(self, player):
+        """
+        Pairs of edges the player can build with a road builder, each pair listed once.
+        The second road can extend the first.
+        """
+        first_edges = self.board.legal_road_edges(player)
+        firsts = set(first_edges)
+        pieces = self.board.pieces
+        pairs = list()
+        for first in first_edges:
+            seconds = set(firsts)
+            seconds.discard(first)
+            for node in catan.topology.EDGE_NODES[first]:
+                piece = pieces.get((hexgrid.NODE, node))
+                if piece is not None and piece.owner != player:
+                    continue
+                for edge in catan.topology.NODE_EDGES[node]:
+                    if edge != first and (hexgrid.EDGE, edge) not in pieces:
+                        seconds.add(edge)
+            for second in sorted(seconds):
+                # both orders work when both edges were already open, so keep one of them
+                if second in firsts and second < first:
+                    continue
+                pairs.append((first, second))
+        return pairs
+
+    def trade_action(self, player, give, get):
+        """
+        The trade of give to the bank or a port, at the player's best rate (see
+        #trade_rate), for one get. Shared like the actions of #legal_actions; don't modify it.
+
+        :param player: Player
+        :param give: Terrain, not desert
+        :param get: Terrain, not desert or give
+        :return: catan.actions.Action
+        """
+        return self._trade_action(player, give, self.trade_rate(player, give), get)
+
+    def _trade_action(self, player, give, rate, get):
+        """
+        :return: shared Action trading rate of give to the bank or a port for 1 get
+        """
+        key = (player, give, rate, get)
+        action = self._trade_actions.get(key)
+        if action is None:
+            if rate == 2:
+                port_type = catan.board.PortType(give.value)
+            elif rate == 3:
+                port_type = catan.board.PortType.any3
+            else:
+                port_type = catan.board.PortType.any4
+            trade = catan.trading.CatanTrade(giver=player, getter=catan.board.Port(None, None, port_type))
+            trade.give(give, rate)
+            trade.get(get)
+            action = self._trade_actions[key] = catan.actions.Action('trade', trade)
+        return action
+
     def notify(self, observable):
         self.notify_observers()
 
@@ -203,7 +530,7 @@ class Game(object):
 
         for (_, coord), piece in self.board.pieces.items():
             if piece.type == catan.pieces.PieceType.robber:
-                self.robber_tile = hexgrid.tile_id_from_coord(coord)
+                self.robber_tile = catan.topology.TILE_ID[coord]
                 logging.debug('Found robber at coord={}, set robber_tile={}'.format(coord, self.robber_tile))
 
         self.catanlog.log_game_start(self.players, terrain, numbers, self.board.ports)
@@ -212,12 +539,10 @@ class Game(object):
     def end(self, player=None):
         if not player:
             player = self.get_cur_player()
-        self.catanlog.log_player_wins(self.get_cur_player())
-        print(player.name, 'wins!!')
-        print(player.name, 'is Lord of Catan!')
+        self.catanlog.log_player_wins(player)
+        logging.info('{} wins'.format(player.name))
         if self.state.is_in_game():
             self.set_state(catan.states.GameStateNotInGame(self))
-        x = input()
 
     def reset(self):
         self.players = list()
@@ -240,79 +565,119 @@ class Game(object):
         self._cur_player = Player(player.seat, player.name, player.color)
 
     def set_players(self, players):
+        """
+        Set the players, and deal each of them an empty hand. The dev card deck is refilled.
+
+        :param players: list(Player)
+        """
         self.players = list(players)
         self.set_cur_player(self.players[0])
+        self.hands = {player: Hand() for player in self.players}
+        self.dev_hands = {player: list() for player in self.players}
+        self.dev_deck = list(DEV_DECK)
+        self.knights_played = {player: 0 for player in self.players}
         self.notify_observers()
 
     def cur_player_has_port_type(self, port_type):
         return self.player_has_port_type(self.get_cur_player(), port_type)
 
     def player_has_port_type(self, player, port_type):
-        for port in self.board.ports:
-            if port.type == port_type and self._player_has_port(player, port):
-                return True
-        return False
-
-    def _player_has_port(self, player, port):
-        edge_coord = hexgrid.edge_coord_in_direction(port.tile_id, port.direction)
-        for node in hexgrid.nodes_touching_edge(edge_coord):
-            pieces = self.board.get_pieces((catan.pieces.PieceType.settlement, catan.pieces.PieceType.city), node)
-            if len(pieces) < 1:
-                continue
-            elif len(pieces) > 1:
-                raise Exception('Probably a bug, num={} pieces found on node={}'.format(
-                    len(pieces), node
-                ))
-            assert len(pieces) == 1  # will be asserted by previous if/elif combo
-            piece = pieces[0]
-            if piece.owner == player:
-                return True
-        return False
+        return port_type in self.port_types(player)
+
+    def port_types(self, player):
+        """
+        The ports the player has a settlement or city on.
+
+        :param player: Player
+        :return: frozenset(PortType)
+        """
+        return self._ports(player)[0]
+
+    def trade_rate(self, player, terrain):
+        """
+        The fewest cards of a resource the player must give for one card of their choice:
+        2 with that resource's port, 3 with a 3:1 port, 4 otherwise.
+
+        :param player: Player
+        :param terrain: Terrain, not desert
+        :return: int
+        """
+        return self._ports(player)[1][resource_index(terrain)]
+
+    def trade_rates(self, player):
+        """
+        :param player: Player
+        :return: tuple of #trade_rate for each resource, in catan.hand.RESOURCES order
+        """
+        return self._ports(player)[1]
+
+    def _ports(self, player):
+        """
+        :return: (frozenset of PortType, tuple of trade rates), cached until the player's
+        pieces change
+        """
+        version = self.board.owner_version(player)
+        port_nodes = self.board.port_types_by_node()
+        cached = self._port_cache.get(player)
+        if cached is not None and cached[0] == version and cached[1] is port_nodes:
+            return cached[2]
+        settlements, _, cities = self._owned_pieces(player)
+        port_types = frozenset(port_nodes[node] for node in settlements + cities if node in port_nodes)
+        any_rate = 3 if catan.board.PortType.any3 in port_types else 4
+        rates = tuple(2 if catan.board.PortType(terrain.value) in port_types else any_rate
+                      for terrain in RESOURCES)
+        ports = (port_types, rates)
+        self._port_cache[player] = (version, port_nodes, ports)
+        return ports
 
     @undoredo.undoable
     def roll(self, roll):
         self.catanlog.log_roll(self.get_cur_player(), roll)
         self.last_roll = roll
         self.last_player_to_roll = self.get_cur_player()
-        print()
-        print(self.get_cur_player().name, 'rolled a', roll, '...')
+        logging.info('{} rolled a {}'.format(self.get_cur_player().name, roll))
         if int(roll) == 7:
             self.set_state(catan.states.GameStateMoveRobber(self))
             for player in self.players:
                 if len(self.hands[player]) > 7:
                     cards_to_lose = math.floor(len(self.hands[player])/2)
                     for _ in range(cards_to_lose):
-                        chosen_card = random.choice(self.hands[player])
+                        chosen_card = self.rng.choice(self.hands[player])
                         self.hands[player].remove(chosen_card)
-                    print(player, 'discarded', cards_to_lose, 'cards')
+                    logging.info('{} discarded {} cards'.format(player, cards_to_lose))
 
 
         else:
-            for tile_id in range(1, 20):
-                tile = self.board.tiles[tile_id - 1]
-                if tile.number == catan.board.HexNumber.none:
-                    continue
-                if tile_id == self.robber_tile:
-                    continue
-                if tile.number != catan.board.HexNumber.from_digit_or_none(roll):
-                    continue
-                for cdir in ['NW', 'N', 'NE', 'SE', 'S', 'SW']:
-                    coord = hexgrid.from_location(hexgrid.NODE, tile_id, direction=cdir)
-                    if (hexgrid.NODE, coord) in self.board.pieces:
-                        if self.board.pieces[(hexgrid.NODE, coord)].type == catan.pieces.PieceType.settlement:
-                            self.hands[self.board.pieces[(hexgrid.NODE, coord)].owner].append(tile.terrain)
-                            print("{} earned a {}".format(self.board.pieces[(hexgrid.NODE, coord)].owner.name, tile.terrain.name))
-                            # print('gave', self.board.pieces[(hexgrid.NODE, coord)].owner, 'a', tile.terrain)
-                        elif self.board.pieces[(hexgrid.NODE, coord)].type == catan.pieces.PieceType.city:
-                            self.hands[self.board.pieces[(hexgrid.NODE, coord)].owner].append(tile.terrain)
-                            self.hands[self.board.pieces[(hexgrid.NODE, coord)].owner].append(tile.terrain)
-                            print("{} earned 2 {}".format(self.board.pieces[(hexgrid.NODE, coord)].owner.name, tile.terrain.name))
-                            # print('gave', self.board.pieces[(hexgrid.NODE, coord)].owner, '2', tile.terrain)
-                        else:
-                            print('ERROR')
+            for player, terrain, count in self.roll_payouts(roll):
+                self.hands[player].add(terrain, count)
 
             self.set_state(catan.states.GameStateDuringTurnAfterRoll(self))
 
+    def roll_payouts(self, roll):
+        """
+        The cards a roll pays out, as #roll pays them: one per settlement and two per city
+        on each tile with that number, except the robber's tile.
+
+        :param roll: dice total, int, not 7
+        :return: list of (Player, Terrain, count), in the order #roll adds them
+        """
+        payouts = list()
+        pieces = self.board.pieces
+        for tile_id, terrain, nodes in self.board.payouts_for(roll):
+            if tile_id == self.robber_tile:
+                continue
+            for node in nodes:
+                piece = pieces.get((hexgrid.NODE, node))
+                if piece is None:
+                    continue
+                if piece.type == catan.pieces.PieceType.settlement:
+                    payouts.append((piece.owner, terrain, 1))
+                elif piece.type == catan.pieces.PieceType.city:
+                    payouts.append((piece.owner, terrain, 2))
+                else:
+                    logging.error('Unexpected piece={} on node={}'.format(piece, hex(node)))
+        return payouts
+
     @undoredo.undoable
     def move_robber(self, tile):
         self.state.move_robber(tile)
@@ -328,7 +693,7 @@ class Game(object):
         if self.robber_tile is None:
             return list()
         stealable = set()
-        for node in hexgrid.nodes_touching_tile(self.robber_tile):
+        for node in catan.topology.TILE_NODES[self.robber_tile]:
             pieces = self.board.get_pieces(types=(catan.pieces.PieceType.settlement, catan.pieces.PieceType.city), coord=node)
             if pieces:
                 logging.debug('found stealable player={}, cur={}'.format(pieces[0].owner, self.get_cur_player()))
@@ -354,6 +719,7 @@ class Game(object):
         if self.state.is_in_pregame():
             self.end_turn()
         else:
+            self._pay(ROAD_COST)
             self.set_state(catan.states.GameStateDuringTurnAfterRoll(self))
 
     # @undoredo.undoable # state.place_settlement calls this, place_settlement is undoable
@@ -363,8 +729,11 @@ class Game(object):
         self.board.place_piece(piece, node)
         self.catanlog.log_buys_settlement(self.get_cur_player(), hexgrid.location(hexgrid.NODE, node))
         if self.state.is_in_pregame():
+            if self._cur_turn >= len(self.players):
+                self._collect_starting_resources(node)
             self.set_state(catan.states.GameStatePreGamePlacingPiece(self, catan.pieces.PieceType.road))
         else:
+            self._pay(SETTLEMENT_COST)
             self.set_state(catan.states.GameStateDuringTurnAfterRoll(self))
 
     # @undoredo.undoable # state.place_city calls this, place_city is undoable
@@ -373,21 +742,41 @@ class Game(object):
         piece = catan.pieces.Piece(catan.pieces.PieceType.city, self.get_cur_player())
         self.board.place_piece(piece, node)
         self.catanlog.log_buys_city(self.get_cur_player(), hexgrid.location(hexgrid.NODE, node))
+        self._pay(CITY_COST)
         self.set_state(catan.states.GameStateDuringTurnAfterRoll(self))
 
     @undoredo.undoable
     def buy_dev_card(self):
         self.catanlog.log_buys_dev_card(self.get_cur_player())
-        self.hands[self.get_cur_player()].remove(catan.board.Terrain.wheat)
-        self.hands[self.get_cur_player()].remove(catan.board.Terrain.sheep)
-        self.hands[self.get_cur_player()].remove(catan.board.Terrain.ore)
+        self._pay(DEV_CARD_COST)
 
-        card_to_buy = random.choice(self.dev_deck)
+        card_to_buy = self.rng.choice(self.dev_deck)
         self.dev_hands[self.get_cur_player()].append(card_to_buy)
         self.dev_deck.remove(self.dev_hands[self.get_cur_player()][-1])
-        print('{} buys the development card: {}'.format(self.get_cur_player().name, card_to_buy))
+        logging.info('{} buys the development card: {}'.format(self.get_cur_player().name, card_to_buy))
         self.notify_observers()
 
+    def _pay(self, cost):
+        """
+        Remove the resources in cost from the current player's hand.
+
+        :param cost: list(Terrain), e.g. ROAD_COST
+        """
+        self.hands[self.get_cur_player()].pay(cost)
+
+    def _collect_starting_resources(self, node):
+        """
+        The second settlement placed in the pregame collects one resource from each tile it touches.
+
+        :param node: node coordinate of the settlement, int
+        """
+        hand = self.hands[self.get_cur_player()]
+        for tile_id in catan.topology.NODE_TILES[node]:
+            tile = self.board.tiles[tile_id - 1]
+            if tile.terrain == catan.board.Terrain.desert:
+                continue
+            hand.append(tile.terrain)
+
     @undoredo.undoable
     def place_road(self, edge_coord):
         self.state.place_road(edge_coord)
@@ -405,18 +794,17 @@ class Game(object):
         giver = trade.giver()
         giving = trade.giving()
         getting = trade.getting()
-        for terr in giving:
-            for _ in range(0, terr[0]):
-                self.hands[giver].remove(terr[1])
-                if not (hasattr(trade.getter(), 'type') and trade.getter().type in catan.board.PortType):
-                    self.hands[trade.getter()].append(terr[1])
-        for terr in getting:
-            for _ in range(0, terr[0]):
-                if not (hasattr(trade.getter(), 'type') and trade.getter().type in catan.board.PortType):
-                    self.hands[trade.getter()].remove(terr[1])
-                self.hands[giver].append(terr[1])
-
-        if hasattr(trade.getter(), 'type') and trade.getter().type in catan.board.PortType:
+        with_port = hasattr(trade.getter(), 'type') and trade.getter().type in catan.board.PortType
+        for num, terrain in giving:
+            self.hands[giver].remove(terrain, num)
+            if not with_port:
+                self.hands[trade.getter()].add(terrain, num)
+        for num, terrain in getting:
+            if not with_port:
+                self.hands[trade.getter()].remove(terrain, num)
+            self.hands[giver].add(terrain, num)
+
+        if with_port:
             getter = trade.getter()
             self.catanlog.log_trades_with_port(giver, giving, getter, getting)
             logging.debug('trading {} to port={} to get={}'.format(giving, getter, getting))
@@ -430,7 +818,7 @@ class Game(object):
     @undoredo.undoable
     def play_knight(self):
         self.set_dev_card_state(catan.states.DevCardPlayedState(self))
-        print(self.get_cur_player().name, 'plays a Knight')
+        logging.info('{} plays a Knight'.format(self.get_cur_player().name))
         self.set_state(catan.states.GameStateMoveRobberUsingKnight(self))
         self.dev_hands[self.get_cur_player()].remove('Knight')
         self.knights_played[self.get_cur_player()] += 1
@@ -438,19 +826,20 @@ class Game(object):
     @undoredo.undoable
     def play_monopoly(self, resource):
         self.catanlog.log_plays_monopoly(self.get_cur_player(), resource)
-        print(self.get_cur_player().name, 'plays a Monopoly on', resource)
+        logging.info('{} plays a Monopoly on {}'.format(self.get_cur_player().name, resource))
         for player in self.players:
             if player != self.get_cur_player():
-                while resource in self.hands[player]:
-                    self.hands[self.get_cur_player()].append(resource)
-                    self.hands[player].remove(resource)
+                num = self.hands[player].count(resource)
+                self.hands[player].remove(resource, num)
+                self.hands[self.get_cur_player()].add(resource, num)
         self.set_dev_card_state(catan.states.DevCardPlayedState(self))
         self.dev_hands[self.get_cur_player()].remove('Monopoly')
 
     @undoredo.undoable
     def play_year_of_plenty(self, resource1, resource2):
         self.catanlog.log_plays_year_of_plenty(self.get_cur_player(), resource1, resource2)
-        print(self.get_cur_player().name, 'plays a Year of Plenty for', resource1, 'and', resource2)
+        logging.info('{} plays a Year of Plenty for {} and {}'.format(
+            self.get_cur_player().name, resource1, resource2))
         self.hands[self.get_cur_player()].append(resource1)
         self.hands[self.get_cur_player()].append(resource2)
         self.set_dev_card_state(catan.states.DevCardPlayedState(self))
@@ -461,8 +850,8 @@ class Game(object):
         self.catanlog.log_plays_road_builder(self.get_cur_player(),
                                                     hexgrid.location(hexgrid.EDGE, edge1),
                                                     hexgrid.location(hexgrid.EDGE, edge2))
-        print(self.get_cur_player().name, 'plays a Road Builder')
-        
+        logging.info('{} plays a Road Builder'.format(self.get_cur_player().name))
+
         self.set_dev_card_state(catan.states.DevCardPlayedState(self))
         self.dev_hands[self.get_cur_player()].remove('Road Builder')
 
@@ -511,46 +900,38 @@ class Game(object):
     #     }
     # }
 
-    def get_longest_road_from_coords(self, coords):
-
-        if not coords:
-            return 0
-
-        _offsets = [
-            -16,
-            -17,
-            -1,
-            +16,
-            +17,
-            +1,
-        ]
-
-        longest_road = 1
-
-        for coord in coords:
-
-            road_ended = False
-            working_longest_road = 1
-
-            working_coords = coords[:]
-
-            while road_ended is not True:
-
-                for offset in _offsets:
+    def get_longest_road_from_coords(self, coords, blocked=frozenset()):
+        """
+        Length of the longest continuous road along the given edges. See module roads.
 
-                    if (coord + offset) in working_coords:
-                        working_coords.remove(coord)
-                        working_longest_road += 1
-                        coord = coord + offset
-                        break
+        :param coords: list of edge coords
+        :param blocked: node coords holding another player's settlement or city, which
+        the road can't pass through
+        :return: int
+        """
+        return catan.roads.longest_road(coords, blocked)
 
-                    if offset == _offsets[len(_offsets) - 1]:
-                        road_ended = True
+    def longest_road(self, player):
+        """
+        Length of the player's longest road, broken by other players' settlements and cities.
 
-            if (working_longest_road > longest_road):
-                longest_road = working_longest_road
+        Cached until the player's pieces or any building on the board change.
 
-        return longest_road
+        :param player: Player
+        :return: int
+        """
+        key = (self.board.owner_version(player), self.board.buildings_version())
+        cached = self._road_cache.get(player)
+        if cached is not None and cached[0] == key:
+            return cached[1]
+        blocked = set()
+        for (hex_type, coord), piece in self.board.pieces.items():
+            if hex_type == hexgrid.NODE and piece.owner != player:
+                blocked.add(coord)
+        _, roads, _ = self._owned_pieces(player)
+        length = self.get_longest_road_from_coords(roads, blocked)
+        self._road_cache[player] = (key, length)
+        return length
 
     def assign_victory_points(self, user_materials):
 
@@ -592,52 +973,220 @@ class Game(object):
             user_materials[player]["victory_points"] = victory_points
 
     def get_all_user_materials(self):
-
+        """
+        Build a fresh, mutable dict of each player's materials from #ledger. Callers are
+        free to modify it. Use #ledger directly where a read-only view will do.
+        """
         user_materials = {}
-        for player in self.players:
+        for player, entry in self.ledger().items():
 
             user_materials[player] = {
-                "resources": [],
-                "longest_road": 0,
-                "knights": 0,
-                "dev_cards": {},
-                "victory_points": 0,
+                "settlement": list(entry.settlements),
+                "road": list(entry.roads),
+                "city": list(entry.cities),
+                "resources": self.hands[player],
+                "longest_road": entry.longest_road,
+                "knights": entry.knights,
+                "dev_cards": self.dev_hands[player],
+                "victory_points": entry.victory_points,
+                "turns_taken": 0,
+                "have_built_road": 0,
+                "have_built_sett": 0,
+            }
+
+        return user_materials
+
+    def ledger(self):
+        """
+        A read-only summary of each player's position: pieces by type, knights played,
+        longest road and victory points.
+
+        Piece lists are cached per player, and only recomputed after that player's pieces
+        change on the board. Longest roads are cached too, see #longest_road. Victory points are re-tallied from the
+        cached totals on every call, which is a handful of comparisons per player.
+
+        :return: dict mapping Player -> PlayerLedger
+        """
+        totals = dict()
+        for player in self.players:
+            settlements, roads, cities = self._owned_pieces(player)
+            totals[player] = {
+                "settlement": settlements,
+                "road": roads,
+                "city": cities,
+                "longest_road": self.longest_road(player),
+                "knights": self.knights_played[player],
             }
+        self.assign_victory_points(totals)
+        return {player: PlayerLedger(settlements=total["settlement"],
+                                     roads=total["road"],
+                                     cities=total["city"],
+                                     longest_road=total["longest_road"],
+                                     knights=total["knights"],
+                                     victory_points=total["victory_points"])
+                for player, total in totals.items()}
+
+    def _owned_pieces(self, player):
+        """
+        :return: (settlement coords, road coords, city coords), cached until the player's
+        pieces change
+        """
+        version = self.board.owner_version(player)
+        cached = self._owned_cache.get(player)
+        if cached is not None and cached[0] == version:
+            return cached[1]
+        coords = {
+            catan.pieces.PieceType.settlement: list(),
+            catan.pieces.PieceType.road: list(),
+            catan.pieces.PieceType.city: list(),
+        }
+        for (_, coord), piece in self.board.owned_pieces(player).items():
+            coords[piece.type].append(coord)
+        owned = (tuple(coords[catan.pieces.PieceType.settlement]),
+                 tuple(coords[catan.pieces.PieceType.road]),
+                 tuple(coords[catan.pieces.PieceType.city]))
+        self._owned_cache[player] = (version, owned)
+        return owned
 
-        for (_, piece_coord), piece_obj in self.board.pieces.items():
 
-            piece_owner = piece_obj.owner
-            piece_type = piece_obj.type.value
+class PlayerLedger(object):
+    """
+    class PlayerLedger is a read-only summary of one player's position. See Game.ledger.
+
+    :param settlements: tuple of node coords
+    :param roads: tuple of edge coords
+    :param cities: tuple of node coords
+    :param longest_road: length of the player's longest road, int
+    :param knights: number of knights played, int
+    :param victory_points: int, including longest road, largest army and victory point cards
+    """
+    def __init__(self, settlements, roads, cities, longest_road, knights, victory_points):
+        self.settlements = settlements
+        self.roads = roads
+        self.cities = cities
+        self.longest_road = longest_road
+        self.knights = knights
+        self.victory_points = victory_points
 
-            if piece_owner is None:
-                continue
+    def __repr__(self):
+        return '<PlayerLedger settlements={} roads={} cities={} longest_road={} knights={} victory_points={}>'.format(
+            len(self.settlements), len(self.roads), len(self.cities),
+            self.longest_road, self.knights, self.victory_points)
 
-            if piece_type not in user_materials[piece_owner]:
-                user_materials[piece_owner][piece_type] = []
+class GameSnapshot(object):
+    """
+    class GameSnapshot holds copies of the mutable parts of a Game. See Game.snapshot.
+    """
+    def __init__(self, game):
+        self.board = game.board.snapshot()
+        self.players = list(game.players)
+        self.robber_tile = game.robber_tile
+        self.state = catan.states.copy_state(game.state)
+        self.dev_card_state = game.dev_card_state
+        self.rng_state = game.rng.getstate()
 
-            # Add pieces to user dictionary
-            user_materials[piece_owner][
-                piece_type].append(piece_coord)
+        self._cur_player = game._cur_player
+        self._cur_turn = game._cur_turn
+        self.last_roll = game.last_roll
+        self.last_player_to_roll = game.last_player_to_roll
 
-        # Count resources that each player has.
-        for player in self.players:
+        self.hands = {player: hand.copy() for player, hand in game.hands.items()}
+        self.dev_hands = {player: list(hand) for player, hand in game.dev_hands.items()}
+        self.dev_deck = list(game.dev_deck)
+        self.knights_played = dict(game.knights_played)
 
-            user_materials[player]["resources"] = self.hands[player]
-            user_materials[player]["dev_cards"] = self.dev_hands[player]
-            user_materials[player]["knights"] = self.knights_played[player]
+    def restore(self, game):
+        game.board.restore_snapshot(self.board)
+        game.players = list(self.players)
+        game.robber_tile = self.robber_tile
+        game.state = catan.states.copy_state(self.state)
+        game.state.game = game
+        game.dev_card_state = self.dev_card_state
+        game.rng.setstate(self.rng_state)
+
+        game._cur_player = self._cur_player
+        game._cur_turn = self._cur_turn
+        game.last_roll = self.last_roll
+        game.last_player_to_roll = self.last_player_to_roll
+
+        game.hands = {player: hand.copy() for player, hand in self.hands.items()}
+        game.dev_hands = {player: list(hand) for player, hand in self.dev_hands.items()}
+        game.dev_deck = list(self.dev_deck)
+        game.knights_played = dict(self.knights_played)
+
+
+class UndoToken(object):
+    """
+    class UndoToken holds what an action is about to change. See Game.apply.
+    """
+    def __init__(self, game, action):
+        self.action = action
+        player = game.get_cur_player()
 
-            if "road" in user_materials[player]:
-                user_materials[player]["longest_road"] = self.get_longest_road_from_coords(user_materials[player]["road"])
+        self.state = catan.states.copy_state(game.state)
+        self.board_state = game.board.state
+        self.dev_card_state = game.dev_card_state
+        self._cur_player = game._cur_player
+        self._cur_turn = game._cur_turn
+        self.last_roll = game.last_roll
+        self.last_player_to_roll = game.last_player_to_roll
+        self.robber_tile = game.robber_tile
 
-            if "turns_taken" not in user_materials[player]:
-                user_materials[player]["turns_taken"] = 0
+        self.hands = [(hand, hand.counts) for hand in game.hands.values()]
+        self.dev_hand = list(game.dev_hands.get(player, ()))
+        self.knights_played = game.knights_played.get(player)
+        self.player = player
 
-            if "have_built_road" not in user_materials[player]:
-                user_materials[player]["have_built_road"] = 0
-                user_materials[player]["have_built_sett"] = 0
+        self.pieces = dict()
+        for key in _touched_pieces(game, action):
+            self.pieces.setdefault(key, game.board.pieces.get(key))
+
+        self.dev_deck = None
+        if action.name == 'buy_dev_card':
+            self.dev_deck = list(game.dev_deck)
+
+        self.rng_state = None
+        if action.name in ('steal', 'buy_dev_card') or (action.name == 'roll' and int(action.args[0]) == 7):
+            self.rng_state = game.rng.getstate()
+
+    def restore(self, game):
+        game.state = self.state
+        game.board.state = self.board_state
+        game.dev_card_state = self.dev_card_state
+        game._cur_player = self._cur_player
+        game._cur_turn = self._cur_turn
+        game.last_roll = self.last_roll
+        game.last_player_to_roll = self.last_player_to_roll
+        game.robber_tile = self.robber_tile
+
+        for hand, counts in self.hands:
+            hand.set_counts(counts)
+        if self.player in game.dev_hands:
+            game.dev_hands[self.player][:] = self.dev_hand
+            game.knights_played[self.player] = self.knights_played
+
+        for key, piece in self.pieces.items():
+            game.board.restore_piece(key, piece)
+
+        if self.dev_deck is not None:
+            game.dev_deck[:] = self.dev_deck
+        if self.rng_state is not None:
+            game.rng.setstate(self.rng_state)
+
+
+def _touched_pieces(game, action):
+    """
+    :return: the board.pieces keys which the action can add, replace or remove
+    """
+    if action.name in ('buy_road', 'place_road', 'play_road_builder'):
+        return [(hexgrid.EDGE, edge) for edge in action.args]
+    elif action.name in ('buy_settlement', 'place_settlement', 'buy_city', 'place_city'):
+        return [(hexgrid.NODE, action.args[0])]
+    elif action.name == 'move_robber' and game.robber_tile is not None:
+        return [(hexgrid.TILE, catan.topology.TILE_COORD[game.robber_tile]),
+                (hexgrid.TILE, catan.topology.TILE_COORD[action.args[0]])]
+    return list()
 
-        self.assign_victory_points(user_materials)
-        return user_materials
 
 class Player(object):
     """class Player represents a single player on the game board.
@@ -653,6 +1202,8 @@ class Player(object):
 
         self.name = name.lower().replace(' ', '')
         self.color = color.lower().replace(' ', '')
+        # players key most per-player dicts, so hash once
+        self._hash = sum(bytes(str(self), encoding='utf8'))
 
     def __eq__(self, other):
         if other is None:
@@ -667,4 +1218,4 @@ class Player(object):
         return '{} ({})'.format(self.color, self.name)
 
     def __hash__(self):
-        return sum(bytes(str(self), encoding='utf8'))
+        return self._hash
@@ -0,0 +1,162 @@
+"""
+module hand provides class Hand, a player's resource cards stored as counts.
+
+A Hand keeps one count per resource, so adding, removing, counting and checking whether
+a cost can be paid take constant time no matter how many cards are held.
+
+For existing callers a Hand also behaves like the list of Terrain it replaces: it supports
+len, in, iteration, indexing, count, append and remove. Iteration and indexing list the
+cards grouped by resource, in the order of RESOURCES.
+
+Each Hand also keeps a Zobrist hash of its counts up to date as cards come and go, for
+Game#zobrist_hash.
+"""
+from catan.board import Terrain
+from catan.zobrist import count_key
+
+# Resource types which can be held in a hand, in the order they are stored
+RESOURCES = (Terrain.wood, Terrain.brick, Terrain.wheat, Terrain.sheep, Terrain.ore)
+NUM_RESOURCES = len(RESOURCES)
+
+_index = {terrain: i for i, terrain in enumerate(RESOURCES)}
+
+
+def resource_index(terrain):
+    """
+    :param terrain: Terrain, not desert
+    :return: position of the resource in a count vector, int on [0,NUM_RESOURCES)
+    """
+    return _index[terrain]
+
+
+class Hand(object):
+    """
+    class Hand is a player's resource cards, stored as a count per resource.
+
+    :param cards: iterable of Terrain to start with, default empty
+    """
+    def __init__(self, cards=()):
+        self._counts = [0] * NUM_RESOURCES
+        self._size = 0
+        self._zobrist = 0
+        for terrain in cards:
+            self.add(terrain)
+
+    @property
+    def counts(self):
+        """
+        :return: tuple of int, the count of each resource in RESOURCES order
+        """
+        return tuple(self._counts)
+
+    def set_counts(self, counts):
+        """
+        Replace the contents of the hand.
+
+        :param counts: sequence of int, the count of each resource in RESOURCES order
+        """
+        self._counts = list(counts)
+        self._size = sum(self._counts)
+        self._zobrist = 0
+        for i, num in enumerate(self._counts):
+            self._zobrist ^= count_key(i, num)
+
+    def zobrist_hash(self):
+        """
+        :return: 64-bit int which depends only on the counts, see module catan.zobrist
+        """
+        return self._zobrist
+
+    def copy(self):
+        hand = Hand()
+        hand._counts = list(self._counts)
+        hand._size = self._size
+        hand._zobrist = self._zobrist
+        return hand
+
+    def add(self, terrain, num=1):
+        i = _index[terrain]
+        have = self._counts[i]
+        self._counts[i] = have + num
+        self._size += num
+        self._zobrist ^= count_key(i, have) ^ count_key(i, have + num)
+
+    def remove(self, terrain, num=1):
+        """
+        Remove num cards of the given resource.
+
+        :raises ValueError: if the hand holds fewer than num of them, like list.remove
+        """
+        i = _index[terrain]
+        have = self._counts[i]
+        if have < num:
+            raise ValueError('Hand has {} {}, cannot remove {}'.format(have, terrain.value, num))
+        self._counts[i] = have - num
+        self._size -= num
+        self._zobrist ^= count_key(i, have) ^ count_key(i, have - num)
+
+    def can_afford(self, cost):
+        """
+        :param cost: iterable of Terrain, e.g. catan.game.CITY_COST, or a Hand
+        :return: whether every card in cost is in the hand
+        """
+        if isinstance(cost, Hand):
+            return all(have >= need for have, need in zip(self._counts, cost._counts))
+        need = [0] * NUM_RESOURCES
+        for terrain in cost:
+            need[_index[terrain]] += 1
+        return all(have >= n for have, n in zip(self._counts, need))
+
+    def pay(self, cost):
+        """
+        Remove every card in cost from the hand.
+
+        :param cost: iterable of Terrain
+        :raises ValueError: if the hand can't afford the cost, in which case it is unchanged
+        """
+        if not self.can_afford(cost):
+            raise ValueError('Hand {} cannot afford {}'.format(self, list(cost)))
+        for terrain in cost:
+            self.remove(terrain)
+
+    # list compatibility
+
+    def append(self, terrain):
+        self.add(terrain)
+
+    def count(self, terrain):
+        i = _index.get(terrain)
+        if i is None:
+            return 0
+        return self._counts[i]
+
+    def __contains__(self, terrain):
+        return self.count(terrain) > 0
+
+    def __len__(self):
+        return self._size
+
+    def __iter__(self):
+        for terrain, num in zip(RESOURCES, self._counts):
+            for _ in range(num):
+                yield terrain
+
+    def __getitem__(self, index):
+        if index < 0:
+            index += self._size
+        if not 0 <= index < self._size:
+            raise IndexError('Hand index out of range')
+        for terrain, num in zip(RESOURCES, self._counts):
+            if index < num:
+                return terrain
+            index -= num
+
+    def __eq__(self, other):
+        if isinstance(other, Hand):
+            return self._counts == other._counts
+        if isinstance(other, list):
+            return self == Hand(other)
+        return False
+
+    def __repr__(self):
+        return repr(list(self))
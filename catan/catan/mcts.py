@@ -0,0 +1,538 @@
+"""
+module mcts chooses moves by Monte Carlo tree search, for bots which can trade thinking time
+for strength.
+
+Each decision searches from the current position until its wall-clock budget runs out. An
+iteration walks down the tree by UCT (upper confidence bounds applied to trees), adds one
+new node, plays on from there with a cheap playout policy for a few turns, and credits each
+node on the way with how well the playout went for the player who made that node's move.
+
+The search plays moves on the game itself with Game#apply and puts it back with
+Game#restore_snapshot, so nothing is copied per iteration. Observers and the catanlog are
+detached while it runs, see Game#detached.
+
+Dice rolls are chance nodes: the search rolls 2d6 with its own rng, so the tree grows a
+branch per total at the rate that total comes up. Everything else random (steals, discards,
+dev cards) draws from game.rng, which is reseeded every iteration, so the search can't see
+the real game's future draws.
+
+The tree is open loop: a node is a sequence of moves rather than a position, since the same
+moves can lead to different hands after different rolls. Moves which aren't legal in the
+position reached this time are skipped.
+
+    strategy = catan.mcts.MctsStrategy(budget=0.5)
+    result = catan.simulation.play_game(game, players, [strategy] * 4)
+    print(strategy.stats)  # playouts/s and nodes/s over the game
+
+Given workers, each search grows that many trees at once, in separate processes, and adds
+up their root visits and rewards when the budget runs out:
+
+    strategy = catan.mcts.MctsStrategy(budget=0.5, workers=4)
+    ...
+    strategy.close()
+"""
+import concurrent.futures
+import logging
+import math
+import random
+import time
+
+import hexgrid
+
+import catan.actions
+import catan.pieces
+import catan.position
+import catan.production
+import catan.simulation
+from catan.hand import RESOURCES
+
+# Seconds each decision searches for, by default
+BUDGET = 1.0
+# Turns each playout plays past the tree before the position is scored, by default
+PLAYOUT_TURNS = 4
+# Exploration constant of UCT. Rewards are on [0,1], so sqrt(2) is the textbook choice.
+EXPLORATION = math.sqrt(2)
+# Victory points one expected card per roll is worth, when scoring a playout that nobody won
+PRODUCTION_WEIGHT = 4.0
+# Victory points the chance of affording each build within PROGRESS_TURNS is worth, when
+# scoring a playout that nobody won. Less than the build itself, so that building beats
+# saving up for it, but enough that trading toward a build beats sitting on the cards.
+PROGRESS_WEIGHTS = {'settlement': 0.6, 'city': 0.6, 'road': 0.15, 'dev_card': 0.15}
+# Turns of production counted toward affording a build, see catan.production#build_probabilities
+PROGRESS_TURNS = 1
+# Victory points it's worth to have somewhere to build a settlement, so that roads toward
+# one are worth building. Progress toward a settlement counts only with somewhere to put it.
+SETTLEMENT_SPOT_WEIGHT = 0.3
+# Visits a new node starts with, each scored as the position right after its move. A prior
+# like this ranks moves before any playouts have, which matters with dozens to choose among.
+PRIOR_VISITS = 5
+# Moves MctsStrategy makes in a turn at most, in case the search keeps trading back and forth
+MAX_ACTIONS_PER_TURN = 30
+
+# Stands for rolling the dice, whatever the total. #search returns it when rolling is best.
+ROLL = catan.actions.Action('roll')
+
+# Playout policy: the first tier with a legal action is played, see #_playout_action
+_PLAYOUT_TIERS = {
+    'move_robber': 0,
+    'steal': 0,
+    'place_settlement': 0,
+    'place_road': 0,
+    'place_city': 0,
+    'buy_city': 1,
+    'buy_settlement': 1,
+    'buy_road': 2,
+    'buy_dev_card': 2,
+}
+# Chance of taking a tier 2 action when there is one, rather than ending the turn
+_PLAYOUT_BUILD_CHANCE = 0.5
+
+
+class SearchStats(object):
+    """
+    class SearchStats counts the work done by one or more searches.
+
+    :param searches: number of searches
+    :param playouts: number of playouts, one per iteration
+    :param nodes: number of positions searched, i.e. actions applied in the tree and in playouts
+    :param elapsed: wall-clock seconds spent searching
+    """
+    def __init__(self, searches=0, playouts=0, nodes=0, elapsed=0.0):
+        self.searches = searches
+        self.playouts = playouts
+        self.nodes = nodes
+        self.elapsed = elapsed
+
+    def add(self, other):
+        self.searches += other.searches
+        self.playouts += other.playouts
+        self.nodes += other.nodes
+        self.elapsed += other.elapsed
+
+    def playouts_per_second(self):
+        if not self.elapsed:
+            return 0.0
+        return self.playouts / self.elapsed
+
+    def nodes_per_second(self):
+        if not self.elapsed:
+            return 0.0
+        return self.nodes / self.elapsed
+
+    def __repr__(self):
+        return '<SearchStats searches={} playouts={} nodes={} elapsed={:.3f}s playouts/s={:.0f} nodes/s={:.0f}>'.format(
+            self.searches, self.playouts, self.nodes, self.elapsed,
+            self.playouts_per_second(), self.nodes_per_second())
+
+
+class Node(object):
+    """
+    class Node is a move in the search tree, with the total reward of the iterations which
+    made it. Children are keyed by Action, and by ROLL for the chance node of a roll, whose
+    own children are keyed by the roll actions.
+
+    :param player: Player who made the move, whose reward the node adds up
+    """
+    def __init__(self, player):
+        self.player = player
+        self.children = dict()
+        self.visits = 0
+        self.reward = 0.0
+
+    def __repr__(self):
+        return '<Node player={} visits={} reward={:.2f} children={}>'.format(
+            self.player, self.visits, self.reward, len(self.children))
+
+
+def search(game, budget=BUDGET, iterations=None, names=None, playout_turns=PLAYOUT_TURNS, rng=None,
+           executor=None, workers=1):
+    """
+    Search for the current player's best move. The game is left as it was.
+
+    With more than one worker, the search is root parallel: each worker grows its own tree
+    from the same root until the same deadline, and the move with the most root visits over
+    all the trees is chosen, the one with the best mean reward among those tied. One tree is
+    grown here, and the rest in the executor's processes, from the position packed by
+    catan.position.
+
+    :param game: Game, in game
+    :param budget: seconds to search for
+    :param iterations: stop each tree after this many iterations even if there's budget left, default no limit
+    :param names: names of the actions to choose among, e.g. ('move_robber', ), default any legal action
+    :param playout_turns: turns to play past the tree in each playout
+    :param rng: random.Random for the dice and the playouts, default a new one
+    :param executor: concurrent.futures.Executor to grow the other trees in, required if workers > 1
+    :param workers: number of trees to grow at once
+    :return: (Action, SearchStats). The Action is one of game.legal_actions(), or ROLL, or
+    None if no legal action has one of the names.
+    """
+    rng = rng or random.Random()
+    actions = _root_actions(game, names)
+    options = _options(actions)
+    if len(options) <= 1:
+        return (options[0] if options else None), SearchStats(searches=1)
+
+    start = time.time()
+    deadline = start + budget
+    futures = list()
+    if workers > 1:
+        packed = catan.position.pack(game)
+        futures = [executor.submit(_search_worker, packed, names, deadline, iterations, playout_turns,
+                                   rng.getrandbits(64))
+                   for _ in range(workers - 1)]
+    visits, rewards, stats = _grow(game, actions, deadline, iterations, playout_turns, rng)
+    for future in futures:
+        worker_visits, worker_rewards, worker_stats = future.result()
+        visits = [mine + theirs for mine, theirs in zip(visits, worker_visits)]
+        rewards = [mine + theirs for mine, theirs in zip(rewards, worker_rewards)]
+        stats.playouts += worker_stats.playouts
+        stats.nodes += worker_stats.nodes
+    stats.elapsed = time.time() - start
+
+    # a short budget leaves many moves with only their prior visits, so ties are common
+    best = max(range(len(options)),
+               key=lambda index: (visits[index], rewards[index] / visits[index] if visits[index] else 0.0))
+    return options[best], stats
+
+
+def _grow(game, actions, deadline, iterations, playout_turns, rng):
+    """
+    Grow a tree from the game's position until the deadline, by time.time().
+
+    :param actions: the legal actions at the root to choose among, see #_root_actions
+    :return: (list of the root visits of each of _options(actions), list of their total
+    rewards, SearchStats)
+    """
+    stats = SearchStats(searches=1)
+    start = time.time()
+    root = Node(None)
+    snapshot = game.snapshot()
+    with game.detached():
+        try:
+            while True:
+                game.rng.seed(rng.getrandbits(64))
+                _iterate(game, root, actions, playout_turns, rng, stats)
+                game.restore_snapshot(snapshot)
+                stats.playouts += 1
+                if iterations is not None and stats.playouts >= iterations:
+                    break
+                if time.time() >= deadline:
+                    break
+        finally:
+            game.restore_snapshot(snapshot)
+    stats.elapsed = time.time() - start
+    children = root.children
+    nodes = [children.get(option) for option in _options(actions)]
+    return ([node.visits if node is not None else 0 for node in nodes],
+            [node.reward if node is not None else 0.0 for node in nodes],
+            stats)
+
+
+def _search_worker(packed, names, deadline, iterations, playout_turns, seed):
+    """
+    Grow one tree of a root parallel search. Runs in a worker process.
+
+    The root options are listed the same way in every process, so root visits and rewards
+    are returned by index rather than by Action, since trades don't compare equal across
+    processes.
+
+    :param packed: the root position, see catan.position.pack
+    :return: see #_grow
+    """
+    game = catan.position.unpack(packed, seed=seed)
+    return _grow(game, _root_actions(game, names), deadline, iterations, playout_turns, random.Random(seed))
+
+
+def _root_actions(game, names):
+    """
+    :return: the current player's legal actions, only those named if names isn't None
+    """
+    actions = game.legal_actions()
+    if names is not None:
+        actions = [action for action in actions if action.name in names]
+    return actions
+
+
+def _options(actions):
+    """
+    :return: the actions with every roll replaced by a single ROLL, which comes last
+    """
+    options = [action for action in actions if action.name != 'roll']
+    if len(options) < len(actions):
+        options.append(ROLL)
+    return options
+
+
+def _iterate(game, root, root_actions, playout_turns, rng, stats):
+    """
+    One iteration: select and expand down the tree from root, play out, and back up the
+    rewards along the path.
+    """
+    node = root
+    path = list()
+    actions = root_actions
+    winner = None
+    while game.state.is_in_game():
+        if actions is None:
+            actions = game.legal_actions()
+        options = _options(actions)
+        if not options:
+            break
+        player = game.get_cur_player()
+        option, child, expanded = _select(node, options, player, rng)
+        path.append(child)
+        if option is ROLL:
+            action = catan.actions.shared('roll', catan.simulation.roll_dice(rng))
+            chance = child
+            child = chance.children.get(action)
+            if child is None:
+                child = chance.children[action] = Node(player)
+                expanded = True
+            path.append(child)
+        else:
+            action = option
+        if action.name == 'end_turn' and _victory_points(game, player) >= catan.simulation.VICTORY_POINTS_TO_WIN:
+            winner = player
+            break
+        game.apply(action)
+        stats.nodes += 1
+        node = child
+        actions = None
+        if expanded:
+            prior = _rewards(game, None)
+            for new in path[-2:] if option is ROLL else path[-1:]:
+                if not new.visits:
+                    new.visits = PRIOR_VISITS
+                    new.reward = PRIOR_VISITS * prior.get(new.player, 0.0)
+            break
+
+    if winner is None:
+        winner = _playout(game, playout_turns, rng, stats)
+    rewards = _rewards(game, winner)
+    root.visits += 1
+    for node in path:
+        node.visits += 1
+        node.reward += rewards.get(node.player, 0.0)
+
+
+def _select(node, options, player, rng):
+    """
+    Pick a move at a node: one not tried yet if there is any, else the best by UCT.
+
+    :return: (option, child Node, whether the child is new)
+    """
+    children = node.children
+    untried = [option for option in options if option not in children]
+    if untried:
+        option = rng.choice(untried)
+        child = children[option] = Node(player)
+        return option, child, True
+    log_visits = math.log(node.visits)
+    best, best_score = None, -1.0
+    for option in options:
+        child = children[option]
+        score = child.reward / child.visits + EXPLORATION * math.sqrt(log_visits / child.visits)
+        if score > best_score:
+            best, best_score = option, score
+    return best, children[best], False
+
+
+def _playout(game, turns, rng, stats):
+    """
+    Play on with the playout policy until the given number of turns have ended, or someone wins.
+
+    :return: the winning Player, or None
+    """
+    ended = 0
+    while ended < turns and game.state.is_in_game():
+        action = _playout_action(game, rng)
+        if action is None:
+            break
+        if action.name == 'end_turn':
+            player = game.get_cur_player()
+            if _victory_points(game, player) >= catan.simulation.VICTORY_POINTS_TO_WIN:
+                return player
+            ended += 1
+        game.apply(action)
+        stats.nodes += 1
+    return None
+
+
+def _playout_action(game, rng):
+    """
+    The playout policy. Rolls, then builds a city or settlement whenever it can, else
+    trades a spare resource for one it has none of, sometimes builds a road or dev card,
+    and otherwise ends the turn. Doesn't play dev cards.
+
+    :return: Action, or None if there's nothing legal
+    """
+    if game.state.can_roll():
+        return catan.actions.shared('roll', catan.simulation.roll_dice(rng))
+    actions = game.legal_actions()
+    tiers = (list(), list(), list())
+    end_turn = None
+    for action in actions:
+        tier = _PLAYOUT_TIERS.get(action.name)
+        if tier is not None:
+            tiers[tier].append(action)
+        elif action.name == 'end_turn':
+            end_turn = action
+    if tiers[0]:
+        return rng.choice(tiers[0])
+    if tiers[1]:
+        return rng.choice(tiers[1])
+    if game.state.can_trade():
+        trade = _playout_trade(game, rng)
+        if trade is not None:
+            return trade
+    if tiers[2] and (end_turn is None or rng.random() < _PLAYOUT_BUILD_CHANCE):
+        return rng.choice(tiers[2])
+    if end_turn is not None:
+        return end_turn
+    return rng.choice(actions) if actions else None
+
+
+def _playout_trade(game, rng):
+    """
+    :return: a trade of the resource held most beyond its trade rate for one not held at
+    all, or None if there's no such trade
+    """
+    player = game.get_cur_player()
+    counts = game.hands[player].counts
+    rates = game.trade_rates(player)
+    missing = [terrain for terrain, count in zip(RESOURCES, counts) if not count]
+    spare, give = max(zip((count - rate for count, rate in zip(counts, rates)), RESOURCES),
+                      key=lambda pair: pair[0])
+    if spare < 0 or not missing:
+        return None
+    return game.trade_action(player, give, rng.choice(missing))
+
+
+def _rewards(game, winner):
+    """
+    Score the position for every player, on [0,1]: 1 for the winner, if any, otherwise
+    victory points plus the worth of their production and of their progress toward each
+    build, over the points needed to win.
+
+    :return: dict mapping Player -> float
+    """
+    if winner is not None:
+        return {player: 1.0 if player == winner else 0.0 for player in game.players}
+    production = _production(game)
+    rewards = dict()
+    for player, entry in game.ledger().items():
+        points = (entry.victory_points + PRODUCTION_WEIGHT * production.get(player, 0.0)
+                  + _progress(game, player))
+        rewards[player] = min(1.0, points / catan.simulation.VICTORY_POINTS_TO_WIN)
+    return rewards
+
+
+def _progress(game, player):
+    """
+    :return: victory points the player's hand and roads are worth as progress toward
+    builds, see PROGRESS_WEIGHTS and SETTLEMENT_SPOT_WEIGHT
+    """
+    probabilities = catan.production.build_probabilities(game, player, turns=PROGRESS_TURNS)
+    has_spot = bool(game.board.legal_settlement_nodes(player))
+    progress = SETTLEMENT_SPOT_WEIGHT if has_spot else 0.0
+    for build, weight in PROGRESS_WEIGHTS.items():
+        if build != 'settlement' or has_spot:
+            progress += weight * probabilities[build][-1]
+    return progress
+
+
+def _production(game):
+    """
+    :return: dict mapping Player -> expected resource cards per roll, the robber aside
+    """
+    production = dict()
+    pieces = game.board.pieces
+    for roll, ways in catan.actions.ROLL_WAYS.items():
+        if roll == 7:
+            continue
+        for tile_id, _, nodes in game.board.payouts_for(roll):
+            if tile_id == game.robber_tile:
+                continue
+            for node in nodes:
+                piece = pieces.get((hexgrid.NODE, node))
+                if piece is None:
+                    continue
+                cards = 2 if piece.type == catan.pieces.PieceType.city else 1
+                production[piece.owner] = production.get(piece.owner, 0.0) + cards * ways / 36
+    return production
+
+
+def _victory_points(game, player):
+    return game.ledger()[player].victory_points
+
+
+class MctsStrategy(catan.simulation.Strategy):
+    """
+    class MctsStrategy makes every decision of a seat by #search: pregame placements, whether
+    to play a knight before rolling, the robber and who to steal from, and each build, trade
+    and dev card during the turn.
+
+    The statistics of every search it makes are added up in self.stats.
+
+    :param budget: seconds per decision
+    :param iterations: iterations per decision at most, default no limit
+    :param playout_turns: see #search
+    :param seed: seed for the search's dice and playouts, default from the system
+    :param workers: trees each search grows at once, see #search. The processes for the
+    other trees are started at the first search and kept until #close.
+    """
+    def __init__(self, budget=BUDGET, iterations=None, playout_turns=PLAYOUT_TURNS, seed=None, workers=1):
+        self.budget = budget
+        self.iterations = iterations
+        self.playout_turns = playout_turns
+        self.rng = random.Random(seed)
+        self.workers = workers
+        self.stats = SearchStats()
+        self._executor = None # set in #choose
+
+    def start_settlement(self, game):
+        return self.choose(game, ('place_settlement', )).args[0]
+
+    def start_road(self, game):
+        return self.choose(game, ('place_road', )).args[0]
+
+    def before_roll(self, game):
+        if not game.state.can_play_knight():
+            return
+        action = self.choose(game, ('roll', 'play_knight'))
+        if action is not None and action.name == 'play_knight':
+            game.play(action)
+
+    def robber_tile(self, game):
+        return self.choose(game, ('move_robber', )).args[0]
+
+    def steal_victim(self, game):
+        return self.choose(game, ('steal', )).args[0]
+
+    def take_turn(self, game):
+        for _ in range(MAX_ACTIONS_PER_TURN):
+            action = self.choose(game)
+            if action is None or action is ROLL or action.name == 'end_turn':
+                return
+            game.play(action)
+
+    def choose(self, game, names=None):
+        """
+        Search for the current player's move.
+
+        :param names: see #search
+        :return: see #search
+        """
+        if self.workers > 1 and self._executor is None:
+            self._executor = concurrent.futures.ProcessPoolExecutor(max_workers=self.workers - 1)
+        action, stats = search(game, budget=self.budget, iterations=self.iterations, names=names,
+                               playout_turns=self.playout_turns, rng=self.rng,
+                               executor=self._executor, workers=self.workers)
+        self.stats.add(stats)
+        logging.info('{} chose {} after {}'.format(game.get_cur_player(), action, stats))
+        return action
+
+    def close(self):
+        if self._executor is not None:
+            self._executor.shutdown()
+            self._executor = None
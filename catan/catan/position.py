@@ -0,0 +1,101 @@
+"""
+module position packs the position of a game into tuples of ints and strs, which pickle
+small and fast, and unpacks them into a new headless Game.
+
+Use it to send a position to another process, e.g. a search worker, rather than pickling
+the Game itself along with its observers, undo stack and catanlog.
+
+    packed = catan.position.pack(game)
+    game = catan.position.unpack(packed)  # in the other process
+
+A position is the tiles, ports and players, and everything Game#snapshot captures except
+the rng: the pieces, the robber, the hands, dev cards and deck, knights played, whose turn
+it is, the turn counters, and the game and dev card states. The unpacked game has logging
+and undo off, and a new rng.
+"""
+import catan.board
+import catan.game
+import catan.pieces
+import catan.states
+from catan.board import Terrain, HexNumber, PortType
+
+
+def pack(game):
+    """
+    :param game: Game
+    :return: tuple, picklable, see #unpack
+    """
+    board = game.board
+    players = game.players
+    state = game.state
+    return (
+        tuple((tile.tile_id, tile.terrain.value, tile.number.value) for tile in board.tiles),
+        tuple((port.tile_id, port.direction, port.type.value) for port in board.ports),
+        tuple((player.seat, player.name, player.color) for player in players),
+        tuple((hex_type, coord, piece.type.value, _seat(piece.owner))
+              for (hex_type, coord), piece in board.pieces.items()),
+        tuple(game.hands[player].counts for player in players),
+        tuple(tuple(game.dev_hands[player]) for player in players),
+        tuple(game.dev_deck),
+        tuple(game.knights_played[player] for player in players),
+        _seat(game._cur_player),
+        game._cur_turn,
+        game.last_roll,
+        _seat(game.last_player_to_roll),
+        game.robber_tile,
+        type(state).__name__,
+        state.__dict__.get('piece_type') and state.__dict__['piece_type'].value,
+        tuple(state.__dict__['edges']) if 'edges' in state.__dict__ else None,
+        type(game.dev_card_state).__name__,
+    )
+
+
+def unpack(packed, seed=None):
+    """
+    :param packed: return value of #pack
+    :param seed: seed for the new game's rng, default None, seeded from the system
+    :return: Game in the packed position, with logging and undo off
+    """
+    (tiles, ports, players, pieces, hands, dev_hands, dev_deck, knights_played,
+     cur_seat, cur_turn, last_roll, last_seat, robber_tile,
+     state_name, piece_type, edges, dev_card_state_name) = packed
+
+    # preset ports rather than empty ones, which boardbuilder warns aren't implemented
+    board = catan.board.Board(terrain='empty', numbers='empty', ports='preset', pieces='empty')
+    board.tiles = [catan.board.Tile(tile_id, Terrain(terrain), HexNumber(number))
+                   for tile_id, terrain, number in tiles]
+    board.set_ports([catan.board.Port(tile_id, direction, PortType(port_type))
+                     for tile_id, direction, port_type in ports])
+    players = [catan.game.Player(seat, name, color) for seat, name, color in players]
+    by_seat = {player.seat: player for player in players}
+    board.pieces = {(hex_type, coord): catan.pieces.Piece(catan.pieces.PieceType(piece_type_value),
+                                                          by_seat.get(seat))
+                    for hex_type, coord, piece_type_value, seat in pieces}
+
+    game = catan.game.Game(board=board, logging='off', undo='off', seed=seed)
+    game.set_players(players)
+    for player, counts, dev_hand, knights in zip(players, hands, dev_hands, knights_played):
+        game.hands[player].set_counts(counts)
+        game.dev_hands[player] = list(dev_hand)
+        game.knights_played[player] = knights
+    game.dev_deck = list(dev_deck)
+    if cur_seat is not None:
+        game.set_cur_player(by_seat[cur_seat])
+    game._cur_turn = cur_turn
+    game.last_roll = last_roll
+    game.last_player_to_roll = by_seat.get(last_seat)
+    game.robber_tile = robber_tile
+
+    state = object.__new__(getattr(catan.states, state_name))
+    state.game = game
+    if piece_type is not None:
+        state.piece_type = catan.pieces.PieceType(piece_type)
+    if edges is not None:
+        state.edges = list(edges)
+    game.set_state(state)
+    game.set_dev_card_state(getattr(catan.states, dev_card_state_name)(game))
+    return game
+
+
+def _seat(player):
+    return None if player is None else player.seat
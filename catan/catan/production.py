@@ -0,0 +1,125 @@
+"""
+module production works out what a player's settlements and cities produce, as exact
+distributions over the 2d6 roll, and from that the chance they can afford a build within
+a number of turns.
+
+A player's income is the list of (number, resource, cards) their buildings collect: one
+card per settlement and two per city on each touching tile, except the robber's. Each
+roll of the dice, anyone's, pays out one of the 11 totals with odds catan.actions.ROLL_WAYS,
+so a turn, from one of the player's rolls to their next, is one roll per player.
+
+    income = catan.production.income(game, player)
+    catan.production.afford_probabilities(game.hands[player].counts, cost, income,
+                                          rolls=len(game.players), turns=10)
+
+Everything is memoized on the income, so it's worked out again only once the player's
+buildings or the robber move. A 7 pays nothing; discards, steals and trades aren't modelled.
+"""
+import functools
+import hexgrid
+import catan.actions
+from catan.board import Terrain
+from catan.game import BUILD_COSTS
+from catan.hand import NUM_RESOURCES, resource_index
+from catan.pieces import PieceType
+from catan.topology import NODE_TILES
+
+_NO_GAIN = (0, ) * NUM_RESOURCES
+
+
+def income(game, player):
+    """
+    :param game: Game
+    :param player: Player
+    :return: tuple of (number, resource index, cards), sorted, for each tile one of the
+    player's buildings touches, except the robber's
+    """
+    board = game.board
+    collected = list()
+    for (hex_type, node), piece in board.owned_pieces(player).items():
+        if hex_type != hexgrid.NODE:
+            continue
+        cards = 2 if piece.type == PieceType.city else 1
+        for tile_id in NODE_TILES[node]:
+            if tile_id == game.robber_tile:
+                continue
+            tile = board.tiles[tile_id - 1]
+            if tile.terrain == Terrain.desert or tile.number.value not in catan.actions.ROLL_WAYS:
+                continue
+            collected.append((tile.number.value, resource_index(tile.terrain), cards))
+    return tuple(sorted(collected))
+
+
+@functools.lru_cache(maxsize=1024)
+def roll_gains(income):
+    """
+    The cards one roll of the dice pays a player.
+
+    :param income: return value of #income
+    :return: tuple of (gain, probability), where gain is a tuple of int in
+    catan.hand.RESOURCES order, each gain once
+    """
+    ways = dict()
+    for roll in catan.actions.ROLLS:
+        gain = [0] * NUM_RESOURCES
+        for number, resource, cards in income:
+            if number == roll:
+                gain[resource] += cards
+        gain = tuple(gain)
+        ways[gain] = ways.get(gain, 0) + catan.actions.ROLL_WAYS[roll]
+    return tuple((gain, way / 36) for gain, way in sorted(ways.items()))
+
+
+def afford_probabilities(counts, cost, income, rolls, turns=10):
+    """
+    The chance a hand covers a cost within each number of turns, from the player's income
+    alone. Since income only adds cards, covering it within k turns is covering it after k.
+
+    :param counts: tuple of int, the hand now, in catan.hand.RESOURCES order
+    :param cost: tuple of int, same order, e.g. one of catan.game.BUILD_COSTS
+    :param income: return value of #income
+    :param rolls: int, rolls per turn, e.g. the number of players
+    :param turns: int, the most turns to look ahead
+    :return: tuple of turns + 1 floats, for 0 turns (the hand now) up to turns
+    """
+    deficit = tuple(max(0, need - have) for need, have in zip(cost, counts))
+    return _afford_probabilities(deficit, income, rolls, turns)
+
+
+@functools.lru_cache(maxsize=4096)
+def _afford_probabilities(deficit, income, rolls, turns):
+    """
+    Works on the cards still missing, each capped at what's needed, so the distribution
+    never has more states than the product of (missing + 1) over the resources.
+    """
+    missing = {deficit: 1.0}
+    probabilities = [missing.get(_NO_GAIN, 0.0)]
+    gains = roll_gains(income)
+    for _ in range(turns):
+        for _ in range(rolls):
+            after = dict()
+            for left, chance in missing.items():
+                if left == _NO_GAIN:
+                    after[left] = after.get(left, 0.0) + chance
+                    continue
+                for gain, gain_chance in gains:
+                    key = tuple(need - got if need > got else 0 for need, got in zip(left, gain))
+                    after[key] = after.get(key, 0.0) + chance * gain_chance
+            missing = after
+        probabilities.append(missing.get(_NO_GAIN, 0.0))
+    return tuple(probabilities)
+
+
+def build_probabilities(game, player, turns=10):
+    """
+    #afford_probabilities of each build for a player, from their hand and income now.
+
+    :return: dict mapping "road", "settlement", "city" and "dev_card" -> tuple of turns + 1
+    floats, see #afford_probabilities
+    """
+    counts = game.hands[player].counts
+    player_income = income(game, player)
+    rolls = len(game.players)
+    return {build: afford_probabilities(counts, cost, player_income, rolls, turns)
+            for build, cost in BUILD_COSTS.items()}
+
@@ -0,0 +1,155 @@
+"""
+module roads measures roads over the board's edge and node graph.
+
+Roads are edges, joined where they share a node. A road can end at a node holding an
+opponent's settlement or city, but can't continue through it, so opposing buildings split
+a player's roads into separate components.
+
+The longest road is the longest trail (no edge used twice, nodes may repeat) in any
+component. Each component is solved on its own and memoized by its edges and blocked
+nodes, so after a new road or an opposing settlement only the component that changed is
+searched again.
+
+#road_paths plans roads not yet built: the cheapest path from a player's network to each
+node it could reach, by Dijkstra over the same graph.
+"""
+import functools
+import heapq
+from catan.topology import EDGE_NODES, EDGE_BIT, NODE_BIT, NODE_EDGES, nodes_in
+
+# Extra roads a path is charged for each node on it at the end of an opponent's road, since
+# the opponent is likely to build there first
+CONTENTION_COST = 1
+
+
+def longest_road(edges, blocked=frozenset()):
+    """
+    Length of the longest continuous road along the given edges.
+
+    :param edges: iterable of edge coordinates owned by one player
+    :param blocked: set of node coordinates the road can't pass through, i.e. those
+    holding another player's settlement or city
+    :return: int
+    """
+    best = 0
+    for component, component_blocked in components(edges, blocked):
+        if len(component) <= best:
+            continue
+        best = max(best, _longest_trail(component, component_blocked))
+    return best
+
+
+def components(edges, blocked=frozenset()):
+    """
+    Split roads into pieces which connect without passing through a blocked node.
+
+    :param edges: iterable of edge coordinates
+    :param blocked: set of node coordinates
+    :return: list of (frozenset of edges, frozenset of blocked nodes they touch)
+    """
+    node_edges = dict()
+    for edge in edges:
+        for node in EDGE_NODES[edge]:
+            node_edges.setdefault(node, list()).append(edge)
+
+    result = list()
+    seen = set()
+    for start in node_edges.values():
+        for edge in start:
+            if edge in seen:
+                continue
+            seen.add(edge)
+            component = set()
+            component_blocked = set()
+            stack = [edge]
+            while stack:
+                cur = stack.pop()
+                component.add(cur)
+                for node in EDGE_NODES[cur]:
+                    if node in blocked:
+                        component_blocked.add(node)
+                        continue
+                    for nxt in node_edges[node]:
+                        if nxt not in seen:
+                            seen.add(nxt)
+                            stack.append(nxt)
+            result.append((frozenset(component), frozenset(component_blocked)))
+    return result
+
+
+@functools.lru_cache(maxsize=4096)
+def _longest_trail(component, blocked):
+    """
+    Exhaustive search for the longest trail in one connected component.
+
+    Stops as soon as a trail uses every edge, since nothing can beat that.
+    """
+    node_edges = dict()
+    for edge in component:
+        for node in EDGE_NODES[edge]:
+            node_edges.setdefault(node, list()).append(edge)
+
+    size = len(component)
+    best = 0
+    used = set()
+
+    def extend(node, length):
+        nonlocal best
+        if length > best:
+            best = length
+        if best == size:
+            return
+        if length > 0 and node in blocked:
+            return
+        for edge in node_edges[node]:
+            if edge in used:
+                continue
+            a, b = EDGE_NODES[edge]
+            used.add(edge)
+            extend(b if a == node else a, length + 1)
+            used.discard(edge)
+            if best == size:
+                return
+
+    # a longest trail starts at a dead end or junction unless the component is a cycle
+    starts = [node for node, touching in node_edges.items() if len(touching) != 2 or node in blocked]
+    for node in starts or list(node_edges):
+        extend(node, 0)
+        if best == size:
+            break
+    return best
+
+
+def road_paths(reach, occupied, blocked=0, contested=0):
+    """
+    Cheapest paths of new roads out from a player's network, to every node they can reach.
+
+    Each road costs 1, plus CONTENTION_COST if it ends at a contested node. A path can end
+    at a blocked node but can't continue through it.
+
+    :param reach: mask of catan.topology.NODE_BITs a new road can start from
+    :param occupied: mask of EDGE_BITs with a road on them, anyone's
+    :param blocked: mask of NODE_BITs holding another player's settlement or city
+    :param contested: mask of NODE_BITs at the end of another player's road
+    :return: dict mapping node coord -> (cost, tuple of edge coords to build, in order),
+    including the nodes of reach at cost 0 with no edges
+    """
+    paths = dict()
+    heap = [(0, node, ()) for node in nodes_in(reach)]
+    while heap:
+        cost, node, path = heapq.heappop(heap)
+        if node in paths:
+            continue
+        paths[node] = (cost, path)
+        if path and blocked & NODE_BIT[node]:
+            continue
+        for edge in NODE_EDGES[node]:
+            if occupied & EDGE_BIT[edge]:
+                continue
+            a, b = EDGE_NODES[edge]
+            other = b if a == node else a
+            if other in paths:
+                continue
+            step = 1 + (CONTENTION_COST if contested & NODE_BIT[other] else 0)
+            heapq.heappush(heap, (cost + step, other, path + (edge, )))
+    return paths
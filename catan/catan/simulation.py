@@ -0,0 +1,265 @@
+"""
+module simulation plays games of catan without a user interface.
+
+Each seat is played by a Strategy. The driver owns the turn structure (placing the
+pregame pieces, rolling, moving the robber on a 7, ending the turn, checking for a
+winner); strategies only make decisions and take actions through the Game's methods.
+
+Nothing here prints, sleeps or draws. Build games for simulation with logging and
+undo turned off, otherwise every action writes to the catanlog and copies the game:
+
+    board = catan.boardbuilder.build(rng=random.Random(seed))
+    game = catan.game.Game(board=board, logging='off', undo='off', seed=seed)
+    result = catan.simulation.play_game(game, players, strategies)
+
+Everything random in a game (board layout aside) draws from game.rng, so a game replays
+exactly from its seed as long as the strategies are deterministic or use game.rng too.
+
+Each game keeps catan.beliefs about the players' hands, as game.beliefs, so strategies
+can go by what's public rather than by game.hands.
+
+Use #play_game to play a single game and #play_games to play many of them and
+measure throughput.
+"""
+import logging
+import random
+import time
+
+import catan.beliefs
+import catan.states
+
+# Victory points needed to win the game
+VICTORY_POINTS_TO_WIN = 10
+# Games still running after this many turns (pregame excluded) end without a winner
+MAX_TURNS = 500
+
+
+class Strategy(object):
+    """
+    class Strategy makes the decisions for one seat of a headless game.
+
+    Subclasses must implement:
+        start_settlement(game)
+        start_road(game)
+        robber_tile(game)
+    Subclasses may override:
+        before_roll(game)
+        steal_victim(game)
+        take_turn(game)
+        close()
+    """
+    def start_settlement(self, game):
+        """
+        Choose where to place a settlement during the pregame.
+
+        :return: node coordinate, int
+        """
+        raise NotImplementedError()
+
+    def start_road(self, game):
+        """
+        Choose where to place a road during the pregame.
+
+        :return: edge coordinate, int
+        """
+        raise NotImplementedError()
+
+    def before_roll(self, game):
+        """
+        Act before rolling the dice, e.g. play a knight. Does nothing by default.
+        """
+        pass
+
+    def robber_tile(self, game):
+        """
+        Choose where to move the robber after a 7 or a knight.
+
+        :return: tile identifier, int
+        """
+        raise NotImplementedError()
+
+    def steal_victim(self, game):
+        """
+        Choose who to steal from once the robber has moved.
+
+        Defaults to the first stealable player in turn order.
+
+        :return: Player, or None if nobody can be stolen from
+        """
+        stealable = game.stealable_players()
+        for player in game.players:
+            if player in stealable:
+                return player
+        return None
+
+    def take_turn(self, game):
+        """
+        Build, trade and play dev cards after the roll. Does nothing by default.
+
+        The driver ends the turn once this returns.
+        """
+        pass
+
+    def close(self):
+        """
+        Release anything held between decisions, e.g. worker processes, once the strategy
+        is done with. Does nothing by default.
+        """
+        pass
+
+
+class GameResult(object):
+    """
+    class GameResult is the outcome of a single headless game.
+
+    :param winner: Player, or None if the game hit its turn limit
+    :param turns: number of turns played, not counting the pregame
+    :param victory_points: dict mapping Player -> victory points when the game ended
+    :param elapsed: wall-clock seconds spent playing the game
+    """
+    def __init__(self, winner, turns, victory_points, elapsed):
+        self.winner = winner
+        self.turns = turns
+        self.victory_points = victory_points
+        self.elapsed = elapsed
+
+    def __repr__(self):
+        return '<GameResult winner={}, turns={}, victory_points={}>'.format(
+            self.winner, self.turns, self.victory_points)
+
+
+class Report(object):
+    """
+    class Report collects the results of many headless games.
+    """
+    def __init__(self):
+        self.results = list()
+        self.elapsed = 0.0
+
+    def add(self, result):
+        self.results.append(result)
+        self.elapsed += result.elapsed
+
+    def games_per_second(self):
+        if not self.elapsed:
+            return 0.0
+        return len(self.results) / self.elapsed
+
+    def wins(self):
+        """
+        :return: dict mapping Player -> number of games won
+        """
+        wins = dict()
+        for result in self.results:
+            if result.winner is not None:
+                wins[result.winner] = wins.get(result.winner, 0) + 1
+        return wins
+
+
+def roll_dice(rng=random):
+    """
+    Roll two six-sided dice.
+
+    :param rng: source of randomness, random.Random or the random module
+    :return: int on [2,12]
+    """
+    return rng.randint(1, 6) + rng.randint(1, 6)
+
+
+def victory_points(game):
+    """
+    :return: dict mapping Player -> victory points
+    """
+    return {player: entry.victory_points for player, entry in game.ledger().items()}
+
+
+def play_game(game, players, strategies, max_turns=MAX_TURNS, rng=None):
+    """
+    Start the game with the given players and play it to the end.
+
+    :param game: Game, not yet started. Use logging='off' and undo='off' for speed.
+    :param players: list(Player), in turn order
+    :param strategies: list(Strategy), one per player, in the same order as players
+    :param max_turns: turns to play before giving up on finding a winner
+    :param rng: source of randomness for the dice, default game.rng
+    :return: GameResult
+    """
+    if len(players) != len(strategies):
+        raise ValueError('Need one strategy per player, got players={} strategies={}'.format(
+            len(players), len(strategies)))
+    by_player = dict(zip(players, strategies))
+    rng = rng or game.rng
+
+    start = time.perf_counter()
+    if game.beliefs is None:
+        catan.beliefs.track(game)
+    game.start(players)
+    winner = None
+    turns = 0
+    while game.state.is_in_game():
+        player = game.get_cur_player()
+        strategy = by_player[player]
+
+        if game.state.is_in_pregame():
+            if game.state.can_place_settlement():
+                game.place_settlement(strategy.start_settlement(game))
+            elif game.state.can_place_road():
+                game.place_road(strategy.start_road(game))
+            continue
+
+        if turns >= max_turns:
+            logging.debug('Game stopped after turns={} without a winner'.format(turns))
+            break
+
+        strategy.before_roll(game)
+        _resolve_robber(game, strategy)
+        if game.state.can_roll():
+            game.roll(roll_dice(rng))
+        _resolve_robber(game, strategy)
+        strategy.take_turn(game)
+        _resolve_robber(game, strategy)
+        turns += 1
+
+        points = victory_points(game)
+        if points[player] >= VICTORY_POINTS_TO_WIN:
+            winner = player
+            game.end(player=player)
+            break
+
+        if not game.state.can_end_turn():
+            logging.warning('{} left their turn in state={}, ending it anyway'.format(
+                player, type(game.state).__name__))
+            game.set_state(catan.states.GameStateDuringTurnAfterRoll(game))
+        game.end_turn()
+
+    return GameResult(winner=winner,
+                      turns=turns,
+                      victory_points=victory_points(game),
+                      elapsed=time.perf_counter() - start)
+
+
+def play_games(new_game, players, strategies, num_games, max_turns=MAX_TURNS, rng=None):
+    """
+    Play num_games headless games, one after another.
+
+    :param new_game: callable returning a fresh, unstarted Game
+    :param players: list(Player), in turn order
+    :param strategies: list(Strategy), one per player
+    :param num_games: number of games to play
+    :param max_turns: see #play_game
+    :param rng: see #play_game
+    :return: Report
+    """
+    report = Report()
+    for _ in range(num_games):
+        report.add(play_game(new_game(), players, strategies, max_turns=max_turns, rng=rng))
+    logging.info('Played {} games at {:.1f} games/s'.format(
+        len(report.results), report.games_per_second()))
+    return report
+
+
+def _resolve_robber(game, strategy):
+    if game.state.can_move_robber():
+        game.move_robber(strategy.robber_tile(game))
+    if game.state.can_steal():
+        game.steal(strategy.steal_victim(game))
@@ -55,11 +55,31 @@ GameState.__getattr__. The method call will be ignored and None will be returned
 
 If the method does not look like can_do_xyz(), it will be logged.
 
+Copying
+-------
+
+Use #copy_state rather than copy.copy on states. GameState.__getattr__ answers for every
+missing attribute, including the hooks the copy module looks for.
+
 """
-import random
 import logging
 import hexgrid
 import catan.pieces
+import catan.topology
+
+def copy_state(state):
+    """
+    Shallow copy a state of any of the state machines in this module. The copy refers to
+    the same game or board. List attributes (e.g. road builder edges) are copied too.
+
+    :param state: GameState, DevCardPlayabilityState or BoardState
+    :return: new state of the same type
+    """
+    result = object.__new__(type(state))
+    for k, v in vars(state).items():
+        result.__dict__[k] = list(v) if isinstance(v, list) else v
+    return result
+
 
 class GameState(object):
     """
@@ -126,11 +146,11 @@ class GameStateNotInGameMoveRobber(GameStateNotInGame):
 
     def move_robber(self, tile_id):
         robbers = self.game.board.get_pieces((catan.pieces.PieceType.robber, ),
-                                             hexgrid.tile_id_to_coord(self.game.robber_tile))
-        to_coord = hexgrid.tile_id_to_coord(tile_id)
+                                             catan.topology.TILE_COORD[self.game.robber_tile])
+        to_coord = catan.topology.TILE_COORD[tile_id]
         if robbers:
             robber = robbers[0]
-            from_coord = hexgrid.tile_id_to_coord(self.game.robber_tile)
+            from_coord = catan.topology.TILE_COORD[self.game.robber_tile]
             self.game.board.move_piece(robber, from_coord, to_coord)
         else:
             robber = catan.pieces.Piece(catan.pieces.PieceType.robber, None)
@@ -191,7 +211,7 @@ class GameStateInGame(GameState):
 
         :return Player
         """
-        logging.warning('turn={}, players={}'.format(
+        logging.debug('turn={}, players={}'.format(
             self.game._cur_turn,
             self.game.players
         ))
@@ -567,14 +587,14 @@ class GameStateMoveRobber(GameStateInGame):
 
     def move_robber(self, tile_id):
         robbers = self.game.board.get_pieces((catan.pieces.PieceType.robber, ),
-                                             hexgrid.tile_id_to_coord(self.game.robber_tile))
+                                             catan.topology.TILE_COORD[self.game.robber_tile])
         for robber in robbers:
             self.game.board.move_piece(robber,
-                                       hexgrid.tile_id_to_coord(self.game.robber_tile), hexgrid.tile_id_to_coord(tile_id))
+                                       catan.topology.TILE_COORD[self.game.robber_tile], catan.topology.TILE_COORD[tile_id])
         if len(robbers) != 1:
             logging.warning('{} robbers found in board.pieces'.format(len(robbers)))
         self.game.robber_tile = tile_id
-        print("New robber tile: {}".format(self.game.robber_tile))
+        logging.info('New robber tile: {}'.format(self.game.robber_tile))
         self.game.set_state(GameStateSteal(self.game))
 
     def can_roll(self):
@@ -613,10 +633,10 @@ class GameStateMoveRobberUsingKnight(GameStateMoveRobber):
     """
     def move_robber(self, tile_id):
         robbers = self.game.board.get_pieces((catan.pieces.PieceType.robber, ),
-                                             hexgrid.tile_id_to_coord(self.game.robber_tile))
+                                             catan.topology.TILE_COORD[self.game.robber_tile])
         for robber in robbers:
             self.game.board.move_piece(robber,
-                                       hexgrid.tile_id_to_coord(self.game.robber_tile), hexgrid.tile_id_to_coord(tile_id))
+                                       catan.topology.TILE_COORD[self.game.robber_tile], catan.topology.TILE_COORD[tile_id])
         if len(robbers) > 1:
             logging.warning('More than one robber found in board.pieces')
         self.game.robber_tile = tile_id
@@ -642,14 +662,14 @@ class GameStateSteal(GameStateInGame):
             victim
         )
         try:
-            card = random.choice(self.game.hands[victim])
+            card = self.game.rng.choice(self.game.hands[victim])
             self.game.hands[victim].remove(card)
             self.game.hands[self.game.get_cur_player()].append(card)
-            print(self.game.get_cur_player().name, 'steals a', card, 'from', victim.name)
+            logging.info('{} steals a {} from {}'.format(self.game.get_cur_player().name, card, victim.name))
         except IndexError:
-            print('no cards to steal from', victim.name)
+            logging.info('no cards to steal from {}'.format(victim.name))
         except KeyError:
-            print('no victim')
+            logging.info('no victim')
         self.game.set_state(GameStateDuringTurnAfterRoll(self.game))
 
     def can_roll(self):
@@ -693,14 +713,14 @@ class GameStateStealUsingKnight(GameStateSteal):
             victim
         )
         try:
-            card = random.choice(self.game.hands[victim])
+            card = self.game.rng.choice(self.game.hands[victim])
             self.game.hands[victim].remove(card)
             self.game.hands[self.game.get_cur_player()].append(card)
-            print(self.game.get_cur_player().name, 'steals a', card, 'from', victim.name)
+            logging.info('{} steals a {} from {}'.format(self.game.get_cur_player().name, card, victim.name))
         except IndexError:
-            print('no cards to steal from', victim.name)
+            logging.info('no cards to steal from {}'.format(victim.name))
         except KeyError:
-            print('no victim')
+            logging.info('no victim')
         self.game.set_state(GameStateDuringTurnAfterRoll(self.game))
 
 
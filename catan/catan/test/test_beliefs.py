@@ -0,0 +1,96 @@
+import random
+
+import catan.beliefs
+import catan.boardbuilder
+import catan.simulation
+import catan.trading
+from catan.game import Game, Player
+from catan.hand import RESOURCES
+
+
+class _RandomStrategy(catan.simulation.Strategy):
+    """
+    Plays random legal actions, and now and then a one-for-one trade with another player,
+    so that every event the beliefs follow turns up. Checks the beliefs after every turn.
+    """
+    def __init__(self, rng, checks):
+        self.rng = rng
+        self.checks = checks
+
+    def _choose(self, game, name):
+        return self.rng.choice([action.args[0] for action in game.legal_actions() if action.name == name])
+
+    def start_settlement(self, game):
+        return self._choose(game, 'place_settlement')
+
+    def start_road(self, game):
+        return self._choose(game, 'place_road')
+
+    def robber_tile(self, game):
+        return self._choose(game, 'move_robber')
+
+    def take_turn(self, game):
+        for _ in range(self.rng.randint(0, 6)):
+            if self.rng.random() < 0.2:
+                self._trade_with_player(game)
+                continue
+            actions = [action for action in game.legal_actions() if action.name != 'end_turn']
+            if not actions:
+                break
+            game.play(self.rng.choice(actions))
+        _check(game)
+        self.checks.append(game.get_cur_player())
+
+    def _trade_with_player(self, game):
+        player = game.get_cur_player()
+        if not game.state.can_trade():
+            return
+        others = [other for other in game.players if other != player and len(game.hands[other])]
+        if not others or not len(game.hands[player]):
+            return
+        other = self.rng.choice(others)
+        trade = catan.trading.CatanTrade(giver=player, getter=other)
+        trade.give(self.rng.choice(list(game.hands[player])))
+        trade.get(self.rng.choice(list(game.hands[other])))
+        game.trade(trade)
+
+
+def _check(game):
+    beliefs = game.beliefs
+    for player in game.players:
+        counts = game.hands[player].counts
+        assert all(known <= have for known, have in zip(beliefs.known(player), counts))
+        assert abs(beliefs.size(player) - len(game.hands[player])) < 1e-9
+        assert all(expected > -1e-9 for expected in beliefs.expected(player))
+        for resource in RESOURCES:
+            assert 0.0 <= beliefs.chance_of(player, resource) <= 1.0
+
+
+def test_beliefs_follow_headless_games():
+    checks = list()
+    for seed in range(8):
+        rng = random.Random(seed)
+        board = catan.boardbuilder.build(rng=random.Random(seed))
+        game = Game(board=board, logging='off', undo='off', seed=seed)
+        players = [Player(1, 'yurick', 'green'),
+                   Player(2, 'josh', 'blue'),
+                   Player(3, 'zach', 'orange'),
+                   Player(4, 'ross', 'red')]
+        catan.simulation.play_game(game, players, [_RandomStrategy(rng, checks) for _ in players],
+                                   max_turns=150)
+        assert game.beliefs is not None
+    assert len(checks) > 500
+
+
+def test_chance_of_ignores_rounding_residue():
+    game = Game(logging='off', undo='off', seed=0)
+    player = Player(1, 'yurick', 'green')
+    game.players = [player]
+    beliefs = catan.beliefs.HandBeliefs(game)
+    # what's left after paying from the pool is a whole number of cards, up to rounding
+    beliefs._known[player] = [1, 0, 0, 0, 0]
+    beliefs._pool[player] = [0.0, 0.0, 0.0, 0.0, 1.1e-16]
+    assert beliefs.chance_of(player, RESOURCES[0]) == 1.0
+    assert beliefs.chance_of(player, RESOURCES[4]) == 0.0
+    beliefs._pool[player] = [0.0, 0.0, 0.5, 0.0, 0.5]
+    assert beliefs.chance_of(player, RESOURCES[4]) == 0.5
@@ -0,0 +1,333 @@
+import random
+
+import hexgrid
+import catan.board
+import catan.boardbuilder
+import catan.roads
+import catan.topology
+from catan.actions import ROLL_WAYS
+from catan.board import Terrain
+from catan.game import Game, Player
+from catan.hand import RESOURCES, resource_index
+from catan.pieces import Piece, PieceType
+from catan.topology import EDGE_NODES, EDGES, NODE_EDGES, NODE_NODES, NODES, TILE_IDS, TILE_NODES
+
+_players = (Player(1, 'yurick', 'green'), Player(2, 'josh', 'blue'), Player(3, 'zach', 'orange'))
+
+
+def _building(pieces, node):
+    return pieces.get((hexgrid.NODE, node))
+
+
+def _road_owner(pieces, edge):
+    piece = pieces.get((hexgrid.EDGE, edge))
+    return piece.owner if piece is not None else None
+
+
+def _settlement_allowed(pieces, node):
+    return all(_building(pieces, other) is None for other in (node, ) + NODE_NODES[node])
+
+
+def _legal_settlement_nodes(pieces, owner=None):
+    return [node for node in sorted(NODES)
+            if _settlement_allowed(pieces, node)
+            and (owner is None or any(_road_owner(pieces, edge) == owner for edge in NODE_EDGES[node]))]
+
+
+def _legal_road_edges(pieces, owner):
+    edges = list()
+    for edge in sorted(EDGES):
+        if (hexgrid.EDGE, edge) in pieces:
+            continue
+        for node in EDGE_NODES[edge]:
+            building = _building(pieces, node)
+            if building is not None and building.owner == owner:
+                edges.append(edge)
+                break
+            if building is None and any(_road_owner(pieces, other) == owner
+                                        for other in NODE_EDGES[node] if other != edge):
+                edges.append(edge)
+                break
+    return edges
+
+
+def _check(board):
+    """
+    Compare the board's masks with the rules worked out from its pieces, and with a board
+    whose masks are rebuilt from scratch.
+    """
+    pieces = board.pieces
+    rebuilt = catan.board.Board()
+    rebuilt.pieces = dict(pieces)
+    for node in NODES:
+        assert board.settlement_allowed(node) == _settlement_allowed(pieces, node), hex(node)
+        assert rebuilt.settlement_allowed(node) == board.settlement_allowed(node)
+    assert board.legal_settlement_nodes() == _legal_settlement_nodes(pieces)
+    for owner in _players:
+        assert board.legal_settlement_nodes(owner) == _legal_settlement_nodes(pieces, owner)
+        assert board.legal_settlement_nodes(owner) == rebuilt.legal_settlement_nodes(owner)
+        assert board.legal_road_edges(owner) == _legal_road_edges(pieces, owner)
+        assert board.legal_road_edges(owner) == rebuilt.legal_road_edges(owner)
+
+
+def test_masks_match_pieces_after_random_placements_and_removals():
+    rng = random.Random(0)
+    board = catan.board.Board()
+    for step in range(600):
+        owner = rng.choice(_players)
+        placed = [(key, piece) for key, piece in board.pieces.items() if piece.owner is not None]
+        roll = rng.random()
+        if placed and roll < 0.25:
+            (hex_type, coord), piece = rng.choice(placed)
+            board.remove_piece(piece, coord)
+        elif roll < 0.45:
+            nodes = _legal_settlement_nodes(board.pieces)
+            if nodes:
+                board.place_piece(Piece(PieceType.settlement, owner), rng.choice(nodes))
+        elif roll < 0.55:
+            settlements = [coord for (hex_type, coord), piece in placed
+                           if piece.type == PieceType.settlement]
+            if settlements:
+                node = rng.choice(settlements)
+                city = Piece(PieceType.city, _building(board.pieces, node).owner)
+                board.remove_piece(_building(board.pieces, node), node)
+                board.place_piece(city, node)
+        else:
+            edges = _legal_road_edges(board.pieces, owner)
+            if edges:
+                board.place_piece(Piece(PieceType.road, owner), rng.choice(edges))
+        if step % 10 == 0:
+            _check(board)
+    _check(board)
+
+
+def test_distance_rule():
+    board = catan.board.Board()
+    owner = _players[0]
+    node = 0x67
+    neighbours = NODE_NODES[node]
+    assert len(neighbours) == 3
+    # a node two roads away, past a neighbour
+    far = [other for other in NODE_NODES[neighbours[0]] if other != node][0]
+
+    board.place_piece(Piece(PieceType.settlement, owner), node)
+    assert not board.settlement_allowed(node)
+    for other in neighbours:
+        assert not board.settlement_allowed(other)
+        assert not board.can_place_piece(Piece(PieceType.settlement, _players[1]), other)
+    assert board.settlement_allowed(far)
+    assert board.can_place_piece(Piece(PieceType.settlement, _players[1]), far)
+
+    # a second building next to the neighbour keeps it blocked after the first goes
+    board.place_piece(Piece(PieceType.settlement, _players[1]), far)
+    board.remove_piece(Piece(PieceType.settlement, owner), node)
+    assert board.settlement_allowed(node)
+    assert not board.settlement_allowed(neighbours[0])
+    for other in neighbours[1:]:
+        assert board.settlement_allowed(other)
+
+    # the coast has nodes with two neighbours
+    coastal = [other for other in NODES if len(NODE_NODES[other]) == 2][0]
+    board.place_piece(Piece(PieceType.settlement, owner), coastal)
+    assert [other for other in NODE_NODES[coastal] if board.settlement_allowed(other)] == []
+
+
+def test_settlements_past_the_first_two_need_a_road():
+    board = catan.board.Board()
+    owner = _players[0]
+    first, second = 0x67, 0x27
+    board.place_piece(Piece(PieceType.settlement, owner), first)
+    board.place_piece(Piece(PieceType.settlement, owner), second)
+    edge = NODE_EDGES[first][0]
+    board.place_piece(Piece(PieceType.road, owner), edge)
+    end = [node for node in EDGE_NODES[edge] if node != first][0]
+    beyond = [e for e in NODE_EDGES[end] if e != edge][0]
+    board.place_piece(Piece(PieceType.road, owner), beyond)
+    target = [node for node in EDGE_NODES[beyond] if node != end][0]
+    assert board.can_place_piece(Piece(PieceType.settlement, owner), target)
+    assert not board.can_place_piece(Piece(PieceType.settlement, owner), end)
+    # another player still placing their starting settlements needs no road
+    other = _players[1]
+    assert board.can_place_piece(Piece(PieceType.settlement, other), target)
+    for _ in range(2):
+        node = board.legal_settlement_nodes()[-1]
+        board.place_piece(Piece(PieceType.settlement, other), node)
+    assert not board.can_place_piece(Piece(PieceType.settlement, other), target)
+
+
+def test_port_index_follows_port_changes():
+    board = catan.board.Board()
+    port = board.get_port_at(1, 'NW')
+    assert port.type == catan.board.PortType.any3
+    nodes = catan.topology.port_nodes(port)
+    assert [board.port_types_by_node()[node] for node in nodes] == [catan.board.PortType.any3] * 2
+    while port.type != catan.board.PortType.wood:
+        board.cycle_port_type(1, 'NW')
+    board.lock()
+    assert [board.port_types_by_node()[node] for node in nodes] == [catan.board.PortType.wood] * 2
+
+    board.unlock()
+    board.port_types_by_node()
+    board.rotate_ports()
+    moved = catan.topology.port_nodes(port)
+    assert [board.port_types_by_node().get(node) for node in moved] == [catan.board.PortType.wood] * 2
+
+    board.set_ports([])
+    assert board.port_types_by_node() == dict()
+    board.set_ports([port])
+    assert set(board.port_types_by_node()) == set(moved)
+
+
+def _node_production(board):
+    """
+    Each node's ways out of 36 to roll each resource, worked out tile by tile.
+    """
+    production = {node: [0] * len(RESOURCES) for node in NODES}
+    for tile in board.tiles:
+        if tile.terrain == Terrain.desert or tile.number.value is None:
+            continue
+        for node in TILE_NODES[tile.tile_id]:
+            production[node][resource_index(tile.terrain)] += ROLL_WAYS[tile.number.value]
+    return {node: tuple(counts) for node, counts in production.items()}
+
+
+def _check_scores(board):
+    production = _node_production(board)
+    assert board.node_production() == production
+    assert board.node_scores() == {node: sum(counts) for node, counts in production.items()}
+    # best first, ties in the order the nodes first come up tile by tile
+    first_seen = list()
+    for tile_id in TILE_IDS:
+        first_seen.extend(node for node in TILE_NODES[tile_id] if node not in first_seen)
+    order = sorted(first_seen, key=lambda node: -sum(production[node]))
+    assert list(board.nodes_by_score()) == order
+
+
+def test_node_scores_match_the_tiles():
+    for seed in range(3):
+        board = catan.boardbuilder.build(rng=random.Random(seed))
+        _check_scores(board)
+        # and are worked out again once the tiles change
+        board.unlock()
+        for tile_id in (3, 7, 11):
+            board.cycle_hex_number(tile_id)
+            board.cycle_hex_type(tile_id + 1)
+        _check_scores(board)
+        board.lock()
+        _check_scores(board)
+
+
+def _check_frontier(board, players):
+    pieces = board.pieces
+    order = board.nodes_by_score()
+    scores = board.node_scores()
+    for owner in players:
+        road_ends = set(node for (hex_type, edge), piece in pieces.items()
+                        if hex_type == hexgrid.EDGE and piece.owner == owner
+                        for node in EDGE_NODES[edge])
+        assert catan.topology.nodes_in(board._road_node_mask(owner)) == sorted(road_ends)
+        frontier = _legal_settlement_nodes(pieces, owner)
+        assert board.legal_settlement_nodes(owner) == frontier
+        best = max(frontier, key=lambda node: (scores[node], -order.index(node))) if frontier else None
+        assert board.best_settlement_node(owner) == best
+
+
+def test_frontier_matches_brute_force_over_games():
+    for seed in range(3):
+        board = catan.boardbuilder.build(rng=random.Random(seed))
+        game = Game(board=board, logging='off', undo='off', seed=seed)
+        game.start(list(_players) + [Player(4, 'ross', 'red')])
+        rng = random.Random(seed)
+        played = list()
+        for _ in range(400):
+            actions = game.legal_actions()
+            if not actions:
+                break
+            played.append(game.apply(rng.choice(actions)))
+            _check_frontier(game.board, game.players)
+        for token in reversed(played):
+            game.unapply(token)
+            _check_frontier(game.board, game.players)
+
+
+def _road_costs(pieces, owner):
+    """
+    Cheapest cost of new roads to each node, by Bellman-Ford, with the costs of
+    catan.roads.road_paths. Also returns the nodes roads can start from, and the blocked ones.
+    """
+    own = set(node for node in NODES if _building(pieces, node) is not None
+              and _building(pieces, node).owner == owner)
+    blocked = set(node for node in NODES if _building(pieces, node) is not None) - own
+    ends = dict()
+    for (hex_type, edge), piece in pieces.items():
+        if hex_type == hexgrid.EDGE:
+            for node in EDGE_NODES[edge]:
+                ends.setdefault(node, set()).add(piece.owner)
+    reach = own | (set(node for node, owners in ends.items() if owner in owners) - blocked)
+    contested = set(node for node, owners in ends.items() if owners - {owner}) - own
+    costs = {node: 0 for node in reach}
+    changed = True
+    while changed:
+        changed = False
+        for edge in EDGES:
+            if (hexgrid.EDGE, edge) in pieces:
+                continue
+            for a, b in (EDGE_NODES[edge], EDGE_NODES[edge][::-1]):
+                if a not in costs or (a in blocked and a not in reach):
+                    continue
+                cost = costs[a] + 1 + (catan.roads.CONTENTION_COST if b in contested else 0)
+                if cost < costs.get(b, cost + 1):
+                    costs[b] = cost
+                    changed = True
+    return costs, reach, blocked, contested
+
+
+def _check_road_targets(board, players):
+    pieces = board.pieces
+    scores = board.node_scores()
+    rebuilt = catan.board.Board()
+    rebuilt.tiles = board.tiles
+    rebuilt.pieces = dict(pieces)
+    for owner in players:
+        targets = board.road_targets(owner)
+        assert targets == rebuilt.road_targets(owner)
+        costs, reach, blocked, contested = _road_costs(pieces, owner)
+        assert set(node for node, _ in targets) == set(node for node in costs if _settlement_allowed(pieces, node))
+        ranks = list()
+        for node, path in targets:
+            if not path:
+                assert node in reach
+                ranks.append(scores[node])
+                continue
+            # a chain of empty edges out from the network, through no other player's building
+            at = [start for start in EDGE_NODES[path[0]] if start in reach]
+            assert at
+            at = at[0]
+            cost = 0
+            for i, edge in enumerate(path):
+                assert (hexgrid.EDGE, edge) not in pieces and at in EDGE_NODES[edge]
+                assert i == 0 or at not in blocked
+                at = [other for other in EDGE_NODES[edge] if other != at][0]
+                cost += 1 + (catan.roads.CONTENTION_COST if at in contested else 0)
+            assert at == node
+            assert cost == costs[node]
+            ranks.append(scores[node] / (1 + cost))
+        assert ranks == sorted(ranks, reverse=True)
+
+
+def test_road_targets_match_brute_force_over_games():
+    for seed in range(2):
+        board = catan.boardbuilder.build(rng=random.Random(seed))
+        game = Game(board=board, logging='off', undo='off', seed=seed)
+        game.start(list(_players) + [Player(4, 'ross', 'red')])
+        rng = random.Random(seed)
+        played = list()
+        for _ in range(150):
+            actions = game.legal_actions()
+            if not actions:
+                break
+            played.append(game.apply(rng.choice(actions)))
+            _check_road_targets(game.board, game.players)
+        for token in reversed(played):
+            game.unapply(token)
+            _check_road_targets(game.board, game.players)
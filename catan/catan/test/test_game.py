@@ -0,0 +1,241 @@
+import random
+
+import hexgrid
+import catan.actions
+import catan.boardbuilder
+import catan.topology
+import catan.zobrist
+from catan.board import Terrain
+from catan.game import Game, Player
+from catan.hand import resource_index
+from catan.pieces import Piece, PieceType
+
+
+def _new_game(seed):
+    board = catan.boardbuilder.build(rng=random.Random(seed))
+    game = Game(board=board, logging='off', undo='off', seed=seed)
+    game.start([Player(1, 'yurick', 'green'),
+                Player(2, 'josh', 'blue'),
+                Player(3, 'zach', 'orange'),
+                Player(4, 'ross', 'red')])
+    return game
+
+
+def _position(game):
+    """
+    Everything apply/unapply and snapshots must put back, in a form that compares with ==.
+    """
+    board = game.board
+    pieces = {key: (piece.type, piece.owner) for key, piece in board.pieces.items()}
+    # an owner's mask can be left at 0 rather than removed, which is the same thing
+    masks = (board._node_mask, board._edge_mask, board._free_node_mask) + tuple(
+        {owner: mask for owner, mask in owner_masks.items() if mask}
+        for owner_masks in (board._owner_node_masks, board._owner_edge_masks,
+                            board._owner_road_node_masks))
+    ledger = {player: (entry.settlements, entry.roads, entry.cities, entry.longest_road,
+                       entry.knights, entry.victory_points)
+              for player, entry in game.ledger().items()}
+    return (pieces,
+            masks,
+            {player: game.hands[player].counts for player in game.players},
+            {player: sorted(game.dev_hands[player]) for player in game.players},
+            game.robber_tile,
+            game.get_cur_player(),
+            type(game.state),
+            game.zobrist_hash(),
+            ledger)
+
+
+def _random_walk(game, rng, steps):
+    """
+    Apply up to steps random legal actions, returning each token with the position before it.
+    """
+    played = list()
+    for _ in range(steps):
+        actions = game.legal_actions()
+        if not actions:
+            break
+        before = _position(game)
+        played.append((game.apply(rng.choice(actions)), before))
+    return played
+
+
+def test_apply_then_unapply_restores_every_position():
+    for seed in range(3):
+        game = _new_game(seed)
+        rng = random.Random(seed)
+        played = _random_walk(game, rng, 400)
+        assert len(played) > 100
+        for token, before in reversed(played):
+            game.unapply(token)
+            assert _position(game) == before
+
+
+def test_restore_snapshot_after_random_play():
+    for seed in range(3):
+        game = _new_game(seed)
+        rng = random.Random(seed)
+        _random_walk(game, rng, 60)
+        for _ in range(5):
+            snapshot = game.snapshot()
+            before = _position(game)
+            _random_walk(game, rng, 40)
+            game.restore_snapshot(snapshot)
+            assert _position(game) == before
+            _random_walk(game, rng, 20)
+
+
+def _check_legal_actions(game):
+    """
+    Compare the legal actions with what the state allows and the board has room for.
+    """
+    state = game.state
+    player = game.get_cur_player()
+    actions = game.legal_actions()
+    by_name = dict()
+    for action in actions:
+        by_name.setdefault(action.name, list()).append(action.args)
+    assert ('roll' in by_name) == state.can_roll()
+    if state.can_roll():
+        assert [args[0] for args in by_name['roll']] == list(catan.actions.ROLLS)
+    assert ('end_turn' in by_name) == state.can_end_turn()
+    assert ('buy_dev_card' in by_name) == state.can_buy_dev_card()
+    assert ('play_knight' in by_name) == state.can_play_knight()
+    if state.can_move_robber():
+        assert [args[0] for args in by_name['move_robber']] == [tile_id for tile_id in catan.topology.TILE_IDS
+                                                                if tile_id != game.robber_tile]
+    else:
+        assert 'move_robber' not in by_name
+    if state.can_steal():
+        stealable = game.stealable_players()
+        victims = [victim for victim in game.players if victim in stealable] or [None]
+        assert [args[0] for args in by_name['steal']] == victims
+    else:
+        assert 'steal' not in by_name
+    if state.can_buy_road() and not state.is_in_pregame():
+        assert [args[0] for args in by_name.get('buy_road', ())] == game.board.legal_road_edges(player)
+    else:
+        assert 'buy_road' not in by_name
+    if state.can_buy_settlement():
+        assert [args[0] for args in by_name.get('buy_settlement', ())] == game.board.legal_settlement_nodes(player)
+    else:
+        assert 'buy_settlement' not in by_name
+    settlements = sorted(coord for (hex_type, coord), piece in game.board.owned_pieces(player).items()
+                         if piece.type == PieceType.settlement)
+    if state.can_buy_city():
+        assert sorted(args[0] for args in by_name.get('buy_city', ())) == settlements
+    else:
+        assert 'buy_city' not in by_name
+    rates = game.trade_rates(player)
+    for args in by_name.get('trade', ()):
+        trade = args[0]
+        assert state.can_trade() and trade.giver() == player
+        (num, give), = trade.giving()
+        (one, get), = trade.getting()
+        assert num == rates[resource_index(give)] and one == 1 and give != get
+        assert game.hands[player].count(give) >= num
+    # every action is one the game takes
+    for action in actions:
+        game.unapply(game.apply(action))
+
+
+def test_legal_actions_in_the_pregame():
+    game = _new_game(0)
+    actions = game.legal_actions()
+    assert set(action.name for action in actions) == {'place_settlement'}
+    assert [action.args[0] for action in actions] == sorted(catan.topology.NODES)
+    node = 0x67
+    game.apply(catan.actions.shared('place_settlement', node))
+    actions = game.legal_actions()
+    assert set(action.name for action in actions) == {'place_road'}
+    assert [action.args[0] for action in actions] == sorted(catan.topology.NODE_EDGES[node])
+
+
+def test_legal_actions_follow_the_state():
+    names = set()
+    for seed in range(3):
+        game = _new_game(seed)
+        rng = random.Random(seed)
+        for step in range(300):
+            _check_legal_actions(game)
+            actions = game.legal_actions()
+            names.update(action.name for action in actions)
+            if not actions:
+                break
+            game.apply(rng.choice(actions))
+    assert {'roll', 'move_robber', 'steal', 'buy_road', 'trade', 'end_turn'} <= names
+
+
+def test_legal_actions_after_a_roll():
+    game = _new_game(1)
+    rng = random.Random(1)
+    while not game.state.can_roll() or game.state.is_in_pregame():
+        game.apply(rng.choice(game.legal_actions()))
+    player = game.get_cur_player()
+    game.apply(catan.actions.shared('roll', 6))
+    # enough for one of everything, with a fourth ore to trade
+    game.hands[player].set_counts((1, 1, 2, 1, 4))
+    names = set(action.name for action in game.legal_actions())
+    assert {'buy_road', 'buy_city', 'buy_dev_card', 'trade', 'end_turn'} <= names
+    assert ('buy_settlement' in names) == bool(game.board.legal_settlement_nodes(player))
+    assert 'roll' not in names
+    _check_legal_actions(game)
+    game.hands[player].set_counts((0, 0, 0, 0, 0))
+    assert [action.name for action in game.legal_actions()] == ['end_turn']
+
+
+def _board_hash(board):
+    """
+    The board's Zobrist hash worked out from scratch.
+    """
+    value = 0
+    for key, piece in board.pieces.items():
+        value ^= catan.zobrist.piece_key(key, piece)
+    return value
+
+
+def _hand_hash(hand):
+    value = 0
+    for resource, count in enumerate(hand.counts):
+        value ^= catan.zobrist.count_key(resource, count)
+    return value
+
+
+def test_zobrist_hash_matches_a_recompute():
+    for seed in range(3):
+        game = _new_game(seed)
+        rng = random.Random(seed)
+        played = list()
+        for _ in range(800):
+            actions = game.legal_actions()
+            if not actions:
+                break
+            played.append((game.apply(rng.choice(actions)), game.zobrist_hash()))
+            assert game.board.zobrist_hash() == _board_hash(game.board)
+            for player in game.players:
+                assert game.hands[player].zobrist_hash() == _hand_hash(game.hands[player])
+        for token, value in reversed(played):
+            assert game.zobrist_hash() == value
+            game.unapply(token)
+            assert game.board.zobrist_hash() == _board_hash(game.board)
+            for player in game.players:
+                assert game.hands[player].zobrist_hash() == _hand_hash(game.hands[player])
+
+
+def test_zobrist_hash_ignores_move_order():
+    game = _new_game(0)
+    for node in (0x67, 0x27):
+        game.apply(catan.actions.shared('place_settlement', node))
+        game.apply(game.legal_actions()[0])
+    player = game.players[2]
+    edges = [edge for edge in catan.topology.EDGES if not game.board.pieces.get((hexgrid.EDGE, edge))][:2]
+    hashes = list()
+    for order in (edges, edges[::-1]):
+        snapshot = game.snapshot()
+        for edge in order:
+            game.board.place_piece(Piece(PieceType.road, player), edge)
+        game.hands[player].add(Terrain.ore)
+        game.hands[player].add(Terrain.wood)
+        hashes.append(game.zobrist_hash())
+        game.restore_snapshot(snapshot)
+    assert hashes[0] == hashes[1] != game.zobrist_hash()
@@ -0,0 +1,62 @@
+import pytest
+
+from catan.board import Terrain
+from catan.game import CITY_COST, ROAD_COST
+from catan.hand import Hand, RESOURCES, resource_index
+
+
+def test_counts_and_list_behaviour():
+    hand = Hand([Terrain.ore, Terrain.wood, Terrain.ore, Terrain.sheep])
+    assert hand.counts == (1, 0, 0, 1, 2)
+    assert len(hand) == 4
+    assert hand.count(Terrain.ore) == 2
+    assert hand.count(Terrain.desert) == 0
+    assert Terrain.wood in hand
+    assert Terrain.brick not in hand
+    # cards are listed grouped by resource, in RESOURCES order, whatever order they came in
+    assert list(hand) == [Terrain.wood, Terrain.sheep, Terrain.ore, Terrain.ore]
+    assert [hand[i] for i in range(len(hand))] == list(hand)
+    assert hand[-1] == Terrain.ore
+    with pytest.raises(IndexError):
+        hand[4]
+    assert hand == [Terrain.ore, Terrain.ore, Terrain.sheep, Terrain.wood]
+    assert repr(hand) == repr(list(hand))
+
+
+def test_add_and_remove():
+    hand = Hand()
+    hand.append(Terrain.wheat)
+    hand.add(Terrain.brick, 3)
+    assert hand.counts == (0, 3, 1, 0, 0)
+    hand.remove(Terrain.brick, 2)
+    assert hand.counts == (0, 1, 1, 0, 0)
+    assert len(hand) == 2
+    with pytest.raises(ValueError):
+        hand.remove(Terrain.brick, 2)
+    assert hand.counts == (0, 1, 1, 0, 0)
+
+
+def test_afford_and_pay():
+    hand = Hand([Terrain.wood, Terrain.brick, Terrain.ore, Terrain.ore])
+    assert hand.can_afford(ROAD_COST)
+    assert not hand.can_afford(CITY_COST)
+    assert hand.can_afford(Hand([Terrain.ore, Terrain.ore]))
+    assert not hand.can_afford(Hand([Terrain.ore] * 3))
+    with pytest.raises(ValueError):
+        hand.pay(CITY_COST)
+    assert hand.counts == (1, 1, 0, 0, 2)
+    hand.pay(ROAD_COST)
+    assert hand.counts == (0, 0, 0, 0, 2)
+
+
+def test_set_counts_and_copy():
+    hand = Hand()
+    hand.set_counts((2, 0, 1, 0, 3))
+    assert len(hand) == 6
+    assert hand.count(Terrain.ore) == 3
+    copy = hand.copy()
+    copy.remove(Terrain.ore)
+    assert hand.counts == (2, 0, 1, 0, 3)
+    assert copy.counts == (2, 0, 1, 0, 2)
+    assert copy.zobrist_hash() == Hand(list(copy)).zobrist_hash()
+    assert resource_index(RESOURCES[3]) == 3
@@ -0,0 +1,62 @@
+import logging
+import random
+
+import catan.boardbuilder
+import catan.position
+from catan.game import Game, Player
+
+
+def _new_game(seed):
+    board = catan.boardbuilder.build(rng=random.Random(seed))
+    game = Game(board=board, logging='off', undo='off', seed=seed)
+    game.start([Player(1, 'yurick', 'green'),
+                Player(2, 'josh', 'blue'),
+                Player(3, 'zach', 'orange'),
+                Player(4, 'ross', 'red')])
+    return game
+
+
+def _legal_actions(game):
+    """
+    The legal actions in a form that compares across games. Trades don't compare equal,
+    even to themselves in another game.
+    """
+    actions = list()
+    for action in game.legal_actions():
+        if action.name == 'trade':
+            trade = action.args[0]
+            actions.append(('trade', trade.giver(), repr(trade.getter()), trade.giving(), trade.getting()))
+        else:
+            actions.append((action.name, action.args))
+    return actions
+
+
+def _check(game, caplog):
+    packed = catan.position.pack(game)
+    with caplog.at_level(logging.WARNING):
+        unpacked = catan.position.unpack(packed, seed=0)
+    assert caplog.records == []
+    assert catan.position.pack(unpacked) == packed
+    assert unpacked.zobrist_hash() == game.zobrist_hash()
+    assert unpacked.players == game.players
+    for player in game.players:
+        assert unpacked.hands[player].counts == game.hands[player].counts
+        assert unpacked.trade_rates(player) == game.trade_rates(player)
+    assert type(unpacked.state) is type(game.state)
+    assert _legal_actions(unpacked) == _legal_actions(game)
+
+
+def test_pack_unpack_round_trip_over_random_walks(caplog):
+    checks = 0
+    for seed in range(3):
+        game = _new_game(seed)
+        rng = random.Random(seed)
+        for step in range(400):
+            actions = game.legal_actions()
+            if not actions:
+                break
+            if step % 5 == 0:
+                _check(game, caplog)
+                checks += 1
+            game.apply(rng.choice(actions))
+    assert checks > 200
@@ -0,0 +1,48 @@
+import itertools
+
+import catan.production
+from catan.game import BUILD_COSTS
+
+# catan.hand.RESOURCES order: wood, brick, wheat, sheep, ore
+WOOD, BRICK, WHEAT, SHEEP, ORE = range(5)
+
+
+def _enumerated(counts, cost, income, rolls):
+    """
+    The chance the hand covers the cost after the given number of rolls, over every way
+    the two dice can land on each roll.
+    """
+    faces = list(itertools.product(range(1, 7), repeat=2))
+    covered = 0
+    for dice in itertools.product(faces, repeat=rolls):
+        hand = list(counts)
+        for first, second in dice:
+            for number, resource, cards in income:
+                if number == first + second:
+                    hand[resource] += cards
+        if all(have >= need for have, need in zip(hand, cost)):
+            covered += 1
+    return covered / len(faces) ** rolls
+
+
+def test_one_turn_matches_dice_enumeration():
+    incomes = (
+        ((6, WOOD, 1), (8, BRICK, 1)),
+        ((5, WHEAT, 2), (9, ORE, 1), (10, ORE, 2), (4, SHEEP, 1)),
+        ((2, WOOD, 1), (12, BRICK, 2), (8, WHEAT, 1), (8, ORE, 2)),
+    )
+    hands = ((0, 0, 0, 0, 0), (1, 0, 1, 0, 1), (0, 1, 2, 1, 2))
+    for income, counts, cost, rolls in itertools.product(incomes, hands, BUILD_COSTS.values(), (1, 2)):
+        income = tuple(sorted(income))
+        probabilities = catan.production.afford_probabilities(counts, cost, income, rolls, turns=1)
+        assert len(probabilities) == 2
+        assert probabilities[0] == _enumerated(counts, cost, income, 0)
+        assert abs(probabilities[1] - _enumerated(counts, cost, income, rolls)) < 1e-12
+
+
+def test_turns_are_rolls_in_a_row():
+    income = ((6, WOOD, 1), (8, BRICK, 1), (9, WHEAT, 1))
+    cost = BUILD_COSTS['road']
+    by_roll = catan.production.afford_probabilities((0, 0, 0, 0, 0), cost, income, rolls=1, turns=3)
+    assert abs(by_roll[3] - _enumerated((0, 0, 0, 0, 0), cost, income, 3)) < 1e-12
+    assert list(by_roll) == sorted(by_roll)
@@ -0,0 +1,89 @@
+import random
+
+from catan.roads import longest_road
+from catan.topology import EDGE_EDGES, EDGE_NODES, EDGES, NODE_EDGES, TILE_EDGES, TILE_NODES
+
+
+def _brute_force(edges, blocked=frozenset()):
+    """
+    Longest trail by trying every first edge in both directions, never continuing on from
+    a blocked node. No early exits and no memo, unlike catan.roads.
+    """
+    edges = set(edges)
+    best = 0
+
+    def walk(node, used):
+        nonlocal best
+        best = max(best, len(used))
+        if node in blocked:
+            return
+        for edge in NODE_EDGES[node]:
+            if edge in edges and edge not in used:
+                a, b = EDGE_NODES[edge]
+                walk(b if a == node else a, used | {edge})
+
+    for edge in edges:
+        for start, end in (EDGE_NODES[edge], reversed(EDGE_NODES[edge])):
+            walk(end, frozenset((edge, )))
+    return best
+
+
+def _spur(cycle_edges, node):
+    """
+    The edge off node which isn't on the cycle.
+    """
+    return [edge for edge in NODE_EDGES[node] if edge not in cycle_edges][0]
+
+
+def test_path_and_cycle():
+    hexagon = TILE_EDGES[10]
+    assert longest_road(hexagon[:3]) == 3
+    assert longest_road(hexagon) == 6
+    assert longest_road(()) == 0
+
+
+def test_branching():
+    hexagon = set(TILE_EDGES[10])
+    node = TILE_NODES[10][0]
+    # a spur off the cycle is walked first, then the whole way round
+    assert longest_road(hexagon | {_spur(hexagon, node)}) == 7
+    # with a second spur opposite, four nodes have odd degree, so no trail uses every edge
+    opposite = TILE_NODES[10][3]
+    edges = hexagon | {_spur(hexagon, node), _spur(hexagon, opposite)}
+    assert longest_road(edges) == _brute_force(edges) == 7
+    # a star of three roads from one node counts two of them
+    star = NODE_EDGES[node]
+    assert longest_road(star) == 2
+
+
+def test_two_cycles_sharing_an_edge():
+    edges = set(TILE_EDGES[10]) | set(TILE_EDGES[9])
+    assert len(edges) == 11
+    assert longest_road(edges) == _brute_force(edges)
+
+
+def test_blocked_nodes():
+    hexagon = TILE_EDGES[10]
+    nodes = TILE_NODES[10]
+    # a road can start and end at an opponent's building, so a blocked cycle still counts
+    assert longest_road(hexagon, blocked={nodes[0]}) == 6
+    # but can't pass through it, so the spur no longer joins the cycle
+    spur = _spur(set(hexagon), nodes[0])
+    assert longest_road(set(hexagon) | {spur}, blocked={nodes[0]}) == 6
+    # a path cut in the middle counts its longer half
+    path = hexagon[:5]
+    middle = [node for node in EDGE_NODES[path[1]] if node in EDGE_NODES[path[2]]][0]
+    assert longest_road(path, blocked={middle}) == 3
+
+
+def test_random_roads_match_brute_force():
+    rng = random.Random(0)
+    edge_list = sorted(EDGES)
+    for _ in range(300):
+        edges = {rng.choice(edge_list)}
+        for _ in range(rng.randint(0, 11)):
+            frontier = sorted(set(nxt for edge in edges for nxt in EDGE_EDGES[edge]) - edges)
+            edges.add(rng.choice(frontier))
+        nodes = sorted(set(node for edge in edges for node in EDGE_NODES[edge]))
+        blocked = frozenset(rng.sample(nodes, rng.randint(0, 2)))
+        assert longest_road(edges, blocked) == _brute_force(edges, blocked), (sorted(edges), blocked)
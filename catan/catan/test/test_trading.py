@@ -0,0 +1,73 @@
+from catan.trading import cheapest_trades
+
+# catan.hand.RESOURCES order: wood, brick, wheat, sheep, ore
+WOOD, BRICK, WHEAT, SHEEP, ORE = range(5)
+ROAD = (1, 1, 0, 0, 0)
+CITY = (0, 0, 2, 0, 3)
+BANK = (4, 4, 4, 4, 4)
+
+
+def _given(trades, counts):
+    """
+    The hand after making the trades.
+    """
+    after = list(counts)
+    for partner, give, num, get in trades:
+        after[give] -= num
+        after[get] += 1
+    return after
+
+
+def test_covered_already():
+    assert cheapest_trades((1, 1, 0, 0, 0), ROAD, BANK) == []
+    assert cheapest_trades((3, 2, 5, 1, 0), ROAD, BANK) == []
+
+
+def test_cannot_be_covered():
+    assert cheapest_trades((1, 0, 0, 0, 0), ROAD, BANK) is None
+    assert cheapest_trades((1, 0, 3, 3, 3), ROAD, BANK) is None
+    # the only spare cards are the ones the cost needs
+    assert cheapest_trades((5, 0, 0, 0, 0), (5, 1, 0, 0, 0), BANK) is None
+
+
+def test_bank_trade():
+    counts = (1, 0, 4, 0, 0)
+    assert cheapest_trades(counts, ROAD, BANK) == [(None, WHEAT, 4, BRICK)]
+
+
+def test_two_to_one_port_preferred():
+    counts = (1, 0, 4, 4, 0)
+    rates = (4, 4, 4, 2, 4)
+    assert cheapest_trades(counts, ROAD, rates) == [(None, SHEEP, 2, BRICK)]
+    # with only the 4:1 resource to spare, the bank it is
+    assert cheapest_trades((1, 0, 4, 1, 0), ROAD, rates) == [(None, WHEAT, 4, BRICK)]
+
+
+def test_partner_preferred_and_trades_once():
+    offers = (('josh', SHEEP, WOOD), ('josh', SHEEP, BRICK))
+    # josh would cover both cards, but trades once, so 4 sheep can't pay for the other
+    assert cheapest_trades((0, 0, 0, 4, 0), ROAD, BANK, offers) is None
+    # with a fifth sheep, one card goes to josh and four to the bank
+    trades = cheapest_trades((0, 0, 0, 5, 0), ROAD, BANK, offers)
+    assert sorted(num for _, _, num, _ in trades) == [1, 4]
+    assert [partner for partner, _, _, _ in trades].count('josh') == 1
+    assert _given(trades, (0, 0, 0, 5, 0)) == [1, 1, 0, 0, 0]
+    # two partners cover the cost for two cards
+    offers = (('josh', SHEEP, WOOD), ('zach', SHEEP, BRICK))
+    assert cheapest_trades((0, 0, 0, 2, 0), ROAD, BANK, offers) == [('josh', SHEEP, 1, WOOD),
+                                                                  ('zach', SHEEP, 1, BRICK)]
+
+
+def test_only_spare_cards_are_given():
+    counts = (0, 0, 3, 5, 1)
+    rates = (2, 2, 2, 2, 2)
+    trades = cheapest_trades(counts, CITY, rates)
+    # 1 wheat to spare isn't enough for a 2:1 trade, so the sheep pay for both ore
+    assert trades == [(None, SHEEP, 2, ORE), (None, SHEEP, 2, ORE)]
+    after = _given(trades, counts)
+    assert all(have >= need for have, need in zip(after, CITY))
+    assert cheapest_trades(counts, CITY, BANK) is None
+    # a city from 2 wheat, 1 ore and 4 sheep: the sheep go, never the wheat or ore
+    assert cheapest_trades((0, 0, 2, 4, 2), CITY, BANK) == [(None, SHEEP, 4, ORE)]
+    # spare wheat past the two the city needs can go too
+    assert cheapest_trades((0, 0, 6, 0, 2), CITY, BANK) == [(None, WHEAT, 4, ORE)]
@@ -0,0 +1,157 @@
+"""
+module topology holds the static adjacency of the standard board, computed once on import.
+
+The grid never changes shape, only what's on it, so the tile, node and edge relationships
+hexgrid works out with coordinate arithmetic on every call are tabulated here instead.
+
+Tables keyed by a coordinate are tuples indexed by that coordinate, e.g.
+
+    topology.EDGE_NODES[0x22]     # the 2 nodes on edge 0x22
+    topology.NODE_NODES[0x23]     # the nodes one road away from node 0x23
+    topology.TILE_NODES[tile_id]  # the 6 nodes of a tile, in NODE_DIRECTIONS order
+
+An index which isn't a legal coordinate of that type gives an empty tuple (or None for
+TILE_COORD and TILE_ID), so check NODES or EDGES first when a coordinate might be off
+the board.
+
+Coordinates are those of module hexgrid; see its docs for the coordinate system.
+"""
+import types
+import hexgrid
+
+# One past the largest tile, node or edge coordinate on the grid
+COORD_LIMIT = 0x100
+
+TILE_IDS = tuple(range(1, 20))
+
+# Directions of a tile's nodes and edges, in the order the TILE_ tables list them
+NODE_DIRECTIONS = ('NW', 'N', 'NE', 'SE', 'S', 'SW')
+EDGE_DIRECTIONS = ('NW', 'NE', 'E', 'SE', 'SW', 'W')
+
+
+def _by_coord(table, empty=()):
+    return tuple(table.get(coord, empty) for coord in range(COORD_LIMIT))
+
+
+def _by_tile_id(table):
+    return tuple(table.get(tile_id) for tile_id in range(len(TILE_IDS) + 1))
+
+
+def _build():
+    tile_coord = {tile_id: hexgrid.tile_id_to_coord(tile_id) for tile_id in TILE_IDS}
+    tile_nodes = {tile_id: tuple(hexgrid.node_coord_in_direction(tile_id, ndir) for ndir in NODE_DIRECTIONS)
+                  for tile_id in TILE_IDS}
+    tile_edges = {tile_id: tuple(hexgrid.edge_coord_in_direction(tile_id, edir) for edir in EDGE_DIRECTIONS)
+                  for tile_id in TILE_IDS}
+
+    node_tiles = dict()
+    for tile_id in TILE_IDS:
+        for node in tile_nodes[tile_id]:
+            node_tiles.setdefault(node, list()).append(tile_id)
+    edges = set(edge for tile_id in TILE_IDS for edge in tile_edges[tile_id])
+
+    edge_nodes = {edge: tuple(hexgrid.nodes_touching_edge(edge)) for edge in sorted(edges)}
+    node_edges = dict()
+    node_nodes = dict()
+    for edge, (a, b) in edge_nodes.items():
+        node_edges.setdefault(a, list()).append(edge)
+        node_edges.setdefault(b, list()).append(edge)
+        node_nodes.setdefault(a, list()).append(b)
+        node_nodes.setdefault(b, list()).append(a)
+    edge_edges = {edge: tuple(other for node in edge_nodes[edge] for other in node_edges[node] if other != edge)
+                  for edge in edge_nodes}
+
+    coast = {(tile_id, edir): hexgrid.edge_coord_in_direction(tile_id, edir)
+             for tile_id, edir in hexgrid.coastal_coords()}
+
+    return types.SimpleNamespace(
+        tile_coord=tile_coord,
+        tile_nodes=tile_nodes,
+        tile_edges=tile_edges,
+        node_tiles={node: tuple(tile_ids) for node, tile_ids in node_tiles.items()},
+        node_nodes={node: tuple(nodes) for node, nodes in node_nodes.items()},
+        node_edges={node: tuple(edges) for node, edges in node_edges.items()},
+        edge_nodes=edge_nodes,
+        edge_edges=edge_edges,
+        coast=coast,
+    )
+
+_tables = _build()
+
+# tile id -> tile coordinate, and back
+TILE_COORD = _by_tile_id(_tables.tile_coord)
+TILE_ID = _by_coord({coord: tile_id for tile_id, coord in _tables.tile_coord.items()}, empty=None)
+
+# Every node and edge on the grid
+NODES = frozenset(_tables.node_tiles)
+EDGES = frozenset(_tables.edge_nodes)
+
+# tile id -> the tile's 6 nodes, in NODE_DIRECTIONS order, and 6 edges, in EDGE_DIRECTIONS order
+TILE_NODES = _by_tile_id(_tables.tile_nodes)
+TILE_EDGES = _by_tile_id(_tables.tile_edges)
+
+# (tile id, direction) -> node or edge coordinate, like hexgrid.from_location
+NODE_IN_DIRECTION = types.MappingProxyType({(tile_id, ndir): node
+                                            for tile_id in TILE_IDS
+                                            for ndir, node in zip(NODE_DIRECTIONS, _tables.tile_nodes[tile_id])})
+EDGE_IN_DIRECTION = types.MappingProxyType({(tile_id, edir): edge
+                                            for tile_id in TILE_IDS
+                                            for edir, edge in zip(EDGE_DIRECTIONS, _tables.tile_edges[tile_id])})
+
+# node -> the 1 to 3 tiles it touches, by ascending tile id
+NODE_TILES = _by_coord(_tables.node_tiles)
+# node -> the 2 or 3 nodes one edge away
+NODE_NODES = _by_coord(_tables.node_nodes)
+# node -> the 2 or 3 edges ending at it
+NODE_EDGES = _by_coord(_tables.node_edges)
+# edge -> its 2 nodes, in hexgrid.nodes_touching_edge order
+EDGE_NODES = _by_coord(_tables.edge_nodes)
+# edge -> the 2 to 4 edges sharing a node with it
+EDGE_EDGES = _by_coord(_tables.edge_edges)
+
+# (tile id, direction) -> edge coordinate, for each edge on the border where a port can be
+COASTAL_EDGES = types.MappingProxyType(_tables.coast)
+COASTAL_TILE_IDS = tuple(sorted(set(tile_id for tile_id, _ in _tables.coast)))
+
+del _tables
+
+# Bit masks: each node and each edge gets one bit, so a set of them is a single int. Board
+# keeps its occupancy this way, which makes the placement rules a few AND/OR operations.
+_nodes_by_bit = tuple(sorted(NODES))
+_edges_by_bit = tuple(sorted(EDGES))
+NODE_BIT = _by_coord({node: 1 << i for i, node in enumerate(_nodes_by_bit)}, empty=0)
+EDGE_BIT = _by_coord({edge: 1 << i for i, edge in enumerate(_edges_by_bit)}, empty=0)
+ALL_NODES_MASK = (1 << len(NODES)) - 1
+ALL_EDGES_MASK = (1 << len(EDGES)) - 1
+
+# node -> the node itself and its neighbours, which must all be empty to build a settlement
+DISTANCE_MASK = tuple(NODE_BIT[coord] | sum(NODE_BIT[node] for node in NODE_NODES[coord])
+                      for coord in range(COORD_LIMIT))
+# node -> the edges ending at it
+NODE_EDGE_MASK = tuple(sum(EDGE_BIT[edge] for edge in NODE_EDGES[coord]) for coord in range(COORD_LIMIT))
+# edge -> its 2 nodes
+EDGE_NODE_MASK = tuple(sum(NODE_BIT[node] for node in EDGE_NODES[coord]) for coord in range(COORD_LIMIT))
+
+
+def nodes_in(mask):
+    """
+    :param mask: int, a set of NODE_BITs
+    :return: list of node coordinates in the mask, ascending
+    """
+    return [node for node in _nodes_by_bit if mask & NODE_BIT[node]]
+
+
+def edges_in(mask):
+    """
+    :param mask: int, a set of EDGE_BITs
+    :return: list of edge coordinates in the mask, ascending
+    """
+    return [edge for edge in _edges_by_bit if mask & EDGE_BIT[edge]]
+
+
+def port_nodes(port):
+    """
+    :param port: Port, with a tile id and direction on the coast
+    :return: the 2 node coordinates a settlement or city must be on to use the port
+    """
+    return EDGE_NODES[EDGE_IN_DIRECTION[(port.tile_id, port.direction)]]
@@ -1,3 +1,4 @@
+import functools
 import logging
 from collections import Counter
 
@@ -83,3 +84,54 @@ class CatanTrade(object):
 
     def set_getter(self, getter):
         self._getter = getter
+
+
+def cheapest_trades(counts, cost, rates, offers=()):
+    """
+    The trades which cover the cards a cost is missing from a hand for the fewest cards
+    given away. Each trade gets one missing card for cards the cost doesn't need: rates[i]
+    of resource i to the bank or a port, or one card to a partner through an offer.
+
+    Memoized on the hand, the cost, the rates and the offers, so asking again in the same
+    position is a lookup.
+
+    :param counts: tuple of int, the hand, in catan.hand.RESOURCES order
+    :param cost: tuple of int, the cards wanted, same order
+    :param rates: tuple of int, same order, see Game#trade_rates
+    :param offers: tuple of (partner, give, get), partners willing to take one card of
+    resource index give for one of get. A partner makes at most one trade.
+    :return: list of (partner or None for the bank or a port, give, number given, get),
+    in the order to make them, empty if the hand already covers the cost, or None if trades
+    can't cover it
+    """
+    found = _cheapest_trades(tuple(counts), tuple(cost), tuple(rates), tuple(offers))
+    return None if found is None else list(found[1])
+
+
+@functools.lru_cache(maxsize=4096)
+def _cheapest_trades(counts, cost, rates, offers):
+    """
+    :return: (cards given, tuple of trades), or None if trades can't cover the cost
+    """
+    missing = next((i for i, (have, need) in enumerate(zip(counts, cost)) if have < need), None)
+    if missing is None:
+        return 0, ()
+    best = None
+    for give, (have, need) in enumerate(zip(counts, cost)):
+        spare = have - need
+        if give == missing or spare < 1:
+            continue
+        trades = list()
+        if spare >= rates[give]:
+            trades.append((None, rates[give], offers))
+        for partner, offer_give, offer_get in offers:
+            if offer_give == give and offer_get == missing:
+                trades.append((partner, 1, tuple(offer for offer in offers if offer[0] != partner)))
+        for partner, num, rest in trades:
+            after = list(counts)
+            after[give] -= num
+            after[missing] += 1
+            found = _cheapest_trades(tuple(after), cost, rates, rest)
+            if found is not None and (best is None or num + found[0] < best[0]):
+                best = (num + found[0], ((partner, give, num, missing), ) + found[1])
+    return best
@@ -0,0 +1,146 @@
+"""
+module zobrist provides the random keys behind Game#zobrist_hash.
+
+A Zobrist hash XORs together one random 64-bit key per feature of a position, e.g. seat 2's
+settlement on node 0x23, or seat 1 holding 3 wheat. Changing a feature XORs its old key out
+and its new key in, so the hash is kept up to date in constant time per change rather than
+recomputed from the whole position.
+
+Keys are a fixed function of the feature rather than draws from a random generator, so a
+position hashes the same in every process and in every order the keys are first asked for.
+"""
+import zlib
+
+BITS = 64
+MASK = (1 << BITS) - 1
+
+# Kinds of feature, mixed into every key so that e.g. a count and a seat never share a key
+_PIECE = 1
+_COUNT = 2
+_DEV_CARD = 3
+_CUR_PLAYER = 4
+_STATE = 5
+_ROBBER = 6
+
+_piece_keys = dict()
+_count_keys = tuple(list() for _ in range(5))
+_other_keys = dict()
+
+
+def mix(*parts):
+    """
+    A well-spread 64-bit key for a tuple of non-negative ints, by splitmix64.
+
+    :param parts: ints
+    :return: int on [0, 2**64)
+    """
+    value = 0
+    for part in parts:
+        value = (value ^ part) + 0x9E3779B97F4A7C15 & MASK
+        value = (value ^ (value >> 30)) * 0xBF58476D1CE4E5B9 & MASK
+        value = (value ^ (value >> 27)) * 0x94D049BB133111EB & MASK
+        value ^= value >> 31
+    return value
+
+
+def name_id(name):
+    """
+    :param name: str
+    :return: int which is the same for the same name in every process, unlike hash(name)
+    """
+    return zlib.crc32(name.encode('utf8'))
+
+
+def piece_key(key, piece):
+    """
+    :param key: (hexgrid.TYPE, coord), the board.pieces key the piece is on
+    :param piece: Piece, its owner a Player or None
+    :return: key of that piece on that coordinate
+    """
+    owner = piece.owner
+    seat = 0 if owner is None else owner.seat
+    index = (key, piece.type, seat)
+    value = _piece_keys.get(index)
+    if value is None:
+        value = _piece_keys[index] = mix(_PIECE, key[0], key[1], name_id(piece.type.value), seat)
+    return value
+
+
+def count_key(resource, count):
+    """
+    :param resource: index of the resource in catan.hand.RESOURCES
+    :param count: number of that resource held
+    :return: key of holding that many, 0 when count is 0
+    """
+    keys = _count_keys[resource]
+    while count >= len(keys):
+        keys.append(mix(_COUNT, resource, len(keys)) if keys else 0)
+    return keys[count]
+
+
+def rotate(value, seat):
+    """
+    Rotate a hand's hash by a different amount for each seat, so that two players holding
+    the same cards don't cancel out when their hashes are XORed together.
+
+    :param value: 64-bit int
+    :param seat: int
+    :return: 64-bit int
+    """
+    shift = seat * 13 % BITS
+    return (value << shift | value >> (BITS - shift)) & MASK
+
+
+def dev_cards_key(seat, cards, knights):
+    """
+    :param seat: int
+    :param cards: sorted tuple of the seat's dev cards, e.g. ('Knight', 'Monopoly')
+    :param knights: number of knights the seat has played
+    :return: key of the seat's dev cards
+    """
+    value = _other_keys.get((_DEV_CARD, seat, cards, knights))
+    if value is None:
+        value = _other_keys[(_DEV_CARD, seat, cards, knights)] = mix(
+            _DEV_CARD, seat, knights, *(name_id(card) for card in cards))
+    return value
+
+
+def cur_player_key(seat):
+    """
+    :return: key of it being seat's turn
+    """
+    return _key(_CUR_PLAYER, seat)
+
+
+def robber_key(tile_id):
+    """
+    :return: key of the robber being on the tile
+    """
+    return _key(_ROBBER, tile_id)
+
+
+def state_key(state):
+    """
+    Key of a GameState or DevCardPlayabilityState: its class, the piece type it places if
+    any, and how many road builder roads have been placed.
+
+    :param state: state object, see module catan.states
+    :return: int
+    """
+    attrs = vars(state)
+    piece_type = attrs.get('piece_type')
+    return _key(_STATE,
+                type(state).__name__,
+                '' if piece_type is None else piece_type.value,
+                len(attrs.get('edges', ())))
+
+
+def _key(*parts):
+    """
+    :param parts: ints and strs
+    :return: mix of the parts, with each str replaced by its name_id
+    """
+    value = _other_keys.get(parts)
+    if value is None:
+        value = _other_keys[parts] = mix(*(name_id(part) if isinstance(part, str) else part for part in parts))
+    return value